@@ -374,5 +374,106 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Cache: per-process local memory unless REDIS_CACHE_URL points at a shared Redis
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'attendance-system',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+if os.environ.get('REDIS_CACHE_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_CACHE_URL'],
+    }
+
+# Attendance poller duplicate-prevention index
+ATTENDANCE_DEDUP = {
+    'STORE': os.environ.get('ATTENDANCE_DEDUP_STORE', 'file'),  # 'file' or 'cache'
+    'STATE_DIR': BASE_DIR / 'state',
+    'CACHE_ALIAS': 'default',
+    'WINDOW_HOURS': 48,
+    'MAX_ENTRIES_PER_DEVICE': 10000,
+}
+
+# Device identity (biometric_id / employee_id -> user) cache
+ATTENDANCE_IDENTITY_CACHE = {
+    'TTL': 300,  # seconds
+    'NEGATIVE_TTL': 60,  # seconds to remember unknown IDs
+    'MAX_ENTRIES': 50000,
+}
+
+# Per-office working hours policies used to classify attendance status
+ATTENDANCE_WORKING_HOURS = {
+    'TTL': 60,  # seconds; bounds how long another process keeps classifying with edited settings
+}
+
+# Deferred audit log / notification writes from model signals
+ATTENDANCE_SIDE_EFFECTS = {
+    'ASYNC': True,  # False writes at transaction commit in the saving thread
+    'FLUSH_INTERVAL': 1.0,  # seconds to collect writes before a batch insert
+    'BATCH_SIZE': 500,
+    'MAX_RETRIES': 3,  # flushes a failed write is retried on before it is logged and dropped
+}
+
+# Background report jobs (results stored under MEDIA_ROOT/reports/)
+ATTENDANCE_REPORT_JOBS = {
+    'WORKERS': 2,  # report threads per process
+    'JOB_TIMEOUT': 1800,  # seconds before an unfinished job is considered abandoned
+    'RESULT_RETENTION': 7 * 24 * 3600,  # seconds finished jobs and their files are kept (purge_report_jobs)
+}
+
+# Streaming CSV / NDJSON report exports
+ATTENDANCE_REPORT_EXPORT = {
+    'CHUNK_SIZE': 2000,  # rows per keyset query
+}
+
+# Cached payloads of hot read endpoints, invalidated by model signals
+ATTENDANCE_RESPONSE_CACHE = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TTL': 60,  # seconds; bounds staleness across processes with the local memory cache
+}
+
+# Cluster-wide lease so only one process runs the attendance poller
+ATTENDANCE_POLLER_LEASE = {
+    'ENABLED': True,
+    'NAME': 'attendance-poller',
+    'TTL': 30,  # seconds without a heartbeat before another process takes over
+    'HEARTBEAT_INTERVAL': 10,  # seconds between renewals (and takeover attempts)
+}
+
+# Sharded polling: every poller process polls its consistent-hash share of the
+# devices instead of a single lease holder polling all of them
+ATTENDANCE_POLLER_SHARDING = {
+    'ENABLED': os.environ.get('ATTENDANCE_POLLER_SHARDED', '').lower() in ('1', 'true', 'yes'),
+    'TTL': 30,  # seconds without a heartbeat before an instance is dropped from the ring
+    'HEARTBEAT_INTERVAL': 10,
+    'VIRTUAL_NODES': 100,  # ring points per instance; more spreads devices more evenly
+}
+
+# Adaptive polling: poll fast while punches arrive, back off when devices are idle
+ATTENDANCE_ADAPTIVE_POLLING = {
+    'ENABLED': True,
+    'FAST_INTERVAL': 30,  # seconds between polls in active windows and right after new punches
+    'FRESHNESS_SLO': 900,  # longest a punch may sit on a device before it is fetched, in seconds
+    'ACTIVE_WINDOWS': [('08:30', '09:15'), ('17:30', '18:15')],  # local time
+    'ACTIVE_DAYS': [0, 1, 2, 3, 4],  # Monday is 0
+    'WORKING_HOURS': ('08:00', '19:00'),  # Device.sync_interval caps the interval in these hours
+    'RATE_HALF_LIFE': 900,  # seconds; how fast the punch rate average forgets
+    'TARGET_PUNCHES': 1.0,  # punches expected between two idle polls
+}
+
+# Per-device circuit breaker: stop connecting to unreachable devices on every poll
+ATTENDANCE_DEVICE_BREAKER = {
+    'ENABLED': True,
+    'FAILURE_THRESHOLD': 3,  # consecutive failed polls before the circuit opens
+    'BASE_BACKOFF': 30,  # seconds open after the first opening, doubling with each reopening
+    'MAX_BACKOFF': 1800,
+    'PROBE_TIMEOUT': 2.0,  # seconds for the TCP reachability probe before a full connect
+    'TRIAL_TIMEOUT': 120,  # seconds before an unanswered half-open trial is retried
+}
+
 # Create logs directory if it doesn't exist
 os.makedirs(BASE_DIR / 'logs', exist_ok=True)
\ No newline at end of file
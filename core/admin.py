@@ -71,7 +71,7 @@ class DeviceUserAdmin(admin.ModelAdmin):
 @admin.register(Attendance)
 class AttendanceAdmin(admin.ModelAdmin):
     list_display = ['user', 'date', 'check_in_time', 'check_out_time', 'total_hours', 'status', 'device']
-    list_filter = ['status', 'date', 'device', 'user__office']
+    list_filter = ['status', 'date', 'device', 'office']
     search_fields = ['user__first_name', 'user__last_name', 'user__employee_id', 'notes']
     ordering = ['-date', '-check_in_time']
     readonly_fields = ['id', 'total_hours', 'created_at', 'updated_at']
@@ -81,7 +81,7 @@ class AttendanceAdmin(admin.ModelAdmin):
 @admin.register(Leave)
 class LeaveAdmin(admin.ModelAdmin):
     list_display = ['user', 'leave_type', 'start_date', 'end_date', 'total_days', 'status', 'approved_by']
-    list_filter = ['leave_type', 'status', 'start_date', 'end_date', 'user__office']
+    list_filter = ['leave_type', 'status', 'start_date', 'end_date', 'office']
     search_fields = ['user__first_name', 'user__last_name', 'reason']
     ordering = ['-created_at']
     readonly_fields = ['id', 'approved_at', 'created_at', 'updated_at']
@@ -103,7 +103,7 @@ class LeaveAdmin(admin.ModelAdmin):
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
     list_display = ['title', 'user', 'document_type', 'uploaded_by', 'created_at']
-    list_filter = ['document_type', 'created_at', 'user__office']
+    list_filter = ['document_type', 'created_at', 'office']
     search_fields = ['title', 'description', 'user__first_name', 'user__last_name']
     ordering = ['-created_at']
     readonly_fields = ['id', 'created_at', 'updated_at']
@@ -142,7 +142,7 @@ class SystemSettingsAdmin(admin.ModelAdmin):
 @admin.register(AttendanceLog)
 class AttendanceLogAdmin(admin.ModelAdmin):
     list_display = ['attendance', 'action', 'changed_by', 'created_at']
-    list_filter = ['action', 'created_at', 'attendance__user__office']
+    list_filter = ['action', 'created_at', 'attendance__office']
     search_fields = ['attendance__user__first_name', 'attendance__user__last_name', 'action']
     ordering = ['-created_at']
     readonly_fields = ['id', 'created_at']
@@ -13,6 +13,9 @@ class CoreConfig(AppConfig):
         import os
         import sys
         
+        # Connect signal receivers (side effects and cache invalidation)
+        from . import signals, identity_cache, working_hours, response_cache  # noqa: F401
+        
         # Only start services if not in management command mode and not in test mode
         if (os.environ.get('RUN_MAIN') != 'true' and 
             not self._is_management_command() and 
@@ -48,9 +51,11 @@ class CoreConfig(AppConfig):
                     # Import the service
                     from .management.commands.auto_fetch_attendance import auto_attendance_service
                     
-                    logger.info("🚀 Starting automatic attendance fetching service...")
-                    auto_attendance_service.start()
-                    logger.info("✅ Automatic attendance fetching service started successfully")
+                    # Every worker contends for the poller lease (or joins the shard ring);
+                    # only the lease holder, or each device's shard owner, polls a device
+                    logger.info("🚀 Starting automatic attendance fetching service coordination...")
+                    auto_attendance_service.start_coordinated()
+                    logger.info("✅ Automatic attendance fetching service coordination started")
                 except Exception as e:
                     logger.error(f"❌ Failed to start automatic attendance fetching service: {str(e)}")
             
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Attendance Audit
+Helpers for the AttendanceLog audit trail. Updates record only the fields that
+actually changed (old and new values side by side) and nothing at all when a
+save changes nothing. Bulk paths that bypass post_save use
+log_bulk_changes() so the trail stays complete.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from django.utils import timezone
+
+from .models import AttendanceLog
+
+# Attendance fields tracked in the audit trail
+AUDIT_FIELDS = ('date', 'status', 'check_in_time', 'check_out_time', 'notes')
+
+
+def _normalize(value):
+    """Comparable form of a value: aware datetimes in the current time zone
+
+    Rows loaded from the database carry UTC datetimes while rollups assign
+    local ones, so the same instant must serialize to the same string.
+    """
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value)
+    return value
+
+
+def _serialize(value):
+    value = _normalize(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def audit_values(attendance):
+    """JSON-ready values of the audited fields"""
+    return {field: _serialize(getattr(attendance, field)) for field in AUDIT_FIELDS}
+
+
+def created_values(attendance):
+    """Values stored for a newly created attendance row"""
+    return {'user': attendance.user.get_full_name(), **audit_values(attendance)}
+
+
+def loaded_values(attendance):
+    """Audited values as last loaded from or saved to the database, if known"""
+    loaded = getattr(attendance, '_loaded_values', None)
+    if loaded is None or any(field not in loaded for field in AUDIT_FIELDS):
+        return None
+    return {field: _serialize(loaded[field]) for field in AUDIT_FIELDS}
+
+
+def remember_state(attendance):
+    """Record the current values as the baseline for the next diff"""
+    attendance._loaded_values = {field: getattr(attendance, field) for field in AUDIT_FIELDS}
+
+
+def diff_values(old_values, new_values):
+    """(old, new) dicts restricted to the fields whose value differs"""
+    changed = [field for field in new_values if old_values.get(field) != new_values[field]]
+    return (
+        {field: old_values.get(field) for field in changed},
+        {field: new_values[field] for field in changed},
+    )
+
+
+def merge_changes(first, second):
+    """Coalesce two queued audit entries (action, old, new) for the same row"""
+    action, old_values, new_values = first
+    _, next_old, next_new = second
+
+    if action == 'created':
+        return action, None, {**(new_values or {}), **(next_new or {})}
+
+    old_values = dict(old_values or {})
+    new_values = dict(new_values or {})
+    for field, value in (next_old or {}).items():
+        old_values.setdefault(field, value)
+    new_values.update(next_new or {})
+
+    # Fields changed and then changed back are no change at all
+    for field in [f for f in new_values if f in old_values and old_values[f] == new_values[f]]:
+        del old_values[field]
+        del new_values[field]
+    return action, old_values, new_values
+
+
+def build_change_log(attendance, previous_values, changed_by_id=None):
+    """Unsaved AttendanceLog for one row, or None when nothing changed
+
+    previous_values is None for newly created rows.
+    """
+    if previous_values is None:
+        return AttendanceLog(
+            attendance=attendance,
+            action='created',
+            old_values=None,
+            new_values=created_values(attendance),
+            changed_by_id=changed_by_id or attendance.user_id
+        )
+
+    old_values, new_values = diff_values(previous_values, audit_values(attendance))
+    if not new_values:
+        return None
+    return AttendanceLog(
+        attendance=attendance,
+        action='updated',
+        old_values=old_values,
+        new_values=new_values,
+        changed_by_id=changed_by_id or attendance.user_id
+    )
+
+
+def log_bulk_changes(changes, changed_by_id=None, batch_size=500):
+    """Write the audit trail for bulk_create/bulk_update with one bulk INSERT
+
+    changes is an iterable of (attendance, previous_values) pairs, where
+    previous_values is the audit_values() dict from before the change, or None
+    for created rows. Returns the number of entries written.
+    """
+    changes = list(changes)
+    logs = [log for log in (build_change_log(a, previous, changed_by_id) for a, previous in changes) if log]
+    if logs:
+        AttendanceLog.objects.bulk_create(logs, batch_size=batch_size)
+    for attendance, _ in changes:
+        remember_state(attendance)
+    return len(logs)
+
+
+def log_value_changes(changes, changed_by_id=None, batch_size=500):
+    """Write 'updated' entries for rows changed without loading them
+
+    changes is an iterable of (attendance_id, old_values, new_values, user_id)
+    tuples; user_id is recorded as the changer when changed_by_id is not given.
+    """
+    logs = [
+        AttendanceLog(
+            attendance_id=attendance_id,
+            action='updated',
+            old_values=old_values,
+            new_values=new_values,
+            changed_by_id=changed_by_id or user_id
+        )
+        for attendance_id, old_values, new_values, user_id in changes
+        if new_values
+    ]
+    if logs:
+        AttendanceLog.objects.bulk_create(logs, batch_size=batch_size)
+    return len(logs)
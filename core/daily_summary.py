@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Daily Office Summary
+Maintains DailyOfficeSummary, the per-office daily attendance counts read by the
+dashboard and report endpoints. Changed (office, date) keys are recomputed with
+one GROUP BY query and upserted; historical ranges can be rebuilt in bulk.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .db_manager import bulk_upsert
+from .models import Attendance, DailyOfficeSummary
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_STATUSES = ('present', 'late', 'half_day', 'absent', 'leave')
+SUMMARY_FIELDS = tuple(f"{status}_count" for status in SUMMARY_STATUSES) + ('total_records', 'total_hours')
+
+
+class DailySummaryService:
+    """Refresh and read the DailyOfficeSummary materialization"""
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _aggregate(queryset):
+        """Per (office, date) counts straight from the Attendance fact table"""
+        rows = queryset.exclude(office__isnull=True).values('office_id', 'date').annotate(
+            total_records=Count('id'),
+            total_hours=Sum('total_hours'),
+            **{f"{status}_count": Count('id', filter=Q(status=status)) for status in SUMMARY_STATUSES}
+        )
+        return {
+            (row['office_id'], row['date']): {
+                **{field: row[field] for field in SUMMARY_FIELDS if field != 'total_hours'},
+                'total_hours': row['total_hours'] or Decimal('0'),
+            }
+            for row in rows
+        }
+
+    def _upsert(self, computed):
+        summaries = [
+            DailyOfficeSummary(office_id=office_id, date=day, **values)
+            for (office_id, day), values in computed.items()
+        ]
+        bulk_upsert(DailyOfficeSummary, summaries, ['office', 'date'], list(SUMMARY_FIELDS) + ['updated_at'],
+                    batch_size=self.batch_size)
+
+    def refresh(self, keys):
+        """Recompute the summaries of the given (office_id, date) keys"""
+        keys = {(office_id, day) for office_id, day in keys if office_id and day}
+        if not keys:
+            return 0
+
+        dates_by_office = defaultdict(set)
+        for office_id, day in keys:
+            dates_by_office[office_id].add(day)
+
+        office_filter = Q()
+        for office_id, dates in dates_by_office.items():
+            office_filter |= Q(office_id=office_id, date__in=dates)
+
+        computed = {
+            key: values
+            for key, values in self._aggregate(Attendance.objects.filter(office_filter)).items()
+            if key in keys
+        }
+
+        with transaction.atomic():
+            self._upsert(computed)
+            # Keys whose last attendance row went away
+            empty = keys - set(computed)
+            if empty:
+                empty_filter = Q()
+                for office_id, day in empty:
+                    empty_filter |= Q(office_id=office_id, date=day)
+                DailyOfficeSummary.objects.filter(empty_filter).delete()
+
+        return len(keys)
+
+    def rebuild(self, start_date, end_date, office_id=None, chunk_days=31):
+        """Recompute every summary between two dates (inclusive), chunk by chunk"""
+        total = 0
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+
+            queryset = Attendance.objects.filter(date__range=(chunk_start, chunk_end))
+            summaries = DailyOfficeSummary.objects.filter(date__range=(chunk_start, chunk_end))
+            if office_id:
+                queryset = queryset.filter(office_id=office_id)
+                summaries = summaries.filter(office_id=office_id)
+
+            computed = self._aggregate(queryset)
+            with transaction.atomic():
+                summaries.delete()
+                self._upsert(computed)
+
+            total += len(computed)
+            chunk_start = chunk_end + timedelta(days=1)
+
+        logger.info(f"📊 Rebuilt {total} daily office summaries from {start_date} to {end_date}")
+        return total
+
+    @staticmethod
+    def totals(start_date, end_date=None, office_id=None):
+        """Summed counts over a date range (optionally one office), in one query"""
+        queryset = DailyOfficeSummary.objects.filter(date__range=(start_date, end_date or start_date))
+        if office_id:
+            queryset = queryset.filter(office_id=office_id)
+        totals = queryset.aggregate(**{field: Sum(field) for field in SUMMARY_FIELDS})
+        return {field: value or 0 for field, value in totals.items()}
+
+    @staticmethod
+    def daily(start_date=None, end_date=None, office_id=None):
+        """Counts per date (summed over offices unless one is given), oldest first"""
+        queryset = DailyOfficeSummary.objects.all()
+        if start_date:
+            queryset = queryset.filter(date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(date__lte=end_date)
+        if office_id:
+            queryset = queryset.filter(office_id=office_id)
+        return list(
+            queryset.values('date')
+            .annotate(**{field: Sum(field) for field in SUMMARY_FIELDS})
+            .order_by('date')
+        )
+
+
+def attendance_summary_keys(attendances):
+    """(office_id, user_id, date) summary keys touched by attendance rows"""
+    return {(attendance.office_id, attendance.user_id, attendance.date) for attendance in attendances}
+
+
+# Global daily summary service instance
+daily_summary_service = DailySummaryService()
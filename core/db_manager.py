@@ -8,7 +8,8 @@ import logging
 import time
 import threading
 from contextlib import contextmanager
-from django.db import connection, connections, close_old_connections
+from django.db import connection, connections, close_old_connections, router
+from django.db.models import Q
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
@@ -132,3 +133,52 @@ def with_db_connection(func):
 def close_db_connections():
     """Close all database connections"""
     db_manager.close_idle_connections()
+
+# Utility function for summary tables keyed on a unique constraint
+def bulk_upsert(model, objs, unique_fields, update_fields, batch_size=500):
+    """Insert rows or update the ones that already exist on unique_fields
+
+    PostgreSQL and SQLite use INSERT ... ON CONFLICT (unique_fields), MySQL
+    (no conflict target) uses ON DUPLICATE KEY UPDATE, and any other backend
+    falls back to selecting the existing rows and bulk_update/bulk_create.
+    """
+    if not objs:
+        return
+    db = router.db_for_write(model)
+    features = connections[db].features
+    manager = model._default_manager.db_manager(db)
+
+    if features.supports_update_conflicts_with_target:
+        manager.bulk_create(objs, batch_size=batch_size, update_conflicts=True,
+                            unique_fields=unique_fields, update_fields=update_fields)
+        return
+    if features.supports_update_conflicts:
+        manager.bulk_create(objs, batch_size=batch_size, update_conflicts=True, update_fields=update_fields)
+        return
+
+    attnames = [model._meta.get_field(name).attname for name in unique_fields]
+    update_model_fields = [model._meta.get_field(name) for name in update_fields]
+    for start in range(0, len(objs), batch_size):
+        batch = objs[start:start + batch_size]
+        condition = Q()
+        for obj in batch:
+            condition |= Q(**{attname: getattr(obj, attname) for attname in attnames})
+        existing = {
+            tuple(row[:-1]): row[-1]
+            for row in manager.filter(condition).select_for_update().values_list(*attnames, 'pk')
+        }
+
+        to_update, to_create = [], []
+        for obj in batch:
+            pk = existing.get(tuple(getattr(obj, attname) for attname in attnames))
+            if pk is None:
+                to_create.append(obj)
+                continue
+            obj.pk = pk
+            for field in update_model_fields:
+                field.pre_save(obj, add=False)  # auto_now columns such as updated_at
+            to_update.append(obj)
+        if to_update:
+            manager.bulk_update(to_update, update_fields)
+        if to_create:
+            manager.bulk_create(to_create)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Attendance Dedup Index
+Compact, time-windowed index of punches the poller has already processed.
+Keys are deterministic (blake2b) so they can be persisted and shared between
+processes, and each device's index is bounded by a time window and a size cap.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class FileDedupStore:
+    """Persist dedup entries as one JSON file per device on local disk"""
+
+    def __init__(self, state_dir):
+        self.state_dir = str(state_dir)
+
+    def _path(self, device_id):
+        return os.path.join(self.state_dir, f"dedup_{device_id}.json")
+
+    def load(self, device_id):
+        try:
+            with open(self._path(device_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load dedup index for device {device_id}: {str(e)}")
+            return []
+
+    def save(self, device_id, entries):
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self._path(device_id)
+        tmp_path = f"{path}.tmp"
+        # Write-then-rename so a crash mid-write never leaves a truncated index
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, path)
+
+
+class CacheDedupStore:
+    """Persist dedup entries in a Django cache backend (e.g. Redis) shared by all workers"""
+
+    def __init__(self, alias='default', timeout=None):
+        self.alias = alias
+        self.timeout = timeout
+
+    def _cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def load(self, device_id):
+        return self._cache().get(f"attendance_dedup:{device_id}") or []
+
+    def save(self, device_id, entries):
+        self._cache().set(f"attendance_dedup:{device_id}", entries, self.timeout)
+
+
+class AttendanceDedupIndex:
+    """Bounded per-device index of processed punch keys
+
+    Each device keeps an insertion-ordered map of key -> punch epoch seconds.
+    Entries older than the window, or beyond max_entries, are evicted oldest-first.
+    Punches that fall outside the window are not lost: they are simply checked
+    against the database again.
+    """
+
+    def __init__(self, store, window_hours=48, max_entries_per_device=10000):
+        self.store = store
+        self.window_seconds = window_hours * 3600
+        self.max_entries = max_entries_per_device
+        self._entries = {}  # device_id -> OrderedDict(key -> punch epoch seconds)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """Build the index from the ATTENDANCE_DEDUP setting"""
+        config = getattr(settings, 'ATTENDANCE_DEDUP', {})
+        if config.get('STORE', 'file') == 'cache':
+            store = CacheDedupStore(config.get('CACHE_ALIAS', 'default'))
+        else:
+            store = FileDedupStore(config.get('STATE_DIR', os.path.join(settings.BASE_DIR, 'state')))
+
+        return cls(
+            store,
+            window_hours=config.get('WINDOW_HOURS', 48),
+            max_entries_per_device=config.get('MAX_ENTRIES_PER_DEVICE', 10000),
+        )
+
+    @staticmethod
+    def make_key(device_id, user_id, timestamp, status):
+        """Deterministic 64-bit key for a punch (stable across processes and restarts)"""
+        raw = f"{device_id}_{user_id}_{timestamp}_{status}".encode()
+        return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'big')
+
+    @staticmethod
+    def punch_epoch(timestamp):
+        """Epoch seconds of a (possibly naive) device timestamp"""
+        if isinstance(timestamp, datetime):
+            if timezone.is_naive(timestamp):
+                timestamp = timezone.make_aware(timestamp, timezone.get_current_timezone())
+            return int(timestamp.timestamp())
+        return int(time.time())
+
+    def _device_entries(self, device_id):
+        device_id = str(device_id)
+        entries = self._entries.get(device_id)
+        if entries is None:
+            entries = OrderedDict((int(key), int(epoch)) for key, epoch in self.store.load(device_id))
+            self._entries[device_id] = entries
+        return entries
+
+    def load(self, device_id):
+        """Load a device's persisted entries (done lazily on first use otherwise)"""
+        with self._lock:
+            self._evict(self._device_entries(device_id))
+
+    def seen(self, device_id, key):
+        """Check whether a punch key was already processed"""
+        with self._lock:
+            return key in self._device_entries(device_id)
+
+    def add(self, device_id, key, timestamp):
+        """Record a processed punch"""
+        with self._lock:
+            entries = self._device_entries(device_id)
+            entries[key] = self.punch_epoch(timestamp)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def _evict(self, entries):
+        cutoff = int(time.time()) - self.window_seconds
+        stale = [key for key, epoch in entries.items() if epoch < cutoff]
+        for key in stale:
+            del entries[key]
+        return len(stale)
+
+    def evict_and_save(self, device_id):
+        """Drop entries outside the time window and persist the device's index"""
+        with self._lock:
+            entries = self._device_entries(device_id)
+            evicted = self._evict(entries)
+            snapshot = list(entries.items())
+
+        try:
+            self.store.save(str(device_id), snapshot)
+        except Exception as e:
+            logger.warning(f"Could not persist dedup index for device {device_id}: {str(e)}")
+        return evicted
+
+    def size(self, device_id=None):
+        """Number of entries held for one device, or for all devices"""
+        with self._lock:
+            if device_id is not None:
+                return len(self._entries.get(str(device_id), ()))
+            return sum(len(entries) for entries in self._entries.values())
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Device Circuit Breaker
+Stops the poller from spending a full protocol connect timeout on a terminal
+that is unplugged or broken every time it comes due. Each device (keyed by
+ip:port) has a breaker:
+
+- closed: polls go through. After FAILURE_THRESHOLD consecutive failures
+  it opens.
+- open: no connection is attempted until a backoff has passed. The backoff
+  doubles with every consecutive opening (with jitter, so many dead devices
+  do not come back in lockstep) up to MAX_BACKOFF.
+- half-open: a single trial poll is let through. Success closes the
+  breaker, failure opens it again with a longer backoff.
+
+Before a full connect, callers run a cheap TCP probe that fails fast when
+nothing is listening. Transitions are written to Device.device_status:
+'offline' when the device stopped answering on its port, 'error' when it
+answers but the protocol fails, and 'online' when it recovers.
+"""
+
+import logging
+import random
+import socket
+import threading
+import time
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Device
+from .response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceCircuitBreaker:
+    """Per-device closed/open/half-open state with jittered exponential backoff"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, enabled=True, failure_threshold=3, base_backoff=30, max_backoff=1800,
+                 probe_timeout=2.0, trial_timeout=120):
+        self.enabled = enabled
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff  # seconds open after the first opening
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout  # seconds for the TCP reachability probe
+        self.trial_timeout = trial_timeout  # seconds before an unanswered half-open trial is given up
+        self._circuits = {}  # ip:port -> circuit state dict
+        self._lock = threading.Lock()
+        self.stats = {'opened': 0, 'closed': 0, 'rejected': 0, 'probe_failures': 0}
+
+    @classmethod
+    def from_settings(cls):
+        """Build the breaker from the ATTENDANCE_DEVICE_BREAKER setting"""
+        config = getattr(settings, 'ATTENDANCE_DEVICE_BREAKER', {})
+        return cls(
+            enabled=config.get('ENABLED', True),
+            failure_threshold=config.get('FAILURE_THRESHOLD', 3),
+            base_backoff=config.get('BASE_BACKOFF', 30),
+            max_backoff=config.get('MAX_BACKOFF', 1800),
+            probe_timeout=config.get('PROBE_TIMEOUT', 2.0),
+            trial_timeout=config.get('TRIAL_TIMEOUT', 120),
+        )
+
+    @staticmethod
+    def _key(ip_address, port):
+        return f"{ip_address}:{port}"
+
+    def _circuit(self, key):
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            circuit = self._circuits[key] = {
+                'state': self.CLOSED,
+                'failures': 0,  # consecutive failed polls
+                'openings': 0,  # consecutive openings without a recovery, drives the backoff
+                'retry_at': 0.0,  # monotonic time the open circuit lets a trial through
+                'reachable': True,  # result of the last TCP probe
+                'status': None,  # device_status this process last wrote
+                'last_error': '',
+                'changed_at': None,
+            }
+        return circuit
+
+    def _backoff(self, openings):
+        delay = min(self.base_backoff * 2 ** (openings - 1), self.max_backoff)
+        # Equal jitter: at least half the backoff, so dead devices never retry early
+        return random.uniform(delay / 2, delay)
+
+    def state(self, ip_address, port):
+        with self._lock:
+            circuit = self._circuits.get(self._key(ip_address, port))
+            return circuit['state'] if circuit else self.CLOSED
+
+    def allow(self, ip_address, port):
+        """Whether a poll of the device may go ahead now (claims the half-open trial)"""
+        if not self.enabled:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuit(self._key(ip_address, port))
+            if circuit['state'] == self.CLOSED:
+                return True
+            if now < circuit['retry_at']:
+                self.stats['rejected'] += 1
+                return False
+            # Backoff over (or the previous trial never reported back): let one trial through
+            circuit['state'] = self.HALF_OPEN
+            circuit['retry_at'] = now + self.trial_timeout
+            return True
+
+    def retry_in(self, ip_address, port):
+        """Seconds until the device may be tried again (0 when its breaker is closed)"""
+        with self._lock:
+            circuit = self._circuits.get(self._key(ip_address, port))
+            if not circuit or circuit['state'] == self.CLOSED:
+                return 0.0
+            return max(circuit['retry_at'] - time.monotonic(), 0.0)
+
+    def probe(self, ip_address, port):
+        """Cheap TCP reachability check before a full protocol connect"""
+        if not self.enabled:
+            return True
+        try:
+            with socket.create_connection((ip_address, port), timeout=self.probe_timeout):
+                reachable = True
+        except OSError:
+            reachable = False
+        with self._lock:
+            self._circuit(self._key(ip_address, port))['reachable'] = reachable
+            if not reachable:
+                self.stats['probe_failures'] += 1
+        return reachable
+
+    def record_success(self, ip_address, port):
+        if not self.enabled:
+            return
+        key = self._key(ip_address, port)
+        with self._lock:
+            circuit = self._circuit(key)
+            recovered = circuit['state'] != self.CLOSED
+            circuit.update(state=self.CLOSED, failures=0, openings=0, retry_at=0.0, reachable=True, last_error='')
+            if recovered:
+                circuit['changed_at'] = timezone.now()
+                self.stats['closed'] += 1
+            write_status = circuit['status'] != 'online'
+            circuit['status'] = 'online'
+        if recovered:
+            logger.info(f"✅ Device {key} recovered, circuit closed")
+        if write_status:
+            self._write_status(ip_address, port, 'online')
+
+    def record_failure(self, ip_address, port, error=''):
+        if not self.enabled:
+            return
+        key = self._key(ip_address, port)
+        with self._lock:
+            circuit = self._circuit(key)
+            circuit['failures'] += 1
+            circuit['last_error'] = str(error)
+            if circuit['state'] == self.CLOSED and circuit['failures'] < self.failure_threshold:
+                return
+            circuit['openings'] += 1
+            delay = self._backoff(circuit['openings'])
+            reopened = circuit['state'] == self.HALF_OPEN
+            circuit.update(state=self.OPEN, retry_at=time.monotonic() + delay, changed_at=timezone.now())
+            self.stats['opened'] += 1
+            status = 'offline' if not circuit['reachable'] else 'error'
+            write_status = circuit['status'] != status
+            circuit['status'] = status
+            failures = circuit['failures']
+        if reopened:
+            logger.info(f"🔌 Device {key} still failing, circuit reopened for {delay:.0f}s")
+        else:
+            logger.warning(f"🔌 Device {key} failed {failures} times ({status}), "
+                           f"circuit open for {delay:.0f}s")
+        if write_status:
+            self._write_status(ip_address, port, status)
+
+    def _write_status(self, ip_address, port, status):
+        """Persist a transition on the device rows and drop cached payloads that show it"""
+        try:
+            devices = Device.objects.filter(ip_address=ip_address, port=port).exclude(device_status=status)
+            offices = list(devices.values_list('office_id', flat=True).distinct())
+            if devices.update(device_status=status):
+                response_cache.invalidate('device', offices)
+        except Exception as e:
+            logger.warning(f"Could not record status {status} of device {ip_address}:{port}: {str(e)}")
+
+    def get_status(self):
+        """Counters and every circuit that is not closed"""
+        now = time.monotonic()
+        with self._lock:
+            circuits = [
+                {
+                    'device': key,
+                    'state': circuit['state'],
+                    'failures': circuit['failures'],
+                    'retry_in': round(max(circuit['retry_at'] - now, 0.0), 1),
+                    'last_error': circuit['last_error'],
+                    'changed_at': circuit['changed_at'],
+                }
+                for key, circuit in self._circuits.items()
+                if circuit['state'] != self.CLOSED
+            ]
+            stats = dict(self.stats)
+        return {'enabled': self.enabled, **stats, 'circuits': circuits}
+
+
+# Global device circuit breaker instance
+device_breaker = DeviceCircuitBreaker.from_settings()
@@ -6,6 +6,9 @@ from django.utils import timezone
 from django.db import transaction
 from django.core.exceptions import ValidationError
 from .models import Device, ESSLAttendanceLog, Attendance, CustomUser, WorkingHoursSettings
+from .ingest_service import AttendanceIngestService
+from .rollup_service import rollup_service
+from .monthly_summary import monthly_summary_service, month_bounds, STANDARD_DAILY_HOURS
 
 logger = logging.getLogger(__name__)
 
@@ -107,131 +110,13 @@ class ESSLDeviceService:
     
     def _process_attendance_data(self, attendance_data):
         """Process raw attendance data from ESSL device"""
-        processed_count = 0
+        records = attendance_data.get('attendance_records', [])
+        result = AttendanceIngestService(self.device).ingest(records)
         
-        with transaction.atomic():
-            for record in attendance_data.get('attendance_records', []):
-                try:
-                    biometric_id = record.get('biometric_id')
-                    punch_time_str = record.get('punch_time')
-                    punch_type = record.get('punch_type', 'in')
-                    
-                    if not biometric_id or not punch_time_str:
-                        continue
-                    
-                    # Parse punch time
-                    punch_time = datetime.fromisoformat(punch_time_str.replace('Z', '+00:00'))
-                    punch_time = timezone.make_aware(punch_time)
-                    
-                    # Check if record already exists
-                    existing_log = ESSLAttendanceLog.objects.filter(
-                        device=self.device,
-                        biometric_id=biometric_id,
-                        punch_time=punch_time
-                    ).first()
-                    
-                    if existing_log:
-                        continue
-                    
-                    # Find user by biometric ID
-                    user = CustomUser.objects.filter(biometric_id=biometric_id).first()
-                    
-                    # Create ESSL attendance log
-                    essl_log = ESSLAttendanceLog.objects.create(
-                        device=self.device,
-                        biometric_id=biometric_id,
-                        user=user,
-                        punch_time=punch_time,
-                        punch_type=punch_type,
-                        is_processed=False
-                    )
-                    
-                    # Process attendance record
-                    if user:
-                        self._process_user_attendance(user, essl_log)
-                    
-                    processed_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error processing attendance record: {str(e)}")
-                    continue
+        # Roll the newly stored punches up into daily attendance
+        rollup_service.rollup(result['logs'])
         
-        return processed_count
-    
-    def _process_user_attendance(self, user, essl_log):
-        """Process attendance for a specific user"""
-        try:
-            punch_date = essl_log.punch_time.date()
-            
-            # Get or create attendance record for the day
-            attendance, created = Attendance.objects.get_or_create(
-                user=user,
-                date=punch_date,
-                defaults={
-                    'status': 'present',
-                    'device': self.device
-                }
-            )
-            
-            # Update check-in/check-out times
-            if essl_log.punch_type == 'in':
-                if not attendance.check_in_time or essl_log.punch_time < attendance.check_in_time:
-                    attendance.check_in_time = essl_log.punch_time
-            elif essl_log.punch_type == 'out':
-                if not attendance.check_out_time or essl_log.punch_time > attendance.check_out_time:
-                    attendance.check_out_time = essl_log.punch_time
-            
-            # Calculate status based on working hours
-            attendance.status = self._calculate_attendance_status(attendance, user.office)
-            
-            attendance.save()
-            
-            # Mark ESSL log as processed
-            essl_log.is_processed = True
-            essl_log.save()
-            
-        except Exception as e:
-            logger.error(f"Error processing user attendance: {str(e)}")
-    
-    def _calculate_attendance_status(self, attendance, office):
-        """Calculate attendance status based on working hours settings"""
-        try:
-            # Get working hours settings for the office
-            settings = WorkingHoursSettings.objects.filter(office=office).first()
-            if not settings:
-                # Use default settings
-                settings = WorkingHoursSettings(
-                    office=office,
-                    standard_hours=9.0,
-                    start_time=time(9, 0),
-                    end_time=time(18, 0),
-                    late_threshold=15,
-                    half_day_threshold=240
-                )
-            
-            if not attendance.check_in_time:
-                return 'absent'
-            
-            # Check if late
-            start_datetime = timezone.make_aware(
-                datetime.combine(attendance.date, settings.start_time)
-            )
-            late_threshold = start_datetime + timedelta(minutes=settings.late_threshold)
-            
-            if attendance.check_in_time > late_threshold:
-                return 'late'
-            
-            # Check if half day
-            if attendance.check_out_time:
-                total_minutes = (attendance.check_out_time - attendance.check_in_time).total_seconds() / 60
-                if total_minutes < settings.half_day_threshold:
-                    return 'half_day'
-            
-            return 'present'
-            
-        except Exception as e:
-            logger.error(f"Error calculating attendance status: {str(e)}")
-            return 'present'
+        return result['inserted']
     
     def get_user_list(self):
         """Get list of users registered on the ESSL device"""
@@ -513,64 +398,39 @@ class AttendanceReportService:
     
     @staticmethod
     def get_monthly_attendance_report(office_id=None, year=None, month=None):
-        """Generate monthly attendance report"""
+        """Generate monthly attendance report from the monthly user summaries"""
         if not year or not month:
             current_date = timezone.now()
             year = current_date.year
             month = current_date.month
         
-        start_date = datetime(year, month, 1).date()
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
-        
-        # Get users
-        users_query = CustomUser.objects.filter(role='employee', is_active=True)
-        if office_id:
-            users_query = users_query.filter(office_id=office_id)
-        
-        users = users_query.select_related('office')
+        start_date, end_date = month_bounds(year, month)
+        total_days = (end_date - start_date).days + 1
+        standard_hours = float(STANDARD_DAILY_HOURS) * total_days
         
+        # One query: active employees LEFT JOINed with their summary for the month
         report_data = []
-        for user in users:
-            # Get attendance records for the month
-            attendance_records = Attendance.objects.filter(
-                user=user,
-                date__range=[start_date, end_date]
-            )
-            
-            # Calculate statistics
-            total_days = (end_date - start_date).days + 1
-            present_days = attendance_records.filter(status='present').count()
-            absent_days = attendance_records.filter(status='absent').count()
-            late_days = attendance_records.filter(status='late').count()
-            half_days = attendance_records.filter(status='half_day').count()
-            
-            # Calculate total hours
-            total_hours = sum([
-                record.total_hours or 0 
-                for record in attendance_records 
-                if record.total_hours
-            ])
+        for row in monthly_summary_service.report_rows(year, month, office_id=office_id):
+            present_days = row['present_days'] or 0
+            total_hours = float(row['total_hours'] or 0)
             
             # Calculate attendance percentage
             attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
             
             report_data.append({
-                'user_id': user.id,
-                'user_name': user.get_full_name(),
-                'employee_id': user.employee_id,
-                'office': user.office.name if user.office else '',
+                'user_id': row['id'],
+                'user_name': f"{row['first_name']} {row['last_name']}".strip(),
+                'employee_id': row['employee_id'],
+                'office': row['office_name'] or '',
                 'total_days': total_days,
                 'present_days': present_days,
-                'absent_days': absent_days,
-                'late_days': late_days,
-                'half_days': half_days,
+                'absent_days': row['absent_days'] or 0,
+                'late_days': row['late_days'] or 0,
+                'half_days': row['half_days'] or 0,
                 'total_hours': round(total_hours, 2),
                 'attendance_percentage': round(attendance_percentage, 2),
-                'standard_hours': 9.0 * total_days,  # 9 hours per day
-                'hours_deficit': max(0, (9.0 * total_days) - total_hours)
+                'standard_hours': standard_hours,
+                'hours_deficit': float(row['hours_deficit']) if row['hours_deficit'] is not None else standard_hours
             })
         
         return {
@@ -11,9 +11,11 @@ from .models import Device, ESSLAttendanceLog, CustomUser, WorkingHoursSettings
 from .serializers import (
     DeviceSerializer, ESSLAttendanceLogSerializer, 
     WorkingHoursSettingsSerializer, ESSLDeviceSyncSerializer,
-    MonthlyAttendanceReportSerializer
+    MonthlyAttendanceReportSerializer, AttendanceStatusRecomputeSerializer
 )
 from .essl_service import ESSLDeviceService, ESSLDeviceManager, AttendanceReportService
+from .rollup_service import rollup_service
+from .status_recompute import status_recompute_service
 
 logger = logging.getLogger(__name__)
 
@@ -195,21 +197,16 @@ class ESSLAttendanceLogViewSet(viewsets.ReadOnlyModelViewSet):
     def process_logs(self, request):
         """Process unprocessed attendance logs"""
         try:
-            with transaction.atomic():
-                unprocessed_logs = self.get_queryset().filter(is_processed=False)
-                processed_count = 0
-                
-                for log in unprocessed_logs:
-                    if log.user:
-                        service = ESSLDeviceService(log.device)
-                        service._process_user_attendance(log.user, log)
-                        processed_count += 1
-                
-                return Response({
-                    'success': True,
-                    'processed_count': processed_count,
-                    'message': f'Processed {processed_count} attendance logs'
-                })
+            result = rollup_service.process_unprocessed(self.get_queryset())
+            processed_count = result['logs']
+            
+            return Response({
+                'success': True,
+                'processed_count': processed_count,
+                'created_count': result['created'],
+                'updated_count': result['updated'],
+                'message': f'Processed {processed_count} attendance logs'
+            })
                 
         except Exception as e:
             logger.error(f"Error processing attendance logs: {str(e)}")
@@ -233,6 +230,35 @@ class WorkingHoursSettingsViewSet(viewsets.ModelViewSet):
         elif user.role == 'admin':
             return self.queryset
         return WorkingHoursSettings.objects.none()
+    
+    @action(detail=True, methods=['post'])
+    def recompute_status(self, request, pk=None):
+        """Recompute attendance status for the office and month with these settings"""
+        try:
+            settings = self.get_object()
+            serializer = AttendanceStatusRecomputeSerializer(data=request.data)
+            
+            if serializer.is_valid():
+                result = status_recompute_service.recompute(
+                    serializer.validated_data['year'],
+                    serializer.validated_data['month'],
+                    office_id=settings.office_id,
+                    dry_run=serializer.validated_data['dry_run'],
+                    changed_by_id=request.user.id
+                )
+                return Response({
+                    'success': True,
+                    **result
+                })
+            else:
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+                
+        except Exception as e:
+            logger.error(f"Error recomputing attendance status: {str(e)}")
+            return Response({
+                'success': False,
+                'message': 'Error recomputing attendance status'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 class ESSLDeviceManagerView(views.APIView):
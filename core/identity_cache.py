@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+User Identity Cache
+In-process cache mapping device identities (biometric_id / employee_id) to
+CustomUser primary keys. Entries expire after a TTL and are invalidated by the
+CustomUser save/delete signals; unknown IDs are cached too (for a shorter TTL)
+so a device full of unregistered users does not hit the database every poll.
+"""
+
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_FIELDS = ('biometric_id', 'employee_id')
+
+
+class UserIdentityCache:
+    """TTL cache of (field, value) -> user PK, with negative caching
+
+    Both identity fields are unique on CustomUser, so the value alone
+    identifies a user regardless of which device or office reported it.
+    """
+
+    def __init__(self, ttl=300, negative_ttl=60, max_entries=50000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = {}  # (field, value) -> (user pk or None, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    @classmethod
+    def from_settings(cls):
+        """Build the cache from the ATTENDANCE_IDENTITY_CACHE setting"""
+        config = getattr(settings, 'ATTENDANCE_IDENTITY_CACHE', {})
+        return cls(
+            ttl=config.get('TTL', 300),
+            negative_ttl=config.get('NEGATIVE_TTL', 60),
+            max_entries=config.get('MAX_ENTRIES', 50000),
+        )
+
+    def resolve(self, value, field='biometric_id'):
+        """User PK for a single identity, or None when no user has it"""
+        return self.resolve_many([value], field).get(str(value).strip())
+
+    def resolve_many(self, values, field='biometric_id'):
+        """Map identities to user PKs, loading all cache misses with one query
+
+        Unknown identities are left out of the returned dict.
+        """
+        if field not in IDENTITY_FIELDS:
+            raise ValueError(f"Unsupported identity field: {field}")
+
+        values = {str(value).strip() for value in values if value is not None}
+        values.discard('')
+        resolved = {}
+        missing = set()
+        now = time.monotonic()
+
+        with self._lock:
+            for value in values:
+                entry = self._entries.get((field, value))
+                if entry and entry[1] > now:
+                    if entry[0] is None:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                        resolved[value] = entry[0]
+                else:
+                    self.misses += 1
+                    missing.add(value)
+
+        if missing:
+            found = dict(
+                CustomUser.objects.filter(**{f"{field}__in": missing}).values_list(field, 'pk')
+            )
+            resolved.update(found)
+
+            with self._lock:
+                if len(self._entries) + len(missing) > self.max_entries:
+                    self._purge_expired(now)
+                for value in missing:
+                    pk = found.get(value)
+                    ttl = self.ttl if pk is not None else self.negative_ttl
+                    self._entries[(field, value)] = (pk, now + ttl)
+
+        return resolved
+
+    def _purge_expired(self, now):
+        expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        # Still over the cap: start again rather than grow without bound
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+
+    def invalidate_user(self, user):
+        """Forget every entry pointing at the user and its current identities"""
+        with self._lock:
+            stale = [key for key, (pk, _) in self._entries.items() if pk == user.pk]
+            for field in IDENTITY_FIELDS:
+                value = getattr(user, field, None)
+                if value:
+                    stale.append((field, str(value).strip()))
+            for key in stale:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop all cached identities"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.negative_hits) / lookups, 3) if lookups else None,
+            }
+
+
+# Global identity cache instance
+user_identity_cache = UserIdentityCache.from_settings()
+
+
+@receiver(post_save, sender=CustomUser, dispatch_uid='user_identity_cache_save')
+@receiver(post_delete, sender=CustomUser, dispatch_uid='user_identity_cache_delete')
+def invalidate_user_identity_cache(sender, instance, **kwargs):
+    """Drop cached biometric_id / employee_id lookups for the user"""
+    user_identity_cache.invalidate_user(instance)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Time-Ordered IDs
+UUIDv7 (RFC 9562) primary keys for high-insert tables. The first 48 bits are
+the Unix time in milliseconds, so new keys sort after existing ones and inserts
+append to the end of the clustered index instead of landing on a random page.
+Values are ordinary UUIDs and share the UUIDField column with uuid4 rows.
+"""
+
+import os
+import threading
+import time
+import uuid
+
+_MAX_COUNTER = 0xFFF  # the 12-bit rand_a field is used as a per-millisecond counter
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7():
+    """A UUIDv7, monotonically increasing within this process"""
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # Random start in the lower half leaves room to count up within the millisecond
+            _counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        else:
+            # Same millisecond (or the clock went back): keep counting on the last timestamp
+            _counter += 1
+            if _counter > _MAX_COUNTER:
+                _last_ms += 1
+                _counter = 0
+        ms, counter = _last_ms, _counter
+
+    rand_b = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b)
+
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Attendance Ingest Service
+Batched ingestion of raw device punches into ESSLAttendanceLog: users are resolved
+once per batch through the identity cache, existing punches are pre-fetched for the batch window and new rows
+are written with a single bulk INSERT against the (device, biometric_id, punch_time)
+unique constraint.
+"""
+
+import logging
+import time
+from datetime import datetime
+from django.utils import timezone
+from django.db import transaction
+
+from .models import ESSLAttendanceLog
+from .identity_cache import user_identity_cache
+
+logger = logging.getLogger(__name__)
+
+
+class AttendanceIngestService:
+    """Bulk ingest pipeline for raw punches from one device"""
+
+    def __init__(self, device, batch_size=500, skip_unknown_users=False, match_employee_id=False):
+        self.device = device
+        self.batch_size = batch_size
+        self.skip_unknown_users = skip_unknown_users  # Drop punches whose biometric ID has no user
+        self.match_employee_id = match_employee_id  # Fall back to employee_id for unknown biometric IDs
+
+    @staticmethod
+    def normalize_punch_time(punch_time):
+        """Parse ISO strings / epoch seconds and make the result timezone-aware"""
+        if isinstance(punch_time, str):
+            punch_time = datetime.fromisoformat(punch_time.replace('Z', '+00:00'))
+        elif isinstance(punch_time, (int, float)):
+            punch_time = datetime.fromtimestamp(punch_time)
+        if timezone.is_naive(punch_time):
+            punch_time = timezone.make_aware(punch_time, timezone.get_current_timezone())
+        return punch_time
+
+    def ingest(self, punches):
+        """Ingest punches (dicts with biometric_id, punch_time and punch_type)
+
+        Returns a summary dict including the created ESSLAttendanceLog objects,
+        the (biometric_id, punch_time) keys now stored (inserted or already
+        present) and the achieved throughput in records/sec.
+        """
+        started = time.monotonic()
+        result = {
+            'received': 0,
+            'inserted': 0,
+            'duplicates': 0,
+            'unknown_users': 0,
+            'invalid': 0,
+            'logs': [],
+            'stored_keys': set(),
+        }
+
+        # Normalise and drop exact duplicates within the incoming data
+        unique_punches = {}
+        for punch in punches:
+            result['received'] += 1
+            try:
+                biometric_id = str(punch['biometric_id'] or '').strip()
+                punch_time = self.normalize_punch_time(punch['punch_time'])
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                logger.debug(f"Skipping invalid punch {punch}: {str(e)}")
+                result['invalid'] += 1
+                continue
+            if not biometric_id:
+                result['invalid'] += 1
+                continue
+
+            key = (biometric_id, punch_time)
+            if key in unique_punches:
+                result['duplicates'] += 1
+                continue
+            unique_punches[key] = punch.get('punch_type') if punch.get('punch_type') in ('in', 'out') else 'in'
+
+        items = sorted(unique_punches.items(), key=lambda item: item[0][1])
+        for offset in range(0, len(items), self.batch_size):
+            self._ingest_batch(items[offset:offset + self.batch_size], result)
+
+        elapsed = time.monotonic() - started
+        result['elapsed'] = round(elapsed, 3)
+        result['records_per_sec'] = round(result['received'] / elapsed, 1) if elapsed > 0 else None
+
+        logger.info(f"📥 Ingested {result['inserted']} of {result['received']} punches from {self.device.name} "
+                    f"({result['duplicates']} duplicates, {result['unknown_users']} unknown users) "
+                    f"in {elapsed:.2f}s, {result['records_per_sec']} records/sec")
+        return result
+
+    def _ingest_batch(self, items, result):
+        """Resolve users, filter already stored punches and bulk insert one batch"""
+        biometric_ids = {biometric_id for (biometric_id, _), _ in items}
+        user_pks = self.resolve_users(biometric_ids)
+
+        # One query for every punch of this device already stored in the batch window
+        window_start, window_end = items[0][0][1], items[-1][0][1]
+        existing = set(
+            ESSLAttendanceLog.objects.filter(
+                device=self.device,
+                biometric_id__in=biometric_ids,
+                punch_time__range=(window_start, window_end)
+            ).values_list('biometric_id', 'punch_time')
+        )
+
+        new_logs = []
+        for (biometric_id, punch_time), punch_type in items:
+            if (biometric_id, punch_time) in existing:
+                result['duplicates'] += 1
+                result['stored_keys'].add((biometric_id, punch_time))
+                continue
+
+            user_pk = user_pks.get(biometric_id)
+            if not user_pk:
+                result['unknown_users'] += 1
+                if self.skip_unknown_users:
+                    continue
+
+            new_logs.append(ESSLAttendanceLog(
+                device=self.device,
+                biometric_id=biometric_id,
+                user_id=user_pk,
+                punch_time=punch_time,
+                punch_type=punch_type,
+                is_processed=False
+            ))
+
+        if new_logs:
+            with transaction.atomic():
+                # The unique constraint makes concurrent ingests of the same punch harmless
+                ESSLAttendanceLog.objects.bulk_create(new_logs, ignore_conflicts=True)
+                # Conflicting rows are dropped silently; ids are generated client side, so
+                # the rows that were stored are the ones whose id made it into the table
+                stored = set(
+                    ESSLAttendanceLog.objects.filter(id__in=[log.id for log in new_logs]).values_list('id', flat=True)
+                )
+            stored_logs = [log for log in new_logs if log.id in stored]
+            # Rows dropped as conflicts were stored by a concurrent ingest
+            result['stored_keys'].update((log.biometric_id, log.punch_time) for log in new_logs)
+            result['duplicates'] += len(new_logs) - len(stored_logs)
+            result['inserted'] += len(stored_logs)
+            result['logs'].extend(stored_logs)
+
+    def resolve_users(self, biometric_ids):
+        """Map biometric IDs to user PKs through the shared identity cache"""
+        user_pks = user_identity_cache.resolve_many(biometric_ids, 'biometric_id')
+
+        missing = set(biometric_ids) - set(user_pks)
+        if missing and self.match_employee_id:
+            user_pks.update(user_identity_cache.resolve_many(missing, 'employee_id'))
+
+        return user_pks
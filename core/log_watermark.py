@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Device Log Watermark
+Tracks how far into a ZKTeco device's attendance log we have already processed,
+so each poll only handles the records that arrived since the previous poll
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# device id -> monotonic time the fingerprint at the mark was last checked against the device log
+_verified_at = {}
+_verified_lock = threading.Lock()
+
+
+def _log_field(log, name):
+    """Read a field from a pyzk Attendance object or an already converted log dict"""
+    if isinstance(log, dict):
+        return log.get(name)
+    return getattr(log, name, None)
+
+
+def _log_timestamp(log):
+    """Timezone-aware timestamp of a log record"""
+    timestamp = _log_field(log, 'punch_time') if isinstance(log, dict) else _log_field(log, 'timestamp')
+    if isinstance(timestamp, datetime) and timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp, timezone.get_current_timezone())
+    return timestamp
+
+
+class DeviceLogWatermark:
+    """High-water mark over a device's attendance log
+
+    The device returns its log oldest-first, so the mark is the number of records
+    already processed plus a fingerprint (uid and timestamp) of the last of them.
+    A full log that wraps drops its oldest records, shifting the fingerprinted
+    record towards the start, so it is looked for backwards from the mark. Only
+    when it is gone (the log was cleared, or wrapped past it) is a full resync done.
+
+    An unchanged record count does not prove an unchanged log: a full log wraps
+    without growing, and a cleared log can refill to the old count. The download
+    is only skipped while the log is below capacity and the fingerprint was
+    checked within verify_interval seconds.
+    """
+
+    def __init__(self, device, verify_interval=300):
+        self.device = device
+        self.verify_interval = verify_interval
+        self.capacity = None
+        self.full_resync = False
+        self.fetched_logs = None
+
+    def read_record_count(self, conn):
+        """Read the number of records stored on the device without downloading them"""
+        try:
+            conn.read_sizes()
+            self.capacity = getattr(conn, 'rec_cap', None)
+            return conn.records
+        except Exception as e:
+            logger.debug(f"Could not read record count from {self.device.name}: {str(e)}")
+            return None
+
+    def has_new_records(self, record_count):
+        """Check whether the device log may hold records past the mark"""
+        mark = self.device.last_log_index
+        if record_count is None or mark is None or record_count != mark:
+            # Grown, or shrunk because the log was cleared: download and let filter_new() decide
+            return True
+        if self.capacity and record_count >= self.capacity:
+            # A full log drops its oldest records to make room, so the count stays put
+            return True
+        with _verified_lock:
+            verified_at = _verified_at.get(self.device.pk)
+        return verified_at is None or time.monotonic() - verified_at >= self.verify_interval
+
+    def _mark_verified(self):
+        with _verified_lock:
+            _verified_at[self.device.pk] = time.monotonic()
+
+    def filter_new(self, logs):
+        """Return the records past the mark, or every record when a full resync is needed"""
+        logs = list(logs)
+        self.fetched_logs = logs
+        mark = self.device.last_log_index
+
+        processed = None if mark is None else self._find_mark(logs, mark)
+        self.full_resync = processed is None
+        if self.full_resync:
+            if mark is not None:
+                logger.warning(f"🔁 Attendance log on {self.device.name} was cleared or wrapped, "
+                               f"running a full resync of {len(logs)} records")
+            return logs
+
+        self._mark_verified()
+        if processed != mark:
+            logger.info(f"🔁 Attendance log on {self.device.name} wrapped, {mark - processed} oldest records dropped")
+        return logs[processed:]
+
+    def _matches(self, log):
+        """Whether a record is the one we processed last"""
+        if self.device.last_log_uid is not None and _log_field(log, 'uid') != self.device.last_log_uid:
+            return False
+        if self.device.last_log_timestamp is not None and _log_timestamp(log) != self.device.last_log_timestamp:
+            return False
+        return True
+
+    def _find_mark(self, logs, mark):
+        """Number of leading records already processed, None when the last processed one is gone"""
+        if mark == 0:
+            return 0
+        if mark <= len(logs) and self._matches(logs[mark - 1]):
+            return mark
+        if self.device.last_log_timestamp is None:
+            # Without a timestamp the fingerprint is too weak to locate a shifted record
+            return None
+
+        # A wrapped log keeps the records after the dropped ones: scan back from the mark
+        for index in range(min(mark, len(logs)) - 2, -1, -1):
+            if self._matches(logs[index]):
+                return index + 1
+        return None
+
+    def advance(self, logs=None):
+        """Move the mark to the end of the full device log and persist it
+
+        Call this only once the new records have been processed, also when the
+        log came back empty so a cleared log resets the mark; it defaults to the
+        log list last passed to filter_new().
+        """
+        from core.models import Device
+
+        logs = list(logs) if logs is not None else (self.fetched_logs or [])
+        last_log = logs[-1] if logs else None
+
+        self.device.last_log_index = len(logs)
+        self.device.last_log_uid = _log_field(last_log, 'uid') if last_log is not None else None
+        self.device.last_log_timestamp = _log_timestamp(last_log) if last_log is not None else None
+
+        Device.objects.filter(pk=self.device.pk).update(
+            last_log_index=self.device.last_log_index,
+            last_log_uid=self.device.last_log_uid,
+            last_log_timestamp=self.device.last_log_timestamp,
+        )
+        self._mark_verified()
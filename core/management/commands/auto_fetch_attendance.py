@@ -13,10 +13,11 @@ import time
 import signal
 import threading
 import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from django.db import transaction, connection
+from django.db import transaction, connection, close_old_connections
 from django.conf import settings
 from django.core.cache import cache
 
@@ -25,6 +26,16 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'attendance_system.settings')
 django.setup()
 
 from core.models import Device, CustomUser, Attendance, Office, ESSLAttendanceLog
+from core.log_watermark import DeviceLogWatermark
+from core.dedup_index import AttendanceDedupIndex
+from core.ingest_service import AttendanceIngestService
+from core.rollup_service import rollup_service
+from core.identity_cache import user_identity_cache
+from core.poller_lease import poller_lease
+from core.poller_membership import poller_membership
+from core.poll_scheduler import DevicePollScheduler
+from core.poll_policy import adaptive_poll_policy
+from core.device_breaker import device_breaker
 
 # Configure logging
 logging.basicConfig(
@@ -47,22 +58,33 @@ except ImportError:
 class AutoAttendanceService:
     """Automatic attendance fetching service with duplicate prevention"""
     
-    def __init__(self, interval=30, max_workers=3):
-        self.interval = interval
+    def __init__(self, interval=30, max_workers=3, device_timeout=60):
+        self.interval = interval  # Seconds between reloads of the device list
         self.max_workers = max_workers
+        self.device_timeout = device_timeout  # Per-device deadline in seconds
         self.running = False
         self.thread = None
+        self.executor = None
         self.devices = []
         self.device_connections = {}
         self.last_fetch_times = {}
-        self.last_attendance_hashes = {}  # Store hashes to prevent duplicates
+        self.dedup_index = AttendanceDedupIndex.from_settings()  # Processed punches, prevents duplicates
+        self.in_flight = {}  # device_id -> monotonic start time of the running fetch
+        self.scheduler = DevicePollScheduler(policy=adaptive_poll_policy)  # Per-device due times
+        self._wake = threading.Event()
+        self._next_device_refresh = 0.0
         self.processing_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
         self.stats = {
             'total_fetches': 0,
             'total_records': 0,
             'duplicates_prevented': 0,
             'errors': 0,
-            'last_successful_fetch': None
+            'timeouts': 0,
+            'last_successful_fetch': None,
+            'last_cycle_devices': 0,
+            'last_cycle_wall_time': None,
+            'last_cycle_device_time': None,
         }
         
     def start(self):
@@ -71,32 +93,66 @@ class AutoAttendanceService:
             logger.warning("Service is already running")
             return
             
+        # A loop that outlived stop() would keep polling next to the new one once running is set
+        if self.thread and self.thread.is_alive():
+            logger.info("⏳ Waiting for the previous service loop to finish its cycle...")
+            self.thread.join()
+            
         logger.info("🚀 Starting automatic attendance fetching service...")
         self.running = True
         
-        # Get all active devices
-        self.devices = list(Device.objects.filter(is_active=True))
+        # Get all active devices and schedule them
+        self._wake.clear()
+        self._refresh_devices()
         logger.info(f"📱 Found {len(self.devices)} active devices")
         
-        # Initialize device connections and tracking
-        for device in self.devices:
-            self.device_connections[device.id] = None
-            self.last_fetch_times[device.id] = None
-            self.last_attendance_hashes[device.id] = set()
+        # Bounded worker pool so one slow device cannot hold up the others
+        if self.max_workers > 1:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='attendance-poller'
+            )
         
         # Start the background thread
         self.thread = threading.Thread(target=self._run_service, daemon=True)
         self.thread.start()
         
-        logger.info(f"✅ Service started. Fetching data every {self.interval} seconds")
+        logger.info(f"✅ Service started. Polling each device every Device.sync_interval minutes, "
+                    f"reloading devices every {self.interval} seconds with {self.max_workers} worker(s)")
+        
+    def start_coordinated(self):
+        """Start polling under the configured coordination: a device shard or the single-leader lease"""
+        if poller_membership.enabled:
+            poller_membership.start(on_join=self.start, on_leave=self.stop)
+        else:
+            poller_lease.start(on_acquire=self.start, on_release=self.stop)
+            
+    def stop_coordinated(self):
+        """Stop polling and leave the ring or give up the lease"""
+        if poller_membership.enabled:
+            poller_membership.stop()
+        else:
+            poller_lease.stop()
+            
+    @property
+    def coordinated(self):
+        """Whether this process is taking part in poller coordination"""
+        return poller_membership.running or poller_lease.running
         
     def stop(self):
         """Stop the automatic attendance fetching service"""
         logger.info("🛑 Stopping automatic attendance fetching service...")
         self.running = False
+        self._wake.set()
         
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=5)
+            if self.thread.is_alive():
+                logger.warning("Service loop is still finishing its cycle; a restart waits for it")
+            
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
             
         # Cleanup device connections
         self.cleanup_connections()
@@ -121,67 +177,181 @@ class AutoAttendanceService:
         
         while self.running:
             try:
+                # Pick up added, removed and edited devices without a restart
+                if time.monotonic() >= self._next_device_refresh:
+                    self._refresh_devices()
+                    
                 with self.processing_lock:
-                    self._fetch_all_devices()
+                    fetched = self._fetch_all_devices()
                     
-                # Update stats
-                self.stats['total_fetches'] += 1
-                self.stats['last_successful_fetch'] = timezone.now()
-                
-                # Log periodic stats
-                if self.stats['total_fetches'] % 10 == 0:  # Every 10 fetches
-                    self._log_stats()
+                if fetched is None:
+                    # Overdue devices stay due while the lease is lost, so wait for the next
+                    # heartbeat to renew or release it instead of spinning on them
+                    self._wake.wait(poller_lease.heartbeat_interval)
+                    continue
+                    
+                if fetched:
+                    # Update stats
+                    self._incr_stat('total_fetches')
+                    self.stats['last_successful_fetch'] = timezone.now()
                     
-                time.sleep(self.interval)
+                    # Log periodic stats
+                    if self.stats['total_fetches'] % 10 == 0:  # Every 10 fetches
+                        self._log_stats()
+                        
+                # Sleep until the next device is due or the device list is reloaded
+                self._wake.wait(self._seconds_until_wakeup())
                 
             except KeyboardInterrupt:
                 logger.info("Received interrupt signal")
                 break
             except Exception as e:
                 logger.error(f"Error in service loop: {str(e)}")
-                self.stats['errors'] += 1
-                time.sleep(self.interval)
+                self._incr_stat('errors')
+                self._wake.wait(self.interval)
                 
-    def _fetch_all_devices(self):
-        """Fetch data from all devices"""
-        current_time = timezone.now()
+    def _refresh_devices(self):
+        """Reload the active devices and reconcile the poll schedule with them"""
+        self._next_device_refresh = time.monotonic() + self.interval
+        devices = list(Device.objects.filter(is_active=True))
         
-        for device in self.devices:
-            try:
-                # Check if device should be fetched (respect device-specific intervals)
-                if self._should_fetch_device(device, current_time):
-                    self._fetch_device_data(device)
-                    
-            except Exception as e:
-                logger.error(f"Error fetching from device {device.name}: {str(e)}")
-                self.stats['errors'] += 1
+        for device in devices:
+            if device.id not in self.device_connections:
+                self.device_connections[device.id] = None
+                self.last_fetch_times[device.id] = None
+                self.dedup_index.load(device.id)
                 
-    def _should_fetch_device(self, device, current_time):
-        """Check if device should be fetched based on last fetch time"""
-        last_fetch = self.last_fetch_times.get(device.id)
+        self.devices = devices
+        added, removed, rescheduled = self.scheduler.sync(devices)
+        if self.running and (added or removed or rescheduled) and len(devices) != added:
+            logger.info(f"📱 Device list changed: {added} added, {removed} removed, "
+                        f"{rescheduled} rescheduled ({len(devices)} active)")
+                        
+    def _seconds_until_wakeup(self):
+        until_refresh = max(self._next_device_refresh - time.monotonic(), 0.0)
+        until_due = self.scheduler.seconds_until_next()
+        return until_refresh if until_due is None else min(until_due, until_refresh)
+        
+
+    def _incr_stat(self, key, amount=1):
+        """Increment a stats counter (safe to call from worker threads)"""
+        with self.stats_lock:
+            self.stats[key] += amount
+            
+    def _fetch_all_devices(self):
+        """Fetch the devices that are due; returns how many were fetched, None without the lease"""
+        if not poller_membership.enabled and not poller_lease.is_leader:
+            # A leader whose lease ran out without renewal must not poll alongside its successor
+            logger.warning("Not holding the poller lease, skipping this cycle")
+            return None
+            
+        # Devices whose previous fetch is still running are not handed out again until it finishes
+        due_devices = []
+        for device in self.scheduler.pop_due():
+            if poller_membership.enabled and not poller_membership.owns(device.id):
+                # Sharded: another instance polls it; look again after its interval
+                self.scheduler.complete(device.id)
+                continue
+            if not device_breaker.allow(device.ip_address, device.port):
+                # Circuit open: skip without connecting and come back when it lets a trial through
+                self.scheduler.complete(device.id, retry_after=device_breaker.retry_in(device.ip_address, device.port))
+                continue
+            due_devices.append(device)
+        if not due_devices:
+            return 0
+            
+        cycle_start = time.monotonic()
         
-        if not last_fetch:
-            return True
+        if self.executor:
+            device_times = self._fetch_devices_concurrently(due_devices)
+        else:
+            device_times = [self._timed_fetch_device(device) for device in due_devices]
             
-        # Device-specific fetch interval (default 30 seconds)
-        device_interval = getattr(device, 'fetch_interval', self.interval)
+        self._record_cycle_timing(len(due_devices), time.monotonic() - cycle_start, sum(device_times))
+        return len(due_devices)
         
-        return (current_time - last_fetch).total_seconds() >= device_interval
+    def _fetch_devices_concurrently(self, devices):
+        """Fetch devices on the worker pool, abandoning any that overrun their deadline"""
+        pending = {self.executor.submit(self._timed_fetch_device, device): device for device in devices}
+        device_times = []
+        
+        while pending:
+            done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                pending.pop(future)
+                device_times.append(future.result())
+                
+            # The deadline runs from when a worker picked the device up, not from
+            # submission, so devices queued behind a full pool are not penalised
+            now = time.monotonic()
+            for future, device in list(pending.items()):
+                started = self.in_flight.get(device.id)
+                if started is not None and now - started > self.device_timeout:
+                    logger.warning(f"⏱️ {device.name} exceeded its {self.device_timeout}s deadline, "
+                                   f"continuing without it")
+                    self._incr_stat('timeouts')
+                    device_times.append(now - started)
+                    pending.pop(future)
+                    
+        return device_times
+        
+    def _timed_fetch_device(self, device):
+        """Fetch a single device and return the elapsed time in seconds"""
+        started = time.monotonic()
+        self.in_flight[device.id] = started
+        
+        # Worker threads hold their own DB connection; drop it if it has gone stale
+        close_old_connections()
+        success = False
+        new_records = None
+        try:
+            new_records = self._fetch_device_data(device)
+            if new_records is None:
+                device_breaker.record_failure(device.ip_address, device.port, 'connection failed')
+            else:
+                device_breaker.record_success(device.ip_address, device.port)
+                Device.objects.filter(id=device.id).update(last_sync=timezone.now())
+                success = True
+        except Exception as e:
+            logger.error(f"Error fetching from device {device.name}: {str(e)}")
+            self._incr_stat('errors')
+            device_breaker.record_failure(device.ip_address, device.port, e)
+        finally:
+            close_old_connections()
+            self.in_flight.pop(device.id, None)
+            # A failed device is retried sooner than its sync interval
+            self.scheduler.complete(device.id, success, new_records)
+            
+        return time.monotonic() - started
         
+    def _record_cycle_timing(self, device_count, wall_time, device_time):
+        """Record per-cycle wall time against the summed per-device time"""
+        with self.stats_lock:
+            self.stats['last_cycle_devices'] = device_count
+            self.stats['last_cycle_wall_time'] = round(wall_time, 3)
+            self.stats['last_cycle_device_time'] = round(device_time, 3)
+            
+        speedup = device_time / wall_time if wall_time > 0 else 1.0
+        logger.info(f"⏱️ Cycle fetched {device_count} devices in {wall_time:.2f}s wall time "
+                    f"vs {device_time:.2f}s summed device time ({speedup:.1f}x)")
+                
     def _fetch_device_data(self, device):
-        """Fetch data from a specific device"""
+        """Fetch data from a specific device; returns the number of new records, None if it could not be reached"""
         try:
             logger.info(f"📥 Fetching data from {device.name} ({device.device_type})")
             
+            new_records = 0
             if device.device_type == 'zkteco':
-                self._fetch_zkteco_data(device)
+                new_records = self._fetch_zkteco_data(device)
             elif device.device_type == 'essl':
-                self._fetch_essl_data(device)
+                new_records = self._fetch_essl_data(device)
             else:
                 logger.warning(f"Unknown device type: {device.device_type}")
                 
             # Update last fetch time
             self.last_fetch_times[device.id] = timezone.now()
+            return new_records
             
         except Exception as e:
             logger.error(f"Error fetching data from {device.name}: {str(e)}")
@@ -191,23 +361,33 @@ class AutoAttendanceService:
         """Fetch data from ZKTeco device"""
         if not ZK_AVAILABLE:
             logger.error("pyzk library not available for ZKTeco device")
-            return
+            return 0
             
         conn = None
         try:
             # Connect to device
             conn = self._connect_zkteco_device(device)
             if not conn:
-                return
+                return None
+                
+            # Skip the log download entirely when the device holds no new records
+            watermark = DeviceLogWatermark(device)
+            if not watermark.has_new_records(watermark.read_record_count(conn)):
+                logger.info(f"No new attendance data from {device.name}")
+                return 0
                 
             # Get attendance data
             attendance_logs = conn.get_attendance()
             if not attendance_logs:
+                # The log was cleared: reset the mark so the refilled log is read from its start
                 logger.info(f"No new attendance data from {device.name}")
-                return
+                watermark.advance([])
+                return 0
                 
-            # Process attendance records
-            self._process_zkteco_attendance(device, attendance_logs)
+            # Process only the records past the device's high-water mark
+            new_records = self._process_zkteco_attendance(device, watermark.filter_new(attendance_logs))
+            watermark.advance(attendance_logs)
+            return new_records
             
         except Exception as e:
             logger.error(f"Error fetching ZKTeco data from {device.name}: {str(e)}")
@@ -221,6 +401,10 @@ class AutoAttendanceService:
                     
     def _connect_zkteco_device(self, device):
         """Connect to ZKTeco device"""
+        # Fail in milliseconds instead of a full protocol timeout when nothing listens on the port
+        if not device_breaker.probe(device.ip_address, device.port):
+            logger.error(f"❌ ZKTeco device {device.name} is not reachable at {device.ip_address}:{device.port}")
+            return None
         try:
             zk = ZK(device.ip_address, port=device.port, timeout=10, force_udp=False, verbose=False)
             conn = zk.connect()
@@ -235,92 +419,74 @@ class AutoAttendanceService:
             return None
             
     def _process_zkteco_attendance(self, device, attendance_logs):
-        """Process ZKTeco attendance records with duplicate prevention"""
+        """Process ZKTeco attendance records with duplicate prevention; returns the new record count"""
         if not attendance_logs:
-            return
+            return 0
             
         logger.info(f"📊 Processing {len(attendance_logs)} attendance records from {device.name}")
         
-        new_records = 0
         duplicates = 0
+        punches = []
+        new_keys = []
         
         for log in attendance_logs:
-            try:
-                # Create unique hash for this attendance record
-                record_hash = self._create_attendance_hash(device.id, log)
+            # Create unique hash for this attendance record
+            record_hash = self._create_attendance_hash(device.id, log)
+            
+            # Check if this record already exists
+            if self.dedup_index.seen(device.id, record_hash):
+                duplicates += 1
+                continue
                 
-                # Check if this record already exists
-                if record_hash in self.last_attendance_hashes.get(device.id, set()):
-                    duplicates += 1
-                    continue
-                    
-                # Process the attendance record
-                if self._save_zkteco_attendance(device, log):
-                    new_records += 1
-                    # Add to hash set to prevent future duplicates
-                    if device.id not in self.last_attendance_hashes:
-                        self.last_attendance_hashes[device.id] = set()
-                    self.last_attendance_hashes[device.id].add(record_hash)
-                    
-            except Exception as e:
-                logger.error(f"Error processing attendance record: {str(e)}")
+            punches.append({
+                'biometric_id': log.user_id,
+                'punch_time': log.timestamp,
+                'punch_type': 'out' if getattr(log, 'punch', 0) == 1 else 'in',
+            })
+            new_keys.append((record_hash, log))
+            
+        result = self._ingest_and_rollup(device, punches)
+        new_records = result['inserted']
+        
+        # Add to the dedup index to prevent future duplicates, but only punches that made it into
+        # the table: anything else has to be offered again on the next poll
+        for record_hash, log in new_keys:
+            stored_key = (str(log.user_id or '').strip(), AttendanceIngestService.normalize_punch_time(log.timestamp))
+            if stored_key in result['stored_keys']:
+                self.dedup_index.add(device.id, record_hash, log.timestamp)
                 
+        # Drop entries outside the dedup window and persist the index for restarts
+        self.dedup_index.evict_and_save(device.id)
+        
         # Update stats
-        self.stats['total_records'] += new_records
-        self.stats['duplicates_prevented'] += duplicates
+        self._incr_stat('duplicates_prevented', duplicates)
         
         logger.info(f"✅ Processed {new_records} new records, prevented {duplicates} duplicates from {device.name}")
+        return new_records
         
     def _create_attendance_hash(self, device_id, log):
         """Create unique hash for attendance record"""
-        # Create hash based on device, user, and timestamp
-        hash_data = f"{device_id}_{log.user_id}_{log.timestamp}_{log.status}"
-        return hash(hash_data)
+        # Deterministic hash based on device, user, and timestamp (stable across restarts)
+        return AttendanceDedupIndex.make_key(device_id, log.user_id, log.timestamp, log.status)
         
-    def _save_zkteco_attendance(self, device, log):
-        """Save ZKTeco attendance record to database"""
-        try:
-            # Find user by biometric ID
-            user = CustomUser.objects.filter(biometric_id=str(log.user_id)).first()
-            if not user:
-                logger.warning(f"User with biometric ID {log.user_id} not found")
-                return False
-                
-            # Make timestamp timezone-aware
-            timestamp = log.timestamp
-            if timezone.is_naive(timestamp):
-                timestamp = timezone.make_aware(timestamp, timezone.get_current_timezone())
-                
-            # Check if attendance record already exists
-            existing_attendance = Attendance.objects.filter(
-                user=user,
-                date=timestamp.date(),
-                check_in_time__hour=timestamp.hour,
-                check_in_time__minute=timestamp.minute
-            ).first()
-            
-            if existing_attendance:
-                # Update existing record if needed
-                if not existing_attendance.check_out_time and timestamp > existing_attendance.check_in_time:
-                    existing_attendance.check_out_time = timestamp
-                    existing_attendance.save()
-                    logger.info(f"Updated check-out time for {user.get_full_name()}")
-                return True
-            else:
-                # Create new attendance record
-                attendance = Attendance.objects.create(
-                    user=user,
-                    date=timestamp.date(),
-                    check_in_time=timestamp,
-                    status='present',
-                    device=device
-                )
-                logger.info(f"Created new attendance record for {user.get_full_name()}")
-                return True
-                
-        except Exception as e:
-            logger.error(f"Error saving attendance record: {str(e)}")
-            return False
+    def _ingest_and_rollup(self, device, punches, match_employee_id=False):
+        """Bulk store raw punches and roll them up into daily attendance; returns the ingest result
+
+        Punches from biometric IDs without a user are stored unassigned (the
+        rollup skips them), like ESSLDeviceService does, so none is lost.
+        """
+        if not punches:
+            return {'inserted': 0, 'duplicates': 0, 'logs': [], 'stored_keys': set()}
+            
+        result = AttendanceIngestService(device, match_employee_id=match_employee_id).ingest(punches)
+        if result['unknown_users']:
+            logger.warning(f"{result['unknown_users']} punches from {device.name} have no matching user")
+            
+        rollup_service.rollup(result['logs'])
+        
+        self._incr_stat('total_records', result['inserted'])
+        self._incr_stat('duplicates_prevented', result['duplicates'])
+        return result
             
     def _fetch_essl_data(self, device):
         """Fetch data from ESSL device"""
@@ -332,9 +498,9 @@ class AutoAttendanceService:
             attendance_data = essl_service.get_device_attendance(device)
             
             if attendance_data:
-                self._process_essl_attendance(device, attendance_data)
-            else:
-                logger.info(f"No new attendance data from ESSL device {device.name}")
+                return self._process_essl_attendance(device, attendance_data)
+            logger.info(f"No new attendance data from ESSL device {device.name}")
+            return 0
                 
         except Exception as e:
             logger.error(f"Error fetching ESSL data from {device.name}: {str(e)}")
@@ -344,82 +510,34 @@ class AutoAttendanceService:
         """Process ESSL attendance records"""
         logger.info(f"📊 Processing {len(attendance_data)} ESSL attendance records from {device.name}")
         
-        new_records = 0
+        punches = [
+            {
+                'biometric_id': record.get('biometric_id') or record.get('employee_id'),
+                'punch_time': record.get('timestamp'),
+                'punch_type': record.get('punch_type'),
+            }
+            for record in attendance_data
+        ]
+        new_records = self._ingest_and_rollup(device, punches, match_employee_id=True)['inserted']
         
-        for record in attendance_data:
-            try:
-                if self._save_essl_attendance(device, record):
-                    new_records += 1
-            except Exception as e:
-                logger.error(f"Error processing ESSL attendance record: {str(e)}")
-                
-        self.stats['total_records'] += new_records
         logger.info(f"✅ Processed {new_records} new ESSL records from {device.name}")
-        
-    def _save_essl_attendance(self, device, record):
-        """Save ESSL attendance record to database"""
-        try:
-            # Find user by employee ID or biometric ID
-            user = CustomUser.objects.filter(
-                employee_id=record.get('employee_id')
-            ).first()
-            
-            if not user:
-                logger.warning(f"User with employee ID {record.get('employee_id')} not found")
-                return False
-                
-            # Parse timestamp
-            timestamp_str = record.get('timestamp')
-            if not timestamp_str:
-                return False
-                
-            try:
-                timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                if timezone.is_naive(timestamp):
-                    timestamp = timezone.make_aware(timestamp, timezone.get_current_timezone())
-            except:
-                logger.error(f"Invalid timestamp format: {timestamp_str}")
-                return False
-                
-            # Check for existing record
-            existing_attendance = Attendance.objects.filter(
-                user=user,
-                date=timestamp.date(),
-                check_in_time__hour=timestamp.hour,
-                check_in_time__minute=timestamp.minute
-            ).first()
-            
-            if existing_attendance:
-                # Update existing record
-                if not existing_attendance.check_out_time and timestamp > existing_attendance.check_in_time:
-                    existing_attendance.check_out_time = timestamp
-                    existing_attendance.save()
-                return True
-            else:
-                # Create new record
-                attendance = Attendance.objects.create(
-                    user=user,
-                    date=timestamp.date(),
-                    check_in_time=timestamp,
-                    status='present',
-                    device=device
-                )
-                return True
-                
-        except Exception as e:
-            logger.error(f"Error saving ESSL attendance record: {str(e)}")
-            return False
+        return new_records
             
     def _log_stats(self):
         """Log service statistics"""
         logger.info(f"📈 Service Stats - Fetches: {self.stats['total_fetches']}, "
                    f"Records: {self.stats['total_records']}, "
                    f"Duplicates Prevented: {self.stats['duplicates_prevented']}, "
-                   f"Errors: {self.stats['errors']}")
+                   f"Errors: {self.stats['errors']}, "
+                   f"Timeouts: {self.stats['timeouts']}")
+        identity = user_identity_cache.get_stats()
+        logger.info(f"👤 Identity Cache - Entries: {identity['entries']}, Hits: {identity['hits']}, "
+                   f"Negative Hits: {identity['negative_hits']}, Misses: {identity['misses']}")
                    
     def get_stats(self):
         """Get current service statistics"""
-        return self.stats.copy()
+        with self.stats_lock:
+            return self.stats.copy()
 
 # Global service instance
 auto_attendance_service = AutoAttendanceService()
@@ -432,7 +550,19 @@ class Command(BaseCommand):
             '--interval',
             type=int,
             default=30,
-            help='Fetch interval in seconds (default: 30)'
+            help='Seconds between device list reloads; each device is polled every Device.sync_interval minutes (default: 30)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=3,
+            help='Number of devices fetched concurrently (default: 3, 1 = sequential)'
+        )
+        parser.add_argument(
+            '--device-timeout',
+            type=int,
+            default=60,
+            help='Per-device fetch deadline in seconds (default: 60)'
         )
         parser.add_argument(
             '--daemon',
@@ -464,11 +594,14 @@ class Command(BaseCommand):
             interval = options['interval']
             daemon = options['daemon']
             
-            logger.info(f"Starting automatic attendance fetching service with {interval}s interval...")
+            logger.info(f"Starting automatic attendance fetching service, reloading devices every {interval}s...")
             
             # Initialize service
             auto_attendance_service.interval = interval
-            auto_attendance_service.start()
+            auto_attendance_service.max_workers = options['workers']
+            auto_attendance_service.device_timeout = options['device_timeout']
+            # Polls as the lease holder, or its shard of the devices in sharded mode
+            auto_attendance_service.start_coordinated()
             
             if daemon:
                 logger.info("Service started in daemon mode")
@@ -476,11 +609,11 @@ class Command(BaseCommand):
             else:
                 # Run in foreground
                 try:
-                    while auto_attendance_service.running:
+                    while auto_attendance_service.coordinated:
                         time.sleep(1)
                 except KeyboardInterrupt:
                     logger.info("Received interrupt signal")
-                    auto_attendance_service.stop()
+                    auto_attendance_service.stop_coordinated()
                     
         except Exception as e:
             logger.error(f"Error starting service: {str(e)}")
@@ -489,7 +622,7 @@ class Command(BaseCommand):
     def _stop_service(self):
         """Stop the automatic attendance fetching service"""
         try:
-            auto_attendance_service.stop()
+            auto_attendance_service.stop_coordinated()
             self.stdout.write(
                 self.style.SUCCESS('✅ Automatic attendance fetching service stopped')
             )
@@ -504,15 +637,47 @@ class Command(BaseCommand):
         self.stdout.write("📊 Automatic Attendance Fetching Service Status")
         self.stdout.write("=" * 50)
         self.stdout.write(f"Running: {'✅ Yes' if auto_attendance_service.running else '❌ No'}")
-        self.stdout.write(f"Interval: {auto_attendance_service.interval} seconds")
+        if poller_membership.enabled:
+            membership = poller_membership.get_status([device.id for device in auto_attendance_service.devices])
+            self.stdout.write(f"Poller Shards: {len(membership['instances'])} instance(s)")
+            for instance in membership['instances']:
+                self.stdout.write(f"  {instance['holder']}: {instance['devices']} devices, "
+                                  f"heartbeat {instance['heartbeat_at']}")
+        lease = poller_lease.get_status()
+        if lease['held']:
+            self.stdout.write(f"Poller Lease: held by {lease['holder']} (term {lease['term']}, "
+                              f"expires {lease['expires_at']})")
+        else:
+            self.stdout.write("Poller Lease: not held")
+        self.stdout.write(f"Device Reload Interval: {auto_attendance_service.interval} seconds")
+        self.stdout.write(f"Scheduled Devices: {len(auto_attendance_service.scheduler)}")
+        breaker = device_breaker.get_status()
+        self.stdout.write(f"Open Device Circuits: {len(breaker['circuits'])} "
+                          f"(opened {breaker['opened']}, skipped polls {breaker['rejected']})")
+        policy = adaptive_poll_policy.get_status()
+        if policy['enabled']:
+            self.stdout.write(f"Adaptive Polling: {policy['fast_interval']}s in {', '.join(policy['active_windows'])}, "
+                              f"freshness SLO {policy['freshness_slo']}s")
+        else:
+            self.stdout.write("Adaptive Polling: disabled (fixed Device.sync_interval)")
         self.stdout.write(f"Total Fetches: {stats['total_fetches']}")
         self.stdout.write(f"Total Records: {stats['total_records']}")
         self.stdout.write(f"Duplicates Prevented: {stats['duplicates_prevented']}")
         self.stdout.write(f"Errors: {stats['errors']}")
+        self.stdout.write(f"Device Timeouts: {stats['timeouts']}")
         
         if stats['last_successful_fetch']:
             self.stdout.write(f"Last Successful Fetch: {stats['last_successful_fetch']}")
             
+        if stats['last_cycle_wall_time'] is not None:
+            self.stdout.write(f"Last Cycle: {stats['last_cycle_devices']} devices, "
+                              f"{stats['last_cycle_wall_time']}s wall time vs "
+                              f"{stats['last_cycle_device_time']}s summed device time")
+            
+        identity = user_identity_cache.get_stats()
+        self.stdout.write(f"Identity Cache: {identity['entries']} entries, {identity['hits']} hits, "
+                          f"{identity['negative_hits']} negative hits, {identity['misses']} misses")
+            
         # Show device status
         self.stdout.write("\n📱 Device Status:")
         for device in auto_attendance_service.devices:
@@ -22,6 +22,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'attendance_system.settings')
 django.setup()
 
 from core.models import Device, CustomUser, Attendance, Office
+from core.log_watermark import DeviceLogWatermark
+from core.identity_cache import user_identity_cache
 
 # Configure logging
 logging.basicConfig(
@@ -128,11 +130,20 @@ class ImprovedAutoFetchService:
             logger.error(f"❌ Connection error to {device.name}: {str(e)}")
             return None
     
-    def get_device_attendance(self, conn, device):
-        """Get attendance records from device"""
+    def get_device_attendance(self, conn, device, watermark=None):
+        """Get attendance records from device (only records past the watermark, if given)"""
         try:
+            if watermark and not watermark.has_new_records(watermark.read_record_count(conn)):
+                logger.info(f"📊 No new attendance records on {device.name}")
+                return []
+                
             attendance_logs = conn.get_attendance()
             logger.info(f"📊 Found {len(attendance_logs)} attendance records on {device.name}")
+            
+            if watermark:
+                new_logs = watermark.filter_new(attendance_logs)
+                logger.info(f"📊 {len(new_logs)} new attendance records on {device.name}")
+                return new_logs
             return attendance_logs
         except Exception as e:
             logger.error(f"❌ Error getting attendance from {device.name}: {str(e)}")
@@ -158,13 +169,16 @@ class ImprovedAutoFetchService:
                 user_date_logs[key] = []
             user_date_logs[key].append(log)
         
+        # Resolve every user in the batch up front
+        user_pks = user_identity_cache.resolve_many({user_id for user_id, _ in user_date_logs}, 'employee_id')
+        users = CustomUser.objects.in_bulk(set(user_pks.values()))
+        
         # Process each user's logs for each date
         for (user_id, date), user_logs in user_date_logs.items():
             try:
                 # Find user in database
-                try:
-                    user = CustomUser.objects.get(employee_id=str(user_id))
-                except CustomUser.DoesNotExist:
+                user = users.get(user_pks.get(str(user_id).strip()))
+                if not user:
                     logger.warning(f"⚠️ User with employee_id {user_id} not found")
                     error_count += 1
                     continue
@@ -262,12 +276,14 @@ class ImprovedAutoFetchService:
                 if not conn:
                     continue
                 
-                # Get attendance data
-                attendance_logs = self.get_device_attendance(conn, device)
+                # Get attendance data recorded since the device's high-water mark
+                watermark = DeviceLogWatermark(device)
+                attendance_logs = self.get_device_attendance(conn, device, watermark)
                 
                 if attendance_logs:
                     # Process attendance records
                     synced_count, error_count = self.process_attendance_records(attendance_logs, device)
+                    watermark.advance()
                     
                     logger.info(f"📊 {device.name}: {synced_count} synced, {error_count} errors")
                     
@@ -276,7 +292,10 @@ class ImprovedAutoFetchService:
                     device.save(update_fields=['last_sync'])
                     
                 else:
-                    logger.warning(f"⚠️ No data fetched from device {device.name}")
+                    # A downloaded but empty (cleared) log still moves the mark back to its start
+                    if watermark.fetched_logs is not None:
+                        watermark.advance()
+                    logger.info(f"📊 No new data from device {device.name}")
                     
                 # Update last fetch time
                 self.last_fetch_times[device.id] = current_time
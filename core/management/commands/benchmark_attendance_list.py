@@ -0,0 +1,138 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+import time
+from urllib.parse import parse_qs, urlparse
+
+from core.models import Office, CustomUser, Attendance
+from core.serializers import AttendanceSerializer
+from core.views import AttendanceViewSet
+
+
+class _Rollback(Exception):
+    """Raised to roll back a benchmark run"""
+
+
+class Command(BaseCommand):
+    help = 'Compare payload size and latency of the full and compact attendance list for an office month'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--office', help='Office ID (default: first office)')
+        parser.add_argument('--users', type=int, default=200, help='Synthetic employees to add (default: 200)')
+        parser.add_argument('--days', type=int, default=30, help='Days of attendance per employee (default: 30)')
+        parser.add_argument('--page-size', type=int, default=500, help='Compact list page size (default: 500)')
+
+    def handle(self, *args, **options):
+        office = Office.objects.filter(id=options['office']).first() if options['office'] else Office.objects.first()
+        if not office:
+            raise CommandError('No matching office found')
+        admin = CustomUser.objects.filter(role='admin', is_active=True).first()
+        if not admin:
+            raise CommandError('An active admin user is needed to call the API')
+
+        self.stdout.write(f'Benchmarking the attendance list for {office.name} '
+                          f'({options["users"]} employees x {options["days"]} days)...')
+        self.stdout.write('Synthetic data is rolled back, nothing is kept.')
+
+        try:
+            with transaction.atomic():
+                start_date, end_date = self._make_attendance(office, options['users'], options['days'])
+                params = {'office': str(office.id), 'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}
+                self._report('Full rows (previous)', *self._full_list(office, start_date, end_date))
+                self._report('Compact, paginated', *self._paginated(admin, params, options['page_size']))
+                self._report('Compact + expand=user', *self._paginated(admin, {**params, 'expand': 'user'}, options['page_size']))
+                self._report('fields=id,date,status,user', *self._paginated(admin, {**params, 'fields': 'id,date,status,user'}, options['page_size']))
+                self._deep_page(office, start_date, end_date, options['page_size'])
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _make_attendance(self, office, user_count, days):
+        stamp = int(time.time())
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'bench_list_{stamp}_{i}', first_name='Bench', last_name=f'Employee {i}',
+                role='employee', office=office, email=f'bench{i}@example.com',
+                phone='9999999999', address='42 Long Street Name, Some Locality, Some City 400001',
+                department='Operations', designation='Associate',
+                emergency_contact_name='Contact Person', emergency_contact_phone='8888888888',
+                emergency_contact_relationship='Sibling', account_holder_name='Bench Employee',
+                bank_name='Example Bank', account_number='000123456789', ifsc_code='EXMP0000001',
+                bank_branch_name='Main Branch'
+            )
+            for i in range(user_count)
+        ])
+        end_date = timezone.localdate() - timedelta(days=1)
+        start_date = end_date - timedelta(days=days - 1)
+        attendance = []
+        for offset in range(days):
+            day = start_date + timedelta(days=offset)
+            check_in = timezone.make_aware(timezone.datetime.combine(day, timezone.datetime.min.time())) + timedelta(hours=9)
+            for user in users:
+                attendance.append(Attendance(
+                    user=user, office=office, date=day, check_in_time=check_in, check_out_time=check_in + timedelta(hours=9),
+                    total_hours=9, status='present'
+                ))
+        Attendance.objects.bulk_create(attendance, batch_size=1000)
+        return start_date, end_date
+
+    def _full_list(self, office, start_date, end_date):
+        """The previous list: every row with the full nested user"""
+        started = time.monotonic()
+        queryset = Attendance.objects.select_related('user', 'user__office', 'device').filter(
+            user__office=office, date__range=(start_date, end_date)
+        )
+        payload = JSONRenderer().render(AttendanceSerializer(queryset, many=True).data)
+        return len(queryset), len(payload), time.monotonic() - started, 1, time.monotonic() - started
+
+    def _paginated(self, admin, params, page_size):
+        """Walk every page of the compact list through the view"""
+        factory = APIRequestFactory()
+        view = AttendanceViewSet.as_view({'get': 'list'})
+        query = {**params, 'limit': page_size}
+        rows = size = pages = 0
+        first_page = None
+        started = time.monotonic()
+        while True:
+            request = factory.get('/api/attendance/', query)
+            force_authenticate(request, user=admin)
+            response = view(request)
+            if response.status_code != 200:
+                raise CommandError(f'List returned {response.status_code}: {response.data}')
+            size += len(JSONRenderer().render(response.data))
+            rows += len(response.data['results'])
+            pages += 1
+            if first_page is None:
+                first_page = time.monotonic() - started
+            if not response.data['next']:
+                break
+            query['cursor'] = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+        return rows, size, time.monotonic() - started, pages, first_page
+
+    def _report(self, label, rows, size, elapsed, pages, first_page):
+        self.stdout.write(
+            f'{label:<28} {rows} rows, {size / 1024:.0f} KiB ({size / max(rows, 1):.0f} B/row), '
+            f'{elapsed * 1000:.0f} ms total over {pages} page(s), first page {first_page * 1000:.0f} ms'
+        )
+
+    def _deep_page(self, office, start_date, end_date, page_size):
+        """Last page via OFFSET versus via the keyset cursor"""
+        queryset = Attendance.objects.filter(user__office=office, date__range=(start_date, end_date)).order_by('-date', '-id')
+        total = queryset.count()
+        offset = max(total - page_size, 0)
+
+        started = time.monotonic()
+        rows = list(queryset.values_list('date', 'id')[offset:offset + page_size])
+        offset_elapsed = time.monotonic() - started
+
+        if offset and rows:
+            before = list(queryset.values_list('date', 'id')[offset - 1:offset])[0]
+            started = time.monotonic()
+            list(queryset.filter(date__lte=before[0]).exclude(date=before[0], id__gte=before[1])
+                 .values_list('date', 'id')[:page_size])
+            keyset_elapsed = time.monotonic() - started
+            self.stdout.write(f'Last page: OFFSET {offset} took {offset_elapsed * 1000:.1f} ms, '
+                              f'keyset took {keyset_elapsed * 1000:.1f} ms')
@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+import random
+import time
+
+from core.models import Device, CustomUser, ESSLAttendanceLog
+from core.ingest_service import AttendanceIngestService
+
+
+class _Rollback(Exception):
+    """Raised to roll back a benchmark run"""
+
+
+class Command(BaseCommand):
+    help = 'Compare per-row and bulk ingestion throughput (records/sec) on synthetic punches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--device', help='Device ID to ingest for (default: first active device)')
+        parser.add_argument('--records', type=int, default=2000, help='Number of synthetic punches (default: 2000)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Bulk ingest batch size (default: 500)')
+
+    def handle(self, *args, **options):
+        device = self._get_device(options['device'])
+        punches = self._make_punches(device, options['records'])
+
+        self.stdout.write(f'Benchmarking ingestion of {len(punches)} punches for {device.name}...')
+        self.stdout.write('Both runs are rolled back, no data is kept.')
+
+        per_row = self._run(lambda: self._ingest_per_row(device, punches))
+        bulk = self._run(lambda: AttendanceIngestService(device, batch_size=options['batch_size']).ingest(punches))
+
+        self.stdout.write(f'Per-row path: {per_row:.2f}s ({len(punches) / per_row:.0f} records/sec)')
+        self.stdout.write(f'Bulk path:    {bulk:.2f}s ({len(punches) / bulk:.0f} records/sec)')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {per_row / bulk:.1f}x'))
+
+    def _get_device(self, device_id):
+        devices = Device.objects.filter(is_active=True)
+        device = devices.filter(id=device_id).first() if device_id else devices.first()
+        if not device:
+            raise CommandError('No matching active device found')
+        return device
+
+    def _make_punches(self, device, count):
+        biometric_ids = list(
+            CustomUser.objects.filter(office=device.office, biometric_id__isnull=False)
+            .values_list('biometric_id', flat=True)
+        ) or [f'BENCH{i:04d}' for i in range(100)]
+
+        start = timezone.now() - timedelta(days=30)
+        return [
+            {
+                'biometric_id': random.choice(biometric_ids),
+                'punch_time': start + timedelta(seconds=i * 37),
+                'punch_type': random.choice(['in', 'out']),
+            }
+            for i in range(count)
+        ]
+
+    def _run(self, func):
+        """Time func inside a transaction that is always rolled back"""
+        started = time.monotonic()
+        try:
+            with transaction.atomic():
+                func()
+                elapsed = time.monotonic() - started
+                raise _Rollback()
+        except _Rollback:
+            pass
+        return elapsed
+
+    def _ingest_per_row(self, device, punches):
+        """The previous path: existence check, user lookup and INSERT per punch"""
+        for punch in punches:
+            punch_time = punch['punch_time']
+            if ESSLAttendanceLog.objects.filter(
+                device=device,
+                biometric_id=punch['biometric_id'],
+                punch_time=punch_time
+            ).first():
+                continue
+            user = CustomUser.objects.filter(biometric_id=punch['biometric_id']).first()
+            ESSLAttendanceLog.objects.create(
+                device=device,
+                biometric_id=punch['biometric_id'],
+                user=user,
+                punch_time=punch_time,
+                punch_type=punch['punch_type'],
+                is_processed=False
+            )
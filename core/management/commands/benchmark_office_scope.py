@@ -0,0 +1,107 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from datetime import timedelta
+import statistics
+import time
+
+from core.models import Office, CustomUser, Attendance, Leave
+
+
+class _Rollback(Exception):
+    """Raised to roll back a benchmark run"""
+
+
+class Command(BaseCommand):
+    help = 'Compare query plans and timings of manager-scoped queries through user__office and the denormalized office'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offices', type=int, default=10, help='Synthetic offices (default: 10)')
+        parser.add_argument('--users', type=int, default=100, help='Employees per office (default: 100)')
+        parser.add_argument('--days', type=int, default=60, help='Days of attendance per employee (default: 60)')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query, the median is reported (default: 20)')
+        parser.add_argument('--plans', action='store_true', help='Print the EXPLAIN output of each query')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Benchmarking manager-scoped queries on {options["offices"]} offices x '
+                          f'{options["users"]} employees x {options["days"]} days...')
+        self.stdout.write('Synthetic data is rolled back, nothing is kept.')
+
+        try:
+            with transaction.atomic():
+                office, today = self._make_data(options['offices'], options['users'], options['days'])
+                month_start = today - timedelta(days=30)
+                queries = [
+                    (
+                        "Today's status counts",
+                        Attendance.objects.filter(user__office=office, date=today),
+                        Attendance.objects.filter(office=office, date=today),
+                        lambda queryset: queryset.aggregate(
+                            present=Count('id', filter=Q(status='present')), total=Count('id')
+                        ),
+                    ),
+                    (
+                        'Month list page',
+                        Attendance.objects.filter(user__office=office, date__gte=month_start).order_by('-date', '-id'),
+                        Attendance.objects.filter(office=office, date__gte=month_start).order_by('-date', '-id'),
+                        lambda queryset: list(queryset.values_list('id', 'date', 'status')[:100]),
+                    ),
+                    (
+                        'Pending leaves',
+                        Leave.objects.filter(user__office=office, status='pending'),
+                        Leave.objects.filter(office=office, status='pending'),
+                        lambda queryset: queryset.count(),
+                    ),
+                ]
+                for label, joined, denormalized, run in queries:
+                    before = self._time(lambda: run(joined), options['repeat'])
+                    after = self._time(lambda: run(denormalized), options['repeat'])
+                    self.stdout.write(f'{label:<22} user__office: {before * 1000:7.2f} ms   '
+                                      f'office: {after * 1000:7.2f} ms   ({before / after:.1f}x)')
+                    if options['plans']:
+                        self.stdout.write('  user__office plan:\n    ' + joined.explain().replace('\n', '\n    '))
+                        self.stdout.write('  office plan:\n    ' + denormalized.explain().replace('\n', '\n    '))
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _make_data(self, office_count, user_count, days):
+        stamp = int(time.time())
+        offices = Office.objects.bulk_create([
+            Office(name=f'Bench Scope {stamp} {i}', address='Benchmark') for i in range(office_count)
+        ])
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'bench_scope_{stamp}_{i}_{j}', role='employee', office=office)
+            for i, office in enumerate(offices)
+            for j in range(user_count)
+        ])
+        today = timezone.localdate()
+        statuses = ('present', 'present', 'present', 'late', 'absent', 'half_day')
+        Attendance.objects.bulk_create(
+            [
+                Attendance(
+                    user=user, office_id=user.office_id, date=today - timedelta(days=offset),
+                    status=statuses[(offset + index) % len(statuses)]
+                )
+                for offset in range(days)
+                for index, user in enumerate(users)
+            ],
+            batch_size=2000
+        )
+        Leave.objects.bulk_create([
+            Leave(
+                user=user, office_id=user.office_id, leave_type='casual', start_date=today, end_date=today,
+                total_days=1, reason='Benchmark', status='pending' if index % 3 else 'approved'
+            )
+            for index, user in enumerate(users)
+        ])
+        return offices[0], today
+
+    def _time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
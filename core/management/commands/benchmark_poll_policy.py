@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import datetime, timedelta
+import bisect
+import random
+import statistics
+
+from core.poll_policy import AdaptivePollPolicy
+
+
+class Command(BaseCommand):
+    help = 'Simulate a week of polls of one device under a fixed interval and the adaptive poll policy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--staff', type=int, default=60, help='Punches per device in each active window (default: 60)')
+        parser.add_argument('--stray-per-hour', type=float, default=1.0,
+                            help='Punches per hour outside the windows during working hours (default: 1)')
+        parser.add_argument('--fixed-interval', type=int, default=30, help='Seconds between polls of the fixed schedule (default: 30)')
+        parser.add_argument('--sync-interval', type=int, default=5, help='Device.sync_interval in minutes (default: 5)')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        policy = AdaptivePollPolicy.from_settings()
+        policy.enabled = True
+        today = timezone.localdate()
+        monday = timezone.make_aware(datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time()))
+        week = 7 * 24 * 3600
+        punches = self._punches(policy, monday, week, options)
+
+        self.stdout.write(f'{len(punches)} synthetic punches over one week, freshness SLO {policy.freshness_slo}s')
+        base = options['sync_interval'] * 60
+        for label, next_interval in (
+            (f'fixed {options["fixed_interval"]}s', lambda new, t: options['fixed_interval']),
+            ('adaptive', lambda new, t: policy.next_interval('sim', new, base, when=monday + timedelta(seconds=t), now=t)),
+        ):
+            polls, delays = self._simulate(punches, week, next_interval)
+            self.stdout.write(f'{label:<12} {polls:7d} polls   punch delay mean {statistics.mean(delays):6.1f}s  '
+                              f'p99 {sorted(delays)[int(len(delays) * 0.99)]:6.1f}s  max {max(delays):6.1f}s')
+
+    def _punches(self, policy, monday, week, options):
+        """Seconds from Monday midnight at which punches land on the device"""
+        rng = random.Random(options['seed'])
+        punches = []
+        for day in range(7):
+            date = (monday + timedelta(days=day)).date()
+            if date.weekday() not in policy.active_days:
+                continue
+            midnight = day * 24 * 3600
+            for start, end in policy.active_windows:
+                opens = midnight + start.hour * 3600 + start.minute * 60
+                closes = midnight + end.hour * 3600 + end.minute * 60
+                punches += [rng.uniform(opens, closes) for _ in range(options['staff'])]
+            start, end = policy.working_hours
+            hours = (end.hour + end.minute / 60) - (start.hour + start.minute / 60)
+            first = midnight + start.hour * 3600 + start.minute * 60
+            punches += [rng.uniform(first, first + hours * 3600)
+                        for _ in range(int(options['stray_per_hour'] * hours))]
+        return sorted(punch for punch in punches if punch < week)
+
+    def _simulate(self, punches, duration, next_interval):
+        """Poll count and per-punch delay between landing on the device and being fetched"""
+        polls, delays, fetched, t = 0, [], 0, 0.0
+        while t < duration:
+            polls += 1
+            upto = bisect.bisect_right(punches, t)
+            delays += [t - punch for punch in punches[fetched:upto]]
+            new, fetched = upto - fetched, upto
+            t += next_interval(new, t)
+        return polls, delays
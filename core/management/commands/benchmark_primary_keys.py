@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+import time
+import uuid
+
+from core.ids import uuid7
+from core.models import CustomUser, Notification
+
+
+class _Rollback(Exception):
+    """Raised to roll back a benchmark run"""
+
+
+class Command(BaseCommand):
+    help = 'Compare insert throughput of random (uuid4) and time-ordered (uuid7) primary keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help='Rows inserted per key scheme (default: 200000)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT (default: 1000)')
+
+    def handle(self, *args, **options):
+        user = CustomUser.objects.filter(is_active=True).first()
+        if not user:
+            raise CommandError('An active user is needed to own the synthetic notifications')
+
+        self.stdout.write(f'Inserting {options["rows"]} notifications per key scheme '
+                          f'in batches of {options["batch_size"]}...')
+        self.stdout.write('Synthetic data is rolled back, nothing is kept.')
+
+        for label, make_id in (('uuid4 (random)', uuid.uuid4), ('uuid7 (time-ordered)', uuid7)):
+            total, last_tenth = self._insert(user, make_id, options['rows'], options['batch_size'])
+            self.stdout.write(f'{label:<22} {options["rows"] / total:9.0f} rows/s overall, '
+                              f'{options["rows"] / 10 / last_tenth:9.0f} rows/s over the last 10%')
+
+    def _insert(self, user, make_id, rows, batch_size):
+        """Seconds for all batches and for the last tenth of them, each scheme in its own rolled back transaction"""
+        timings = []
+        try:
+            with transaction.atomic():
+                for start in range(0, rows, batch_size):
+                    batch = [
+                        Notification(id=make_id(), user=user, title='Benchmark', message='Benchmark', notification_type='system')
+                        for _ in range(min(batch_size, rows - start))
+                    ]
+                    started = time.perf_counter()
+                    Notification.objects.bulk_create(batch)
+                    timings.append(time.perf_counter() - started)
+                raise _Rollback()
+        except _Rollback:
+            pass
+        return sum(timings), sum(timings[-max(len(timings) // 10, 1):])
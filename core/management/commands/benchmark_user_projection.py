@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from datetime import timedelta
+import time
+
+from core.models import Office, CustomUser, Attendance, Leave
+from core.serializers import AttendanceListSerializer, LeaveSerializer
+
+
+class _Rollback(Exception):
+    """Raised to roll back a benchmark run"""
+
+
+class Command(BaseCommand):
+    help = 'Compare list and report queries joining the full user row with the deferred user projection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Synthetic employees (default: 1000)')
+        parser.add_argument('--days', type=int, default=365, help='Days of attendance per employee (default: 365)')
+        parser.add_argument('--offices', type=int, default=5, help='Offices the employees are spread over (default: 5)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Benchmarking user projections on {options["users"]} employees x {options["days"]} days...')
+        self.stdout.write('Synthetic data is rolled back, nothing is kept.')
+
+        try:
+            with transaction.atomic():
+                office, start_date = self._make_data(options['users'], options['days'], options['offices'])
+                self.stdout.write(f'{Attendance.objects.count()} attendance rows, {Leave.objects.count()} leaves')
+
+                month = Attendance.objects.filter(office=office, date__gte=timezone.localdate() - timedelta(days=30))
+                self._compare(
+                    'Attendance list, office month',
+                    month.select_related('user', 'user__office'),
+                    lambda rows: AttendanceListSerializer(rows, many=True).data
+                )
+                year = Attendance.objects.filter(office=office, date__gte=start_date)
+                self._compare(
+                    'Attendance report, office year',
+                    year.select_related('user', 'user__office'),
+                    lambda rows: [(row.user.get_full_name(), row.user.employee_id, row.user.office.name) for row in rows]
+                )
+                leaves = Leave.objects.filter(office=office)
+                self._compare(
+                    'Leave list, office',
+                    leaves.select_related('user', 'approved_by'),
+                    lambda rows: LeaveSerializer(rows, many=True).data,
+                    relations=('user', 'approved_by')
+                )
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _make_data(self, user_count, days, office_count):
+        stamp = int(time.time())
+        offices = Office.objects.bulk_create([
+            Office(name=f'Bench Projection {stamp} {i}', address='Benchmark') for i in range(office_count)
+        ])
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'bench_projection_{stamp}_{i}', first_name='Bench', last_name=f'Employee {i}',
+                role='employee', office=offices[i % office_count], employee_id=f'BP{stamp}{i}',
+                email=f'bench{i}@example.com', password='pbkdf2_sha256$870000$' + 'x' * 66,
+                phone='9999999999', address='42 Long Street Name, Some Locality, Some City 400001',
+                department='Operations', designation='Associate',
+                emergency_contact_name='Contact Person', emergency_contact_phone='8888888888',
+                emergency_contact_relationship='Sibling', account_holder_name='Bench Employee',
+                bank_name='Example Bank', account_number='000123456789', ifsc_code='EXMP0000001',
+                bank_branch_name='Main Branch'
+            )
+            for i in range(user_count)
+        ])
+        today = timezone.localdate()
+        start_date = today - timedelta(days=days - 1)
+        for offset in range(days):
+            day = start_date + timedelta(days=offset)
+            Attendance.objects.bulk_create(
+                [Attendance(user=user, office_id=user.office_id, date=day, status='present') for user in users],
+                batch_size=1000
+            )
+        Leave.objects.bulk_create([
+            Leave(
+                user=user, office_id=user.office_id, leave_type='casual', approved_by=users[0],
+                start_date=start_date + timedelta(days=month * 30), end_date=start_date + timedelta(days=month * 30),
+                total_days=1, reason='Benchmark', status='approved'
+            )
+            for user in users
+            for month in range(min(days // 30, 12))
+        ], batch_size=1000)
+        return offices[0], start_date
+
+    def _compare(self, label, queryset, consume, relations=('user',)):
+        projected = queryset.defer(*CustomUser.detail_field_paths(*relations))
+        results = [self._measure(queryset, consume), self._measure(projected, consume)]
+        self.stdout.write(label)
+        for name, (columns, size, elapsed) in zip(('  full user row', '  deferred details'), results):
+            self.stdout.write(f'{name:<20} {columns:3d} columns, {size / 1024:8.0f} KiB fetched, {elapsed * 1000:7.0f} ms')
+
+    def _measure(self, queryset, consume):
+        """Fetched columns and bytes of the raw SQL, and the time to load and consume the rows"""
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        columns = len(rows[0]) if rows else 0
+        size = sum(len(str(value)) for row in rows for value in row if value is not None)
+
+        started = time.perf_counter()
+        consume(list(queryset.all()))
+        return columns, size, time.perf_counter() - started
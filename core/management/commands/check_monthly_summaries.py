@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import Office
+from core.monthly_summary import monthly_summary_service
+
+
+class Command(BaseCommand):
+    help = 'Compare the monthly user summaries with the raw attendance rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Year (default: current year)')
+        parser.add_argument('--month', type=int, help='Month 1-12 (default: current month)')
+        parser.add_argument('--office', help='Office ID (default: all offices)')
+        parser.add_argument('--fix', action='store_true', help='Rebuild the month when differences are found')
+        parser.add_argument('--limit', type=int, default=20, help='Maximum differences to print')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        year = options['year'] or today.year
+        month = options['month'] or today.month
+        if not 1 <= month <= 12:
+            raise CommandError('Month must be between 1 and 12')
+
+        office_id = options['office']
+        if office_id and not Office.objects.filter(id=office_id).exists():
+            raise CommandError(f'Office {office_id} not found')
+
+        self.stdout.write(f'Checking monthly summaries for {year}-{month:02d}...')
+        problems = monthly_summary_service.verify(year, month, office_id=office_id)
+
+        if not problems:
+            self.stdout.write(self.style.SUCCESS('Monthly summaries match the attendance rows'))
+            return
+
+        for user_id, problem, stored, expected in problems[:options['limit']]:
+            if problem == 'mismatch':
+                fields = [field for field in expected if stored[field] != expected[field]]
+                details = ', '.join(f'{field}: {stored[field]} != {expected[field]}' for field in fields)
+                self.stdout.write(f'  {user_id}: mismatch ({details})')
+            else:
+                self.stdout.write(f'  {user_id}: {problem}')
+        if len(problems) > options['limit']:
+            self.stdout.write(f'  ... and {len(problems) - options["limit"]} more')
+
+        if options['fix']:
+            count = monthly_summary_service.rebuild(year, month, office_id=office_id)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} monthly user summaries'))
+        else:
+            raise CommandError(f'{len(problems)} monthly summaries differ from the attendance rows (use --fix)')
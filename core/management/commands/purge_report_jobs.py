@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.report_jobs import report_job_runner
+
+
+class Command(BaseCommand):
+    help = 'Delete finished report jobs and their result files once past the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention', type=int,
+                            help='Seconds to keep finished jobs (default: ATTENDANCE_REPORT_JOBS RESULT_RETENTION)')
+
+    def handle(self, *args, **options):
+        if options['retention'] is not None:
+            report_job_runner.result_retention = options['retention']
+        deleted = report_job_runner.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} report job(s)'))
@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min, Max
+from django.utils import timezone
+
+from core.models import Attendance, Office
+from core.daily_summary import daily_summary_service
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily office attendance summaries for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First date, YYYY-MM-DD')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last date, YYYY-MM-DD (default: today)')
+        parser.add_argument('--days', type=int, help='Rebuild the last N days instead of --start/--end')
+        parser.add_argument('--all', action='store_true', help='Rebuild every date that has attendance')
+        parser.add_argument('--office', help='Office ID (default: all offices)')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+
+        if options['all']:
+            bounds = Attendance.objects.aggregate(first=Min('date'), last=Max('date'))
+            if not bounds['first']:
+                self.stdout.write('No attendance records found')
+                return
+            start_date, end_date = bounds['first'], bounds['last']
+        elif options['days']:
+            start_date, end_date = today - timedelta(days=options['days'] - 1), today
+        elif options['start']:
+            start_date, end_date = options['start'], options['end'] or today
+        else:
+            raise CommandError('Give --start, --days or --all')
+
+        if start_date > end_date:
+            raise CommandError('Start date cannot be after end date')
+
+        office_id = options['office']
+        if office_id and not Office.objects.filter(id=office_id).exists():
+            raise CommandError(f'Office {office_id} not found')
+
+        self.stdout.write(f'Rebuilding daily summaries from {start_date} to {end_date}...')
+        count = daily_summary_service.rebuild(start_date, end_date, office_id=office_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} daily office summaries'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import Office
+from core.status_recompute import status_recompute_service
+
+
+class Command(BaseCommand):
+    help = 'Recompute attendance status for a month after working hours settings change'
+
+    def add_arguments(self, parser):
+        today = timezone.localdate()
+        parser.add_argument('--office', help='Office ID (default: all offices)')
+        parser.add_argument('--year', type=int, default=today.year, help='Year (default: current year)')
+        parser.add_argument('--month', type=int, default=today.month, help='Month 1-12 (default: current month)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would change')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['month'] <= 12:
+            raise CommandError('--month must be between 1 and 12')
+
+        office_id = options['office']
+        if office_id and not Office.objects.filter(id=office_id).exists():
+            raise CommandError(f'Office {office_id} not found')
+
+        result = status_recompute_service.recompute(
+            options['year'], options['month'], office_id=office_id, dry_run=options['dry_run']
+        )
+
+        verb = 'would change' if result['dry_run'] else 'changed'
+        self.stdout.write(f"Checked {result['rows_checked']} attendance rows in {result['elapsed']}s "
+                          f"({'vectorized' if result['vectorized'] else 'pure Python'})")
+        for transition, count in sorted(result['transitions'].items()):
+            self.stdout.write(f'  {transition}: {count}')
+        self.stdout.write(self.style.SUCCESS(f"{result['rows_changed']} rows {verb}"))
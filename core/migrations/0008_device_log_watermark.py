@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_add_document_types'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='last_log_index',
+            field=models.IntegerField(blank=True, help_text='Number of device log records already processed', null=True),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='last_log_timestamp',
+            field=models.DateTimeField(blank=True, help_text='Timestamp of the last processed log record', null=True),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='last_log_uid',
+            field=models.IntegerField(blank=True, help_text='Device user uid of the last processed log record', null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:52
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_punches(apps, schema_editor):
+    """Keep one row per (device, biometric_id, punch_time), preferring processed rows"""
+    ESSLAttendanceLog = apps.get_model('core', 'ESSLAttendanceLog')
+
+    duplicates = (
+        ESSLAttendanceLog.objects
+        .values('device_id', 'biometric_id', 'punch_time')
+        .annotate(row_count=Count('id'))
+        .filter(row_count__gt=1)
+    )
+    for group in duplicates.iterator():
+        rows = ESSLAttendanceLog.objects.filter(
+            device_id=group['device_id'],
+            biometric_id=group['biometric_id'],
+            punch_time=group['punch_time'],
+        ).order_by('-is_processed', 'created_at')
+        keep = rows.first()
+        rows.exclude(pk=keep.pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_device_log_watermark'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_punches, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='esslattendancelog',
+            constraint=models.UniqueConstraint(fields=('device', 'biometric_id', 'punch_time'), name='unique_device_punch'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:04
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_daily_summaries(apps, schema_editor):
+    """Materialize existing attendance into per-office daily summaries"""
+    Attendance = apps.get_model('core', 'Attendance')
+    DailyOfficeSummary = apps.get_model('core', 'DailyOfficeSummary')
+
+    statuses = ('present', 'late', 'half_day', 'absent', 'leave')
+    rows = (
+        Attendance.objects.exclude(user__office__isnull=True)
+        .values('user__office_id', 'date')
+        .annotate(
+            total_records=Count('id'),
+            total_hours=Sum('total_hours'),
+            **{f'{status}_count': Count('id', filter=Q(status=status)) for status in statuses}
+        )
+        .order_by()
+    )
+    summaries = [
+        DailyOfficeSummary(
+            office_id=row['user__office_id'],
+            date=row['date'],
+            total_records=row['total_records'],
+            total_hours=row['total_hours'] or 0,
+            **{f'{status}_count': row[f'{status}_count'] for status in statuses}
+        )
+        for row in rows
+    ]
+    DailyOfficeSummary.objects.bulk_create(summaries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_essl_attendance_log_unique_punch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOfficeSummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('late_count', models.PositiveIntegerField(default=0)),
+                ('half_day_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('leave_count', models.PositiveIntegerField(default=0)),
+                ('total_records', models.PositiveIntegerField(default=0)),
+                ('total_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('office', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='core.office')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Office Summaries',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='core_dailyo_date_73eb25_idx')],
+                'unique_together': {('office', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_summaries, migrations.RunPython.noop),
+    ]
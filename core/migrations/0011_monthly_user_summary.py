@@ -0,0 +1,82 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:07
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+import calendar
+from decimal import Decimal
+
+
+def backfill_monthly_summaries(apps, schema_editor):
+    """Materialize existing attendance into per-user monthly summaries"""
+    Attendance = apps.get_model('core', 'Attendance')
+    MonthlyUserSummary = apps.get_model('core', 'MonthlyUserSummary')
+
+    counts = {
+        'present_days': 'present',
+        'absent_days': 'absent',
+        'late_days': 'late',
+        'half_days': 'half_day',
+        'leave_days': 'leave',
+    }
+    rows = (
+        Attendance.objects.annotate(month=TruncMonth('date'))
+        .values('user_id', 'month')
+        .annotate(
+            total_records=Count('id'),
+            total_hours=Sum('total_hours'),
+            **{field: Count('id', filter=Q(status=status)) for field, status in counts.items()}
+        )
+        .order_by()
+    )
+    summaries = []
+    for row in rows:
+        month = row['month']
+        total_hours = Decimal(row['total_hours'] or 0).quantize(Decimal('0.01'))
+        standard_hours = Decimal('9.0') * calendar.monthrange(month.year, month.month)[1]
+        summaries.append(MonthlyUserSummary(
+            user_id=row['user_id'],
+            month=month,
+            total_records=row['total_records'],
+            total_hours=total_hours,
+            hours_deficit=max(Decimal('0'), standard_hours - total_hours),
+            **{field: row[field] for field in counts}
+        ))
+    MonthlyUserSummary.objects.bulk_create(summaries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_daily_office_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyUserSummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('present_days', models.PositiveIntegerField(default=0)),
+                ('absent_days', models.PositiveIntegerField(default=0)),
+                ('late_days', models.PositiveIntegerField(default=0)),
+                ('half_days', models.PositiveIntegerField(default=0)),
+                ('leave_days', models.PositiveIntegerField(default=0)),
+                ('total_records', models.PositiveIntegerField(default=0)),
+                ('total_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('hours_deficit', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Monthly User Summaries',
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['month'], name='core_monthl_month_1c87a7_idx')],
+                'unique_together': {('user', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_monthly_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:09
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_monthly_user_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('report_type', models.CharField(choices=[('attendance', 'Attendance Report'), ('leave', 'Leave Report'), ('office', 'Office Report'), ('user', 'User Report'), ('monthly_attendance', 'Monthly Attendance Report')], max_length=30)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('params_hash', models.CharField(help_text='SHA-256 of the report type and normalized parameters', max_length=64)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('is_stale', models.BooleanField(default=False, help_text='Underlying data changed after the job was submitted')),
+                ('result_file', models.FileField(blank=True, null=True, upload_to='reports/')),
+                ('result_size', models.PositiveIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['params_hash', 'is_stale'], name='core_report_params__385160_idx')],
+            },
+        ),
+    ]
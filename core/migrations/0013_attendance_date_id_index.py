@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_report_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'id'], name='core_attend_date_10cb2c_idx'),
+        ),
+    ]
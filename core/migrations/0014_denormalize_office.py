@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_office(apps, schema_editor):
+    """Copy each user's office onto their attendance, leave and document rows"""
+    CustomUser = apps.get_model('core', 'CustomUser')
+    office_ids = CustomUser.objects.exclude(office__isnull=True).values_list('office_id', flat=True).distinct()
+    for model_name in ('Attendance', 'Leave', 'Document'):
+        model = apps.get_model('core', model_name)
+        for office_id in office_ids:
+            # One UPDATE per office: WHERE user_id IN (SELECT id FROM users WHERE office_id = ...)
+            model.objects.filter(
+                user__in=CustomUser.objects.filter(office_id=office_id).values('id')
+            ).update(office_id=office_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_attendance_date_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='office',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.office'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='office',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.office'),
+        ),
+        migrations.AddField(
+            model_name='leave',
+            name='office',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.office'),
+        ),
+        migrations.RunPython(backfill_office, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['office', 'date', 'status'], name='core_attend_office__a21501_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['office', 'created_at'], name='core_docume_office__820e5a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['office', 'status'], name='core_leave_office__6bb0c3_idx'),
+        ),
+    ]
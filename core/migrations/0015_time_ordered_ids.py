@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:18
+
+import core.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_denormalize_office'),
+    ]
+
+    # The default is applied in Python and the column type is unchanged, so only the
+    # migration state moves; no table is rebuilt
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='attendance',
+                    name='id',
+                    field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='attendancelog',
+                    name='id',
+                    field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='esslattendancelog',
+                    name='id',
+                    field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='notification',
+                    name='id',
+                    field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
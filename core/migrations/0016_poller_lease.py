@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:27
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_time_ordered_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollerLease',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('holder', models.CharField(blank=True, help_text='host:pid:token of the holding process', max_length=200)),
+                ('hostname', models.CharField(blank=True, max_length=100)),
+                ('pid', models.PositiveIntegerField(blank=True, null=True)),
+                ('term', models.PositiveIntegerField(default=0, help_text='Incremented on every change of holder')),
+                ('acquired_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
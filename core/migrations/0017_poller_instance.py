@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:30
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_poller_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollerInstance',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('holder', models.CharField(help_text='host:pid:token of the poller process', max_length=200, unique=True)),
+                ('hostname', models.CharField(blank=True, max_length=100)),
+                ('pid', models.PositiveIntegerField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('heartbeat_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['started_at'],
+            },
+        ),
+    ]
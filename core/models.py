@@ -3,8 +3,11 @@ from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 import uuid
+from datetime import date, timedelta
 from django.core.exceptions import ValidationError
 
+from .ids import uuid7
+
 
 class Office(models.Model):
     """Office model for multi-office support"""
@@ -98,6 +101,17 @@ class CustomUser(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Credential, contact, HR and bank columns that list rows and reports never
+    # read; those querysets defer them via detail_field_paths() to keep joins narrow
+    DETAIL_FIELDS = (
+        'password', 'email', 'last_login', 'is_superuser', 'is_staff', 'date_joined',
+        'phone', 'address', 'date_of_birth', 'gender', 'profile_picture', 'joining_date',
+        'department', 'designation', 'salary',
+        'emergency_contact_name', 'emergency_contact_phone', 'emergency_contact_relationship',
+        'account_holder_name', 'bank_name', 'account_number', 'ifsc_code', 'bank_branch_name',
+        'last_login_ip', 'created_at', 'updated_at',
+    )
+
     class Meta:
         verbose_name = "User"
         verbose_name_plural = "Users"
@@ -121,6 +135,23 @@ class CustomUser(AbstractUser):
     def save(self, *args, **kwargs):
         self.clean()
         super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'office' in update_fields:
+            # Users created or edited in this process have no from_db() snapshot to compare with
+            self._loaded_office_id = self.office_id
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored office so an office change can be propagated
+        if 'office_id' in field_names:
+            instance._loaded_office_id = values[field_names.index('office_id')]
+        return instance
+
+    @classmethod
+    def detail_field_paths(cls, *relations):
+        """defer() paths for DETAIL_FIELDS through the given user relations, e.g. 'user'"""
+        return [f"{relation}__{field}" for relation in relations for field in cls.DETAIL_FIELDS]
 
     @property
     def is_admin(self):
@@ -165,6 +196,11 @@ class Device(models.Model):
     sync_interval = models.IntegerField(default=5, help_text="Sync interval in minutes")
     last_attendance_sync = models.DateTimeField(null=True, blank=True)
     
+    # Attendance log high-water mark (position of the last processed record on the device)
+    last_log_index = models.IntegerField(null=True, blank=True, help_text="Number of device log records already processed")
+    last_log_uid = models.IntegerField(null=True, blank=True, help_text="Device user uid of the last processed log record")
+    last_log_timestamp = models.DateTimeField(null=True, blank=True, help_text="Timestamp of the last processed log record")
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -222,8 +258,10 @@ class Attendance(models.Model):
         ('leave', 'Leave'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    # Denormalized from user.office so office-scoped queries skip the user join
+    office = models.ForeignKey(Office, on_delete=models.SET_NULL, null=True, blank=True)
     date = models.DateField()
     check_in_time = models.DateTimeField(null=True, blank=True)
     check_out_time = models.DateTimeField(null=True, blank=True)
@@ -237,10 +275,22 @@ class Attendance(models.Model):
     class Meta:
         unique_together = ['user', 'date']
         ordering = ['-date', '-check_in_time']
+        indexes = [
+            # Keyset pagination key
+            models.Index(fields=['date', 'id']),
+            models.Index(fields=['office', 'date', 'status']),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.date} ({self.status})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Keep the loaded state so the audit log can record only what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def calculate_total_hours(self):
         """Calculate total working hours"""
         if self.check_in_time and self.check_out_time:
@@ -265,9 +315,64 @@ class Attendance(models.Model):
     def save(self, *args, **kwargs):
         if self.check_in_time and self.check_out_time:
             self.total_hours = self.calculate_total_hours()
+        if self.office_id is None and self.user_id:
+            self.office_id = self.user.office_id
         super().save(*args, **kwargs)
 
 
+class DailyOfficeSummary(models.Model):
+    """Materialized per-office daily attendance counts, refreshed as attendance changes"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    office = models.ForeignKey(Office, on_delete=models.CASCADE, related_name='daily_summaries')
+    date = models.DateField()
+    present_count = models.PositiveIntegerField(default=0)
+    late_count = models.PositiveIntegerField(default=0)
+    half_day_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+    leave_count = models.PositiveIntegerField(default=0)
+    total_records = models.PositiveIntegerField(default=0)
+    total_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Daily Office Summaries"
+        unique_together = ['office', 'date']
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.office.name} - {self.date} ({self.total_records} records)"
+
+
+class MonthlyUserSummary(models.Model):
+    """Materialized per-user monthly attendance totals, refreshed as attendance changes"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='monthly_summaries')
+    month = models.DateField(help_text="First day of the month")
+    present_days = models.PositiveIntegerField(default=0)
+    absent_days = models.PositiveIntegerField(default=0)
+    late_days = models.PositiveIntegerField(default=0)
+    half_days = models.PositiveIntegerField(default=0)
+    leave_days = models.PositiveIntegerField(default=0)
+    total_records = models.PositiveIntegerField(default=0)
+    total_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    hours_deficit = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Monthly User Summaries"
+        unique_together = ['user', 'month']
+        ordering = ['-month']
+        indexes = [
+            models.Index(fields=['month']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.month:%Y-%m} ({self.total_records} records)"
+
+
 class Leave(models.Model):
     """Leave model for employee leave management"""
     LEAVE_TYPE_CHOICES = [
@@ -288,6 +393,8 @@ class Leave(models.Model):
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    # Denormalized from user.office so office-scoped queries skip the user join
+    office = models.ForeignKey(Office, on_delete=models.SET_NULL, null=True, blank=True)
     leave_type = models.CharField(max_length=20, choices=LEAVE_TYPE_CHOICES)
     start_date = models.DateField()
     end_date = models.DateField()
@@ -308,10 +415,18 @@ class Leave(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['office', 'status']),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.leave_type} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        if self.office_id is None and self.user_id:
+            self.office_id = self.user.office_id
+        super().save(*args, **kwargs)
+
 
 class Document(models.Model):
     """Document model for file management"""
@@ -335,6 +450,8 @@ class Document(models.Model):
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    # Denormalized from user.office so office-scoped queries skip the user join
+    office = models.ForeignKey(Office, on_delete=models.SET_NULL, null=True, blank=True)
     title = models.CharField(max_length=200)
     document_type = models.CharField(max_length=30, choices=DOCUMENT_TYPE_CHOICES)
     file = models.FileField(upload_to='documents/')
@@ -350,10 +467,18 @@ class Document(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['office', 'created_at']),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.get_full_name()}"
 
+    def save(self, *args, **kwargs):
+        if self.office_id is None and self.user_id:
+            self.office_id = self.user.office_id
+        super().save(*args, **kwargs)
+
 
 class Notification(models.Model):
     """Notification model for system notifications"""
@@ -364,7 +489,7 @@ class Notification(models.Model):
         ('document', 'Document'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     message = models.TextField()
@@ -398,7 +523,7 @@ class SystemSettings(models.Model):
 
 class AttendanceLog(models.Model):
     """Log model for tracking attendance changes"""
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     attendance = models.ForeignKey(Attendance, on_delete=models.CASCADE)
     action = models.CharField(max_length=50)  # 'created', 'updated', 'deleted'
     old_values = models.JSONField(null=True, blank=True)
@@ -415,7 +540,7 @@ class AttendanceLog(models.Model):
 
 class ESSLAttendanceLog(models.Model):
     """Raw attendance log from ESSL devices"""
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     device = models.ForeignKey(Device, on_delete=models.CASCADE)
     biometric_id = models.CharField(max_length=50)
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True)
@@ -433,6 +558,9 @@ class ESSLAttendanceLog(models.Model):
             models.Index(fields=['biometric_id', 'punch_time']),
             models.Index(fields=['device', 'punch_time']),
         ]
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'biometric_id', 'punch_time'], name='unique_device_punch'),
+        ]
 
     def __str__(self):
         return f"{self.biometric_id} - {self.punch_time} ({self.punch_type})"
@@ -456,3 +584,116 @@ class WorkingHoursSettings(models.Model):
 
     def __str__(self):
         return f"{self.office.name} - {self.standard_hours} hours"
+
+
+class ReportJob(models.Model):
+    """Background report run; identical parameters share one stored result"""
+    REPORT_TYPE_CHOICES = [
+        ('attendance', 'Attendance Report'),
+        ('leave', 'Leave Report'),
+        ('office', 'Office Report'),
+        ('user', 'User Report'),
+        ('monthly_attendance', 'Monthly Attendance Report'),
+    ]
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    # Data each report type reads; a change to any of them makes its results stale
+    DATA_SOURCES = {
+        'attendance': {'attendance', 'user', 'office'},
+        'leave': {'leave', 'user', 'office'},
+        'office': {'user', 'office'},
+        'user': {'user', 'office'},
+        'monthly_attendance': {'attendance', 'user', 'office'},
+    }
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    report_type = models.CharField(max_length=30, choices=REPORT_TYPE_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    params_hash = models.CharField(max_length=64, help_text="SHA-256 of the report type and normalized parameters")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    is_stale = models.BooleanField(default=False, help_text="Underlying data changed after the job was submitted")
+    result_file = models.FileField(upload_to='reports/', null=True, blank=True)
+    result_size = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['params_hash', 'is_stale']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} - {self.status}"
+
+    def is_affected_by(self, office_id=None, user_id=None, start_date=None, end_date=None):
+        """Whether a change to an office's or user's rows over a date range can alter the result
+
+        Arguments left as None match anything, so an unscoped change affects every job.
+        """
+        params = self.params or {}
+        if office_id and params.get('office') and params['office'] != str(office_id):
+            return False
+        if user_id and params.get('user') and params['user'] != str(user_id):
+            return False
+        if start_date is None:
+            return True
+
+        try:
+            if self.report_type == 'monthly_attendance':
+                # Without year/month the report covers the month it was run in
+                submitted = timezone.localtime(self.created_at) if self.created_at else timezone.localtime()
+                year, month = int(params.get('year') or submitted.year), int(params.get('month') or submitted.month)
+                first = date(year, month, 1)
+                last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+            else:
+                first = date.fromisoformat(params['start_date']) if params.get('start_date') else None
+                last = date.fromisoformat(params['end_date']) if params.get('end_date') else None
+        except ValueError:
+            return True
+        if first and (end_date or start_date) < first:
+            return False
+        if last and start_date > last:
+            return False
+        return True
+
+
+class PollerLease(models.Model):
+    """Cluster-wide lease; only the process holding it runs the named background service"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=50, unique=True)
+    holder = models.CharField(max_length=200, blank=True, help_text="host:pid:token of the holding process")
+    hostname = models.CharField(max_length=100, blank=True)
+    pid = models.PositiveIntegerField(null=True, blank=True)
+    term = models.PositiveIntegerField(default=0, help_text="Incremented on every change of holder")
+    acquired_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} - {self.holder or 'unheld'}"
+
+
+class PollerInstance(models.Model):
+    """A live poller process in sharded polling mode, kept alive by heartbeats"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    holder = models.CharField(max_length=200, unique=True, help_text="host:pid:token of the poller process")
+    hostname = models.CharField(max_length=100, blank=True)
+    pid = models.PositiveIntegerField(null=True, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    heartbeat_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['started_at']
+
+    def __str__(self):
+        return self.holder
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Monthly User Summary
+Maintains MonthlyUserSummary, the per-user monthly attendance totals behind the
+monthly attendance report. Changed (user, month) keys are recomputed with one
+GROUP BY query and upserted; the report itself is a single LEFT JOIN from the
+employee list, and verify() compares the table against the raw Attendance rows.
+"""
+
+import calendar
+import logging
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Q, Sum, FilteredRelation, F
+from django.db.models.functions import TruncMonth
+
+from .db_manager import bulk_upsert
+from .models import Attendance, CustomUser, MonthlyUserSummary
+
+logger = logging.getLogger(__name__)
+
+# Standard hours per calendar day used for the monthly hours deficit
+STANDARD_DAILY_HOURS = Decimal('9.0')
+
+SUMMARY_COUNTS = {
+    'present_days': 'present',
+    'absent_days': 'absent',
+    'late_days': 'late',
+    'half_days': 'half_day',
+    'leave_days': 'leave',
+}
+SUMMARY_FIELDS = tuple(SUMMARY_COUNTS) + ('total_records', 'total_hours', 'hours_deficit')
+
+
+def month_start(day):
+    """First day of the month containing a date"""
+    return day.replace(day=1)
+
+
+def month_bounds(year, month):
+    """First and last day of a month"""
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def standard_hours(month):
+    """Expected hours for a whole month"""
+    return STANDARD_DAILY_HOURS * calendar.monthrange(month.year, month.month)[1]
+
+
+class MonthlySummaryService:
+    """Refresh, read and verify the MonthlyUserSummary materialization"""
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _aggregate(queryset):
+        """Per (user, month) totals straight from the Attendance fact table"""
+        rows = queryset.annotate(month=TruncMonth('date')).values('user_id', 'month').annotate(
+            total_records=Count('id'),
+            total_hours=Sum('total_hours'),
+            **{field: Count('id', filter=Q(status=status)) for field, status in SUMMARY_COUNTS.items()}
+        ).order_by()
+
+        computed = {}
+        for row in rows:
+            total_hours = Decimal(row['total_hours'] or 0).quantize(Decimal('0.01'))
+            computed[(row['user_id'], row['month'])] = {
+                **{field: row[field] for field in SUMMARY_COUNTS},
+                'total_records': row['total_records'],
+                'total_hours': total_hours,
+                'hours_deficit': max(Decimal('0'), standard_hours(row['month']) - total_hours),
+            }
+        return computed
+
+    def _upsert(self, computed):
+        summaries = [
+            MonthlyUserSummary(user_id=user_id, month=month, **values)
+            for (user_id, month), values in computed.items()
+        ]
+        bulk_upsert(MonthlyUserSummary, summaries, ['user', 'month'], list(SUMMARY_FIELDS) + ['updated_at'],
+                    batch_size=self.batch_size)
+
+    def refresh(self, keys):
+        """Recompute the summaries of the given (user_id, month) keys"""
+        keys = {(user_id, month_start(day)) for user_id, day in keys if user_id and day}
+        if not keys:
+            return 0
+
+        users_by_month = defaultdict(set)
+        for user_id, month in keys:
+            users_by_month[month].add(user_id)
+
+        month_filter = Q()
+        for month, user_ids in users_by_month.items():
+            month_filter |= Q(user_id__in=user_ids, date__range=month_bounds(month.year, month.month))
+
+        computed = {
+            key: values
+            for key, values in self._aggregate(Attendance.objects.filter(month_filter)).items()
+            if key in keys
+        }
+
+        with transaction.atomic():
+            self._upsert(computed)
+            # Keys whose last attendance row went away
+            empty = keys - set(computed)
+            if empty:
+                empty_filter = Q()
+                for user_id, month in empty:
+                    empty_filter |= Q(user_id=user_id, month=month)
+                MonthlyUserSummary.objects.filter(empty_filter).delete()
+
+        return len(keys)
+
+    def _month_querysets(self, year, month, office_id=None):
+        start_date, end_date = month_bounds(year, month)
+        attendance = Attendance.objects.filter(date__range=(start_date, end_date))
+        summaries = MonthlyUserSummary.objects.filter(month=start_date)
+        if office_id:
+            # Summaries are per user, so both sides select the office's users (rows a user
+            # recorded in another office still count towards their month)
+            attendance = attendance.filter(user__office_id=office_id)
+            summaries = summaries.filter(user__office_id=office_id)
+        return attendance, summaries
+
+    def rebuild(self, year, month, office_id=None):
+        """Recompute every summary of one month (optionally one office)"""
+        attendance, summaries = self._month_querysets(year, month, office_id)
+        computed = self._aggregate(attendance)
+        with transaction.atomic():
+            summaries.delete()
+            self._upsert(computed)
+
+        logger.info(f"📊 Rebuilt {len(computed)} monthly user summaries for {year}-{month:02d}")
+        return len(computed)
+
+    def verify(self, year, month, office_id=None):
+        """Compare stored summaries with the raw Attendance rows of one month
+
+        Returns a list of (user_id, problem, stored, expected) tuples, where the
+        problem is 'missing', 'orphaned' or 'mismatch'.
+        """
+        attendance, summaries = self._month_querysets(year, month, office_id)
+        expected = self._aggregate(attendance)
+        stored = {
+            (row['user_id'], row['month']): {field: row[field] for field in SUMMARY_FIELDS}
+            for row in summaries.values('user_id', 'month', *SUMMARY_FIELDS)
+        }
+
+        problems = []
+        for key in sorted(set(expected) | set(stored), key=lambda key: str(key[0])):
+            stored_values, expected_values = stored.get(key), expected.get(key)
+            if stored_values is None:
+                problems.append((key[0], 'missing', None, expected_values))
+            elif expected_values is None:
+                problems.append((key[0], 'orphaned', stored_values, None))
+            elif any(stored_values[field] != expected_values[field] for field in SUMMARY_FIELDS):
+                problems.append((key[0], 'mismatch', stored_values, expected_values))
+        return problems
+
+    @staticmethod
+    def report_rows(year, month, office_id=None):
+        """Active employees joined with their summary for one month, in one query"""
+        users = CustomUser.objects.filter(role='employee', is_active=True)
+        if office_id:
+            users = users.filter(office_id=office_id)
+
+        return users.annotate(
+            summary=FilteredRelation('monthly_summaries', condition=Q(monthly_summaries__month=date(year, month, 1)))
+        ).values(
+            'id', 'first_name', 'last_name', 'username', 'employee_id',
+            office_name=F('office__name'),
+            **{field: F(f'summary__{field}') for field in SUMMARY_FIELDS}
+        )
+
+
+# Global monthly summary service instance
+monthly_summary_service = MonthlySummaryService()
@@ -0,0 +1,108 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on a unique ordering key
+
+    Each page continues strictly after the key of the previous page's last row
+    (WHERE key < cursor ORDER BY key LIMIT n), so deep pages cost the same as the
+    first one. Forward-only: the response carries a `next` link, no counts.
+    """
+    ordering = ('-id',)  # all fields in the same direction; the last one must be unique
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.key_fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request)
+        try:
+            if cursor is not None:
+                queryset = queryset.filter(self._after(cursor))
+            rows = list(queryset[:self.page_size + 1])
+        except (ValueError, ValidationError):
+            # Well-formed cursor whose values do not fit the key fields
+            raise NotFound(self.invalid_cursor_message)
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_key = [self._key_value(rows[-1], field) for field in self.key_fields] if self.has_next else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def _after(self, cursor):
+        """Rows strictly past the cursor key in ordering direction"""
+        lookup = 'lt' if self.descending else 'gt'
+        condition = Q()
+        for i, field in enumerate(self.key_fields):
+            condition |= Q(**dict(zip(self.key_fields[:i], cursor[:i])), **{f"{field}__{lookup}": cursor[i]})
+        return condition
+
+    @staticmethod
+    def _key_value(row, field):
+        value = getattr(row, field)
+        return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(cursor, list) or len(cursor) != len(self.key_fields):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, key):
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_key))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'page_size': self.page_size,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'page_size': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+class AttendanceKeysetPagination(KeysetPagination):
+    """Attendance rows newest first, keyed on (date, id)"""
+    ordering = ('-date', '-id')
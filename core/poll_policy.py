@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Adaptive Poll Policy
+Chooses how long the poller waits before polling a device again. Punches
+cluster in a few short windows (arrival and departure), so a fixed interval
+either polls idle devices all night or reports punches late at peak. The
+policy polls at the fast interval inside the configured active windows and
+right after a poll that brought new punches. Otherwise it waits about as long
+as the device's recent punch rate (an exponentially weighted moving average)
+says the next punch will take to arrive. Outside working hours and on
+non-working days it can back off further. It never waits longer than the
+freshness SLO, and it never sleeps past the start of the next active window.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, time as dt_time, timedelta
+from django.conf import settings
+from django.utils import timezone
+
+
+def _parse_time(value):
+    return value if isinstance(value, dt_time) else dt_time.fromisoformat(value)
+
+
+class AdaptivePollPolicy:
+    """Per-device poll intervals from punch rate and time of day"""
+
+    def __init__(self, enabled=False, fast_interval=30, freshness_slo=900,
+                 active_windows=(('08:30', '09:15'), ('17:30', '18:15')), active_days=(0, 1, 2, 3, 4),
+                 working_hours=('08:00', '19:00'), rate_half_life=900, target_punches=1.0):
+        self.enabled = enabled
+        self.fast_interval = fast_interval  # seconds between polls while punches are arriving
+        self.freshness_slo = max(freshness_slo, fast_interval)  # longest a punch may wait to be fetched
+        self.active_windows = [(_parse_time(start), _parse_time(end)) for start, end in active_windows]
+        self.active_days = set(active_days)  # weekday numbers, Monday is 0
+        self.working_hours = tuple(_parse_time(value) for value in working_hours)
+        self.rate_half_life = rate_half_life  # seconds for an old observation to lose half its weight
+        self.target_punches = target_punches  # punches expected between two idle polls
+        self._rates = {}  # device id -> (punches per second, monotonic time of the last observation)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """Build the policy from the ATTENDANCE_ADAPTIVE_POLLING setting"""
+        config = getattr(settings, 'ATTENDANCE_ADAPTIVE_POLLING', {})
+        defaults = cls()
+        return cls(
+            enabled=config.get('ENABLED', False),
+            fast_interval=config.get('FAST_INTERVAL', defaults.fast_interval),
+            freshness_slo=config.get('FRESHNESS_SLO', defaults.freshness_slo),
+            active_windows=config.get('ACTIVE_WINDOWS', defaults.active_windows),
+            active_days=config.get('ACTIVE_DAYS', defaults.active_days),
+            working_hours=config.get('WORKING_HOURS', defaults.working_hours),
+            rate_half_life=config.get('RATE_HALF_LIFE', defaults.rate_half_life),
+            target_punches=config.get('TARGET_PUNCHES', defaults.target_punches),
+        )
+
+    def observe(self, device_id, new_records, now=None):
+        """Fold a poll's new punch count into the device's rate; returns punches per second"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            previous = self._rates.get(device_id)
+            if previous is None:
+                # The first poll after a start fetches a backlog of unknown age, which is no rate
+                rate = 0.0
+            else:
+                rate, last = previous
+                elapsed = now - last
+                if elapsed > 0:
+                    # Irregular samples: weight the new one by how much time it covers
+                    alpha = 1 - math.pow(2, -elapsed / self.rate_half_life)
+                    rate += alpha * (new_records / elapsed - rate)
+            self._rates[device_id] = (rate, now)
+        return rate
+
+    def forget(self, device_id):
+        with self._lock:
+            self._rates.pop(device_id, None)
+
+    def in_active_window(self, when):
+        local = timezone.localtime(when)
+        if local.weekday() not in self.active_days:
+            return False
+        return any(start <= local.time() < end for start, end in self.active_windows)
+
+    def in_working_hours(self, when):
+        local = timezone.localtime(when)
+        start, end = self.working_hours
+        return local.weekday() in self.active_days and start <= local.time() < end
+
+    def seconds_until_next_window(self, when):
+        """Seconds until the next active window opens, None when no window is configured"""
+        local = timezone.localtime(when)
+        for days_ahead in range(8):
+            day = local.date() + timedelta(days=days_ahead)
+            if day.weekday() not in self.active_days:
+                continue
+            for start, _ in sorted(self.active_windows):
+                opens = timezone.make_aware(datetime.combine(day, start), local.tzinfo)
+                if opens > local:
+                    return (opens - local).total_seconds()
+        return None
+
+    def next_interval(self, device_id, new_records, base_interval, when=None, now=None):
+        """Seconds until the device's next poll after a successful one
+
+        base_interval is the device's own interval (Device.sync_interval),
+        used as is when the policy is disabled and as the ceiling during
+        working hours otherwise.
+        """
+        if not self.enabled:
+            return base_interval
+        when = timezone.now() if when is None else when
+        rate = self.observe(device_id, new_records, now)
+
+        if new_records or self.in_active_window(when):
+            return self.fast_interval
+
+        ceiling = self.freshness_slo
+        if self.in_working_hours(when):
+            ceiling = min(base_interval, ceiling)
+        interval = self.target_punches / rate if rate > 0 else ceiling
+        interval = min(max(interval, self.fast_interval), ceiling)
+
+        # Be polling when the next rush starts rather than up to a full interval into it
+        until_window = self.seconds_until_next_window(when)
+        if until_window is not None:
+            interval = min(interval, max(until_window, self.fast_interval))
+        return interval
+
+    def get_status(self):
+        """Policy settings and the punch rate of every observed device"""
+        with self._lock:
+            rates = {str(device_id): round(rate * 60, 3) for device_id, (rate, _) in self._rates.items()}
+        return {
+            'enabled': self.enabled,
+            'fast_interval': self.fast_interval,
+            'freshness_slo': self.freshness_slo,
+            'active_windows': [f"{start:%H:%M}-{end:%H:%M}" for start, end in self.active_windows],
+            'active_days': sorted(self.active_days),
+            'working_hours': '-'.join(f"{value:%H:%M}" for value in self.working_hours),
+            'punches_per_minute': rates,
+        }
+
+
+# Global adaptive poll policy instance
+adaptive_poll_policy = AdaptivePollPolicy.from_settings()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Device Poll Scheduler
+Min-heap of device due times for the attendance poller. A device is due
+Device.sync_interval minutes after its last poll finished (sooner after a
+failed poll), so the poller sleeps exactly until the next due device instead
+of waking on a fixed interval. The device set is reconciled with the database
+while running: new devices are added, removed or deactivated ones dropped and
+edited ones rescheduled. Heap entries are versioned, so rescheduling pushes a
+new entry and the superseded one is skipped when it reaches the top. With a
+poll policy the interval after a successful poll adapts to the device's
+punch rate and the time of day instead of being fixed.
+"""
+
+import heapq
+import threading
+import time
+from django.utils import timezone
+
+
+class DevicePollScheduler:
+    """Next-due times of the devices a poller polls"""
+
+    def __init__(self, retry_interval=60, policy=None):
+        self.retry_interval = retry_interval  # seconds before retrying a failed device (capped at its interval)
+        self.policy = policy  # AdaptivePollPolicy, or None for a fixed sync_interval
+        self._heap = []  # (due monotonic time, version, device id)
+        self._devices = {}  # device id -> Device
+        self._versions = {}  # device id -> version of its live heap entry
+        self._last_completed = {}  # device id -> monotonic time its last poll finished
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def device_interval(device):
+        """Seconds between polls of a device (sync_interval is in minutes, at least one)"""
+        return max(device.sync_interval or 0, 1) * 60
+
+    def _push(self, device_id, due):
+        version = self._versions.get(device_id, 0) + 1
+        self._versions[device_id] = version
+        heapq.heappush(self._heap, (due, version, device_id))
+
+    def _is_live(self, device_id, version):
+        return device_id in self._devices and self._versions.get(device_id) == version
+
+    def _initial_due(self, device, now):
+        """Resume from the last recorded sync so a restart does not poll every device at once"""
+        if not device.last_sync:
+            return now
+        elapsed = (timezone.now() - device.last_sync).total_seconds()
+        return now + max(self.device_interval(device) - elapsed, 0)
+
+    def sync(self, devices):
+        """Reconcile with the current device list; returns (added, removed, rescheduled)"""
+        now = time.monotonic()
+        current = {device.id: device for device in devices}
+        added = removed = rescheduled = 0
+        with self._lock:
+            for device_id in list(self._devices):
+                if device_id not in current:
+                    # Bumping the version orphans its heap entry, even if the device comes back
+                    del self._devices[device_id]
+                    self._versions[device_id] += 1
+                    self._last_completed.pop(device_id, None)
+                    if self.policy:
+                        self.policy.forget(device_id)
+                    removed += 1
+
+            for device_id, device in current.items():
+                known = self._devices.get(device_id)
+                # Keep the fresh row so edited connection details are used from the next poll
+                self._devices[device_id] = device
+                if known is None:
+                    # A device re-added while its last poll is still running is scheduled by complete()
+                    if device_id not in self._in_flight:
+                        self._push(device_id, self._initial_due(device, now))
+                    added += 1
+                elif known.sync_interval != device.sync_interval and device_id not in self._in_flight:
+                    last = self._last_completed.get(device_id)
+                    due = last + self.device_interval(device) if last is not None else now
+                    self._push(device_id, max(due, now))
+                    rescheduled += 1
+        return added, removed, rescheduled
+
+    def pop_due(self):
+        """Devices that are due now; they are not handed out again until complete()"""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, version, device_id = heapq.heappop(self._heap)
+                if not self._is_live(device_id, version):
+                    continue
+                self._in_flight.add(device_id)
+                due.append(self._devices[device_id])
+        return due
+
+    def complete(self, device_id, success=True, new_records=None, retry_after=None):
+        """Schedule a device's next poll after it finished (or was handed to another poller)
+
+        new_records is the number of new punches the poll fetched; None when
+        the device was not polled, which leaves its punch rate alone.
+        retry_after overrides the interval, e.g. for a device whose circuit
+        breaker is open.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._in_flight.discard(device_id)
+            device = self._devices.get(device_id)
+            if device is None:
+                return
+            interval = self.device_interval(device)
+            if retry_after is not None:
+                interval = retry_after
+            elif not success:
+                interval = min(interval, self.retry_interval)
+            elif self.policy and new_records is not None:
+                interval = self.policy.next_interval(device_id, new_records, interval, now=now)
+            self._last_completed[device_id] = now
+            self._push(device_id, now + interval)
+
+    def seconds_until_next(self):
+        """Seconds until the next device is due, None when nothing is scheduled"""
+        with self._lock:
+            while self._heap and not self._is_live(self._heap[0][2], self._heap[0][1]):
+                heapq.heappop(self._heap)
+            if not self._heap:
+                return None
+            return max(self._heap[0][0] - time.monotonic(), 0.0)
+
+    def __len__(self):
+        return len(self._devices)
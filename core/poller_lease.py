@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Poller Lease
+Leader election for the attendance poller. Every process that loads the app
+runs a small elector thread, and only the process holding the PollerLease row
+runs the poller. Taking and renewing the lease are single conditional UPDATEs,
+so two processes can never both succeed. The leader renews with a heartbeat
+and stops polling as soon as a renewal fails or its lease runs out; when a
+leader dies its lease expires and the next elector to try takes over.
+Expiry is compared across hosts, so their clocks must be NTP-synced well
+within the TTL.
+"""
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import PollerLease
+
+logger = logging.getLogger(__name__)
+
+
+class PollerLeaseManager:
+    """Acquire, renew and release the lease, and run the service while holding it"""
+
+    def __init__(self, name='attendance-poller', ttl=30, heartbeat_interval=10, enabled=True):
+        self.name = name
+        self.ttl = ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.enabled = enabled
+        self.running = False
+        self._pid = None
+        self._token = None
+        self._leader = False
+        self._valid_until = 0.0  # monotonic deadline of the lease as last renewed
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._on_acquire = None
+        self._on_release = None
+        self.stats = {'acquired': 0, 'renewals': 0, 'lost': 0, 'errors': 0}
+
+    @classmethod
+    def from_settings(cls):
+        """Build the lease manager from the ATTENDANCE_POLLER_LEASE setting"""
+        config = getattr(settings, 'ATTENDANCE_POLLER_LEASE', {})
+        return cls(
+            name=config.get('NAME', 'attendance-poller'),
+            ttl=config.get('TTL', 30),
+            heartbeat_interval=config.get('HEARTBEAT_INTERVAL', 10),
+            enabled=config.get('ENABLED', True),
+        )
+
+    @property
+    def holder(self):
+        """host:pid:token identifying this process (a forked child gets its own)"""
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._token = uuid.uuid4().hex[:8]
+        return f"{socket.gethostname()}:{pid}:{self._token}"
+
+    @property
+    def is_leader(self):
+        """Holding the lease and still inside the last renewed TTL"""
+        if not self.enabled:
+            return self.running
+        return self._leader and time.monotonic() < self._valid_until
+
+    def try_acquire(self):
+        """Take the lease if it is free or expired; True when this process now holds it"""
+        PollerLease.objects.get_or_create(name=self.name)
+        started = time.monotonic()
+        now = timezone.now()
+        taken = PollerLease.objects.filter(name=self.name).filter(
+            Q(holder='') | Q(expires_at__isnull=True) | Q(expires_at__lt=now)
+        ).update(
+            holder=self.holder,
+            hostname=socket.gethostname(),
+            pid=os.getpid(),
+            term=F('term') + 1,
+            acquired_at=now,
+            heartbeat_at=now,
+            expires_at=now + timedelta(seconds=self.ttl),
+        )
+        if taken:
+            self._valid_until = started + self.ttl
+        return bool(taken)
+
+    def renew(self):
+        """Extend the lease; False when another process has taken it over"""
+        started = time.monotonic()
+        now = timezone.now()
+        renewed = PollerLease.objects.filter(name=self.name, holder=self.holder).update(
+            heartbeat_at=now, expires_at=now + timedelta(seconds=self.ttl)
+        )
+        if renewed:
+            self._valid_until = started + self.ttl
+        return bool(renewed)
+
+    def release(self):
+        """Give the lease up so another process can take over right away"""
+        PollerLease.objects.filter(name=self.name, holder=self.holder).update(
+            holder='', expires_at=timezone.now()
+        )
+
+    def start(self, on_acquire, on_release):
+        """Run on_acquire whenever this process becomes leader and on_release when it stops being one"""
+        if self.running:
+            return
+        self.running = True
+        self._on_acquire = on_acquire
+        self._on_release = on_release
+
+        if not self.enabled:
+            logger.info(f"🔓 Lease {self.name} disabled, starting the service in this process")
+            on_acquire()
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f'{self.name}-lease')
+        self._thread.start()
+        atexit.register(self.stop)
+        logger.info(f"🗳️ Contending for lease {self.name} as {self.holder} "
+                    f"(ttl {self.ttl}s, heartbeat {self.heartbeat_interval}s)")
+
+    def stop(self):
+        """Stop contending, stopping the service and releasing the lease if held"""
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+        if not self.enabled or self._leader:
+            self._on_release()
+        if self._leader:
+            self._leader = False
+            try:
+                self.release()
+                logger.info(f"👋 Released lease {self.name}")
+            except Exception as e:
+                logger.warning(f"Could not release lease {self.name}: {str(e)}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._tick()
+            except Exception as e:
+                logger.error(f"Error maintaining lease {self.name}: {str(e)}")
+                self.stats['errors'] += 1
+                # Cannot reach the database to renew: stop polling once the lease has run out
+                if self._leader and time.monotonic() >= self._valid_until:
+                    self._step_down('lease expired without renewal')
+            finally:
+                close_old_connections()
+            self._stop_event.wait(self.heartbeat_interval)
+
+    def _tick(self):
+        if self._leader:
+            if self.renew():
+                self.stats['renewals'] += 1
+                return
+            self._step_down('lease taken over by another process')
+        elif self.try_acquire():
+            self._leader = True
+            self.stats['acquired'] += 1
+            logger.info(f"👑 Acquired lease {self.name} as {self.holder}, starting the service")
+            try:
+                self._on_acquire()
+            except Exception as e:
+                # Holding the lease without polling would keep every other instance out
+                self.stats['errors'] += 1
+                self._step_down(f'service failed to start ({str(e)})')
+                self.release()
+
+    def _step_down(self, reason):
+        self._leader = False
+        self._valid_until = 0.0
+        self.stats['lost'] += 1
+        logger.warning(f"⚠️ Lost lease {self.name}: {reason}, stopping the service")
+        self._on_release()
+
+    def get_status(self):
+        """The lease row and this process's view of it"""
+        lease = PollerLease.objects.filter(name=self.name).first()
+        now = timezone.now()
+        held = bool(lease and lease.holder and lease.expires_at and lease.expires_at >= now)
+        return {
+            'name': self.name,
+            'enabled': self.enabled,
+            'held': held,
+            'holder': lease.holder if held else None,
+            'hostname': lease.hostname if held else None,
+            'pid': lease.pid if held else None,
+            'term': lease.term if lease else 0,
+            'acquired_at': lease.acquired_at if held else None,
+            'heartbeat_at': lease.heartbeat_at if lease else None,
+            'expires_at': lease.expires_at if held else None,
+            'ttl': self.ttl,
+            'this_process': {
+                'holder': self.holder,
+                'contending': self.running,
+                'is_leader': self.is_leader,
+                **self.stats,
+            },
+        }
+
+
+# Global poller lease instance
+poller_lease = PollerLeaseManager.from_settings()
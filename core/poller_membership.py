@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Poller Membership
+Sharded polling for more devices than one process can poll in an interval.
+Each poller process registers a PollerInstance row and heartbeats it; rows
+that miss heartbeats for longer than the TTL are pruned. Every instance
+builds the same consistent-hash ring from the live rows and polls only the
+devices the ring assigns to it, so a device has a single owner. When an
+instance joins or leaves, only the devices on its arcs of the ring move.
+Assignments converge within one heartbeat interval of a membership change.
+"""
+
+import atexit
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import PollerInstance
+
+logger = logging.getLogger(__name__)
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes"""
+
+    def __init__(self, members=(), virtual_nodes=100):
+        self.members = sorted(set(members))
+        points = sorted(
+            (self._hash(f"{member}#{replica}"), member)
+            for member in self.members
+            for replica in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+    def owner(self, key):
+        """Member owning a key (the first virtual node clockwise), None on an empty ring"""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, self._hash(str(key))) % len(self._hashes)
+        return self._owners[index]
+
+
+class PollerMembership:
+    """Register this process as a poller instance and track the shard ring"""
+
+    def __init__(self, enabled=False, ttl=30, heartbeat_interval=10, virtual_nodes=100):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.virtual_nodes = virtual_nodes
+        self.running = False
+        self.ring = HashRing(virtual_nodes=virtual_nodes)
+        self._pid = None
+        self._token = None
+        self._valid_until = 0.0  # monotonic deadline of the membership as last heartbeated
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._on_leave = None
+        self.stats = {'heartbeats': 0, 'rebalances': 0, 'pruned': 0, 'errors': 0}
+
+    @classmethod
+    def from_settings(cls):
+        """Build the membership from the ATTENDANCE_POLLER_SHARDING setting"""
+        config = getattr(settings, 'ATTENDANCE_POLLER_SHARDING', {})
+        return cls(
+            enabled=config.get('ENABLED', False),
+            ttl=config.get('TTL', 30),
+            heartbeat_interval=config.get('HEARTBEAT_INTERVAL', 10),
+            virtual_nodes=config.get('VIRTUAL_NODES', 100),
+        )
+
+    @property
+    def holder(self):
+        """host:pid:token identifying this process (a forked child gets its own)"""
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._token = uuid.uuid4().hex[:8]
+        return f"{socket.gethostname()}:{pid}:{self._token}"
+
+    def owns(self, device_id):
+        """Whether this instance should poll the device
+
+        False once the last successful heartbeat is older than the TTL: the
+        other instances have pruned this one and taken over its devices.
+        """
+        if time.monotonic() >= self._valid_until:
+            return False
+        return self.ring.owner(device_id) == self.holder
+
+    def heartbeat(self):
+        """Refresh this instance's row (re-registering if it was pruned) and rebuild the ring"""
+        started = time.monotonic()
+        now = timezone.now()
+        PollerInstance.objects.update_or_create(
+            holder=self.holder,
+            defaults={'hostname': socket.gethostname(), 'pid': os.getpid(), 'heartbeat_at': now},
+        )
+        pruned, _ = PollerInstance.objects.filter(heartbeat_at__lt=now - timedelta(seconds=self.ttl)).delete()
+        if pruned:
+            self.stats['pruned'] += pruned
+            logger.warning(f"🪦 Pruned {pruned} poller instance(s) that stopped heartbeating")
+
+        members = list(PollerInstance.objects.values_list('holder', flat=True))
+        if sorted(members) != self.ring.members:
+            self.ring = HashRing(members, self.virtual_nodes)
+            self.stats['rebalances'] += 1
+            logger.info(f"🔀 Poller ring rebalanced across {len(members)} instance(s)")
+        self._valid_until = started + self.ttl
+        self.stats['heartbeats'] += 1
+
+    def leave(self):
+        """Deregister so the remaining instances take over this one's devices right away"""
+        PollerInstance.objects.filter(holder=self.holder).delete()
+        self._valid_until = 0.0
+
+    def start(self, on_join, on_leave):
+        """Join the ring and run on_join; on_leave runs when the instance stops"""
+        if self.running:
+            return
+        self.running = True
+        self._on_leave = on_leave
+        self.heartbeat()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='poller-membership')
+        self._thread.start()
+        atexit.register(self.stop)
+        logger.info(f"🧩 Joined the poller ring as {self.holder} ({len(self.ring.members)} instance(s))")
+        on_join()
+
+    def stop(self):
+        """Stop the service and leave the ring"""
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._on_leave()
+        try:
+            self.leave()
+            logger.info("👋 Left the poller ring")
+        except Exception as e:
+            logger.warning(f"Could not leave the poller ring: {str(e)}")
+
+    def _run(self):
+        while not self._stop_event.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"Error heartbeating poller instance: {str(e)}")
+                self.stats['errors'] += 1
+            finally:
+                close_old_connections()
+
+    def get_status(self, device_ids=()):
+        """Live instances, their device shares and this process's view of the ring"""
+        now = timezone.now()
+        instances = list(PollerInstance.objects.all())
+        live = [instance for instance in instances if instance.heartbeat_at >= now - timedelta(seconds=self.ttl)]
+
+        # Shares as every live instance computes them, whether or not this process polls
+        ring = HashRing([instance.holder for instance in live], self.virtual_nodes)
+        shares = {instance.holder: 0 for instance in live}
+        for device_id in device_ids:
+            owner = ring.owner(device_id)
+            if owner is not None:
+                shares[owner] += 1
+
+        return {
+            'enabled': self.enabled,
+            'ttl': self.ttl,
+            'instances': [
+                {
+                    'holder': instance.holder,
+                    'hostname': instance.hostname,
+                    'pid': instance.pid,
+                    'started_at': instance.started_at,
+                    'heartbeat_at': instance.heartbeat_at,
+                    'is_live': instance.holder in shares,
+                    'devices': shares.get(instance.holder, 0),
+                }
+                for instance in instances
+            ],
+            'this_process': {
+                'holder': self.holder,
+                'member': self.running,
+                'ring_size': len(self.ring.members),
+                **self.stats,
+            },
+        }
+
+
+# Global poller membership instance
+poller_membership = PollerMembership.from_settings()
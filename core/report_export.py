@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Report Export
+Streams report rows as CSV or NDJSON without building the report in memory.
+Rows are read with values_list projections in keyset-paginated chunks (each
+chunk a short LIMIT query continuing after the last key seen), so memory stays
+flat on every database backend and the first rows go out after one small query.
+"""
+
+import csv
+import json
+import logging
+from datetime import date, datetime
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .models import CustomUser, Office
+from .report_service import ReportService
+
+logger = logging.getLogger(__name__)
+
+# (ordering key, exported columns) per report type; the key is unique (ends with 'id') and exported
+EXPORT_SPECS = {
+    'attendance': (('date', 'id'), (
+        'id', 'date', 'check_in_time', 'check_out_time', 'status', 'total_hours', 'notes',
+        'user_id', 'user__first_name', 'user__last_name', 'user__employee_id', 'user__office__name',
+    )),
+    'leave': (('start_date', 'id'), (
+        'id', 'leave_type', 'start_date', 'end_date', 'total_days', 'status', 'reason',
+        'created_at', 'approved_at', 'approved_by__first_name', 'approved_by__last_name',
+        'user_id', 'user__first_name', 'user__last_name', 'user__employee_id', 'user__office__name',
+    )),
+    'office': (('id',), (
+        'id', 'name', 'address', 'city', 'state', 'country', 'postal_code', 'phone', 'email',
+        'manager__first_name', 'manager__last_name', 'is_active', 'created_at',
+    )),
+    'user': (('id',), (
+        'id', 'username', 'first_name', 'last_name', 'email', 'role', 'employee_id', 'biometric_id',
+        'department', 'designation', 'office__name', 'is_active', 'date_joined', 'last_login',
+    )),
+}
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer streaming"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class ReportExporter:
+    """Chunked CSV / NDJSON export of report rows"""
+
+    def __init__(self, chunk_size=2000):
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_settings(cls):
+        """Build the exporter from the ATTENDANCE_REPORT_EXPORT setting"""
+        config = getattr(settings, 'ATTENDANCE_REPORT_EXPORT', {})
+        return cls(chunk_size=config.get('CHUNK_SIZE', 2000))
+
+    @staticmethod
+    def queryset(report_type, params):
+        """Filtered rows for a report type"""
+        if report_type == 'attendance':
+            return ReportService.attendance_queryset(params)
+        if report_type == 'leave':
+            return ReportService.leave_queryset(params)
+        if report_type == 'office':
+            return Office.objects.all()
+        return CustomUser.objects.all()
+
+    def rows(self, report_type, params):
+        """Yield column tuples in key order, one LIMIT query per chunk"""
+        key_fields, columns = EXPORT_SPECS[report_type]
+        key_positions = [columns.index(field) for field in key_fields]
+        queryset = self.queryset(report_type, params).order_by(*key_fields).values_list(*columns)
+
+        last_key = None
+        while True:
+            chunk_queryset = queryset
+            if last_key is not None:
+                chunk_queryset = queryset.filter(self._after(key_fields, last_key))
+            chunk = list(chunk_queryset[:self.chunk_size])
+            yield from chunk
+            if len(chunk) < self.chunk_size:
+                return
+            last_key = [chunk[-1][position] for position in key_positions]
+
+    @staticmethod
+    def _after(key_fields, key):
+        """Rows strictly after a key in (key_fields) order"""
+        condition = Q()
+        for i, field in enumerate(key_fields):
+            condition |= Q(**dict(zip(key_fields[:i], key[:i])), **{f"{field}__gt": key[i]})
+        return condition
+
+    def stream_csv(self, report_type, params):
+        """CSV lines, header first"""
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_SPECS[report_type][1])
+        for row in self.rows(report_type, params):
+            yield writer.writerow([_csv_value(value) for value in row])
+
+    def stream_ndjson(self, report_type, params):
+        """One JSON object per line"""
+        columns = EXPORT_SPECS[report_type][1]
+        for row in self.rows(report_type, params):
+            yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+    def stream(self, report_type, params, output):
+        """Lines of a report export in the given format"""
+        logger.info(f"📤 Streaming {report_type} export as {output}")
+        if output == 'csv':
+            return self.stream_csv(report_type, params)
+        return self.stream_ndjson(report_type, params)
+
+
+# Global report exporter instance
+report_exporter = ReportExporter.from_settings()
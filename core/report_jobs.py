@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Report Jobs
+Runs ReportService builders in a background thread pool instead of inside the
+request. Jobs are deduplicated by a hash of the report type and normalized
+parameters: a submit returns the existing job until the data the report reads
+changes (ReportJob.is_stale, set by the side effect writer), and results are
+stored as JSON files for download. A new job deletes the finished jobs it
+replaces, and purge_expired() deletes jobs (and their files) older than the
+retention period.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction, close_old_connections
+from django.utils import timezone
+
+from .models import ReportJob
+from .report_service import ReportService
+
+logger = logging.getLogger(__name__)
+
+
+class ReportJobRunner:
+    """Submit, deduplicate and execute report jobs"""
+
+    def __init__(self, max_workers=2, job_timeout=1800, result_retention=7 * 24 * 3600):
+        self.max_workers = max_workers
+        self.job_timeout = job_timeout
+        self.result_retention = result_retention  # seconds a finished job and its file are kept
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """Build the runner from the ATTENDANCE_REPORT_JOBS setting"""
+        config = getattr(settings, 'ATTENDANCE_REPORT_JOBS', {})
+        return cls(
+            max_workers=config.get('WORKERS', 2),
+            job_timeout=config.get('JOB_TIMEOUT', 1800),
+            result_retention=config.get('RESULT_RETENTION', 7 * 24 * 3600),
+        )
+
+    @staticmethod
+    def params_hash(report_type, params):
+        """Stable hash of a report type and its normalized parameters"""
+        payload = json.dumps([report_type, params], sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _is_abandoned(self, job):
+        """Queued or running for longer than the timeout, e.g. its worker process died"""
+        if job.status not in ('queued', 'running'):
+            return False
+        return (job.started_at or job.created_at) < timezone.now() - timedelta(seconds=self.job_timeout)
+
+    def submit(self, report_type, params, requested_by=None):
+        """Return (job, created): an up-to-date job for the same parameters, or a new one"""
+        params = ReportService.normalize_params(report_type, params)
+        params_hash = self.params_hash(report_type, params)
+
+        existing = ReportJob.objects.filter(
+            params_hash=params_hash, is_stale=False, status__in=('queued', 'running', 'completed')
+        ).order_by('-created_at').first()
+        if existing:
+            if not self._is_abandoned(existing):
+                logger.info(f"♻️ Reusing {report_type} report job {existing.id} ({existing.status})")
+                return existing, False
+            ReportJob.objects.filter(id=existing.id).update(
+                status='failed', error_message='Abandoned: did not finish within the job timeout',
+                completed_at=timezone.now()
+            )
+
+        job = ReportJob.objects.create(
+            report_type=report_type,
+            params=params,
+            params_hash=params_hash,
+            requested_by=requested_by
+        )
+        # Stale and failed results for the same parameters are never served again
+        self._delete_jobs(
+            ReportJob.objects.filter(params_hash=params_hash, status__in=('completed', 'failed')).exclude(id=job.id)
+        )
+        transaction.on_commit(lambda: self._get_executor().submit(self.run, job.id))
+        logger.info(f"📝 Queued {report_type} report job {job.id}")
+        return job, True
+
+    def purge_expired(self, now=None):
+        """Delete finished jobs and their result files once past the retention period"""
+        cutoff = (now or timezone.now()) - timedelta(seconds=self.result_retention)
+        deleted = self._delete_jobs(
+            ReportJob.objects.filter(status__in=('completed', 'failed'), completed_at__lt=cutoff)
+        )
+        if deleted:
+            logger.info(f"🧹 Purged {deleted} report job(s) finished before {timezone.localtime(cutoff):%Y-%m-%d %H:%M}")
+        return deleted
+
+    @staticmethod
+    def _delete_jobs(jobs):
+        """Delete the jobs' result files, then the rows; returns the number of jobs deleted"""
+        jobs = list(jobs.only('id', 'result_file'))
+        for job in jobs:
+            if job.result_file:
+                try:
+                    job.result_file.delete(save=False)
+                except Exception as e:
+                    logger.warning(f"Could not delete result file of report job {job.id}: {str(e)}")
+        if not jobs:
+            return 0
+        return ReportJob.objects.filter(id__in=[job.id for job in jobs]).delete()[0]
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='report-job')
+            return self._executor
+
+    def run(self, job_id):
+        """Execute one queued job and store its result"""
+        try:
+            # Claim the job so it only ever runs once
+            claimed = ReportJob.objects.filter(id=job_id, status='queued').update(
+                status='running', started_at=timezone.now()
+            )
+            if not claimed:
+                return
+
+            job = ReportJob.objects.get(id=job_id)
+            try:
+                result = ReportService.build(job.report_type, job.params)
+                content = json.dumps(result, cls=DjangoJSONEncoder).encode()
+                job.result_file.save(f"{job.id}.json", ContentFile(content), save=False)
+                job.result_size = len(content)
+                job.status = 'completed'
+                job.completed_at = timezone.now()
+                job.save(update_fields=['result_file', 'result_size', 'status', 'completed_at'])
+                elapsed = (job.completed_at - job.started_at).total_seconds()
+                logger.info(f"✅ Report job {job.id} ({job.report_type}) completed in {elapsed:.2f}s, {len(content)} bytes")
+            except Exception as e:
+                logger.error(f"Error running report job {job_id}: {str(e)}")
+                ReportJob.objects.filter(id=job_id).update(
+                    status='failed', error_message=str(e), completed_at=timezone.now()
+                )
+        finally:
+            close_old_connections()
+
+
+# Global report job runner instance
+report_job_runner = ReportJobRunner.from_settings()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Report Service
+Builders for the attendance, leave, office, user and monthly attendance reports.
+Each takes a plain parameter mapping (request query params or a stored job's
+params) and returns a JSON-serializable dict, so the same code serves the
+synchronous report endpoints and background report jobs.
+"""
+
+import logging
+from django.utils import timezone
+
+from .models import CustomUser, Office, Attendance, Leave
+from .daily_summary import daily_summary_service
+from .essl_service import AttendanceReportService
+
+logger = logging.getLogger(__name__)
+
+
+class ReportService:
+    """Report builders keyed by report type"""
+
+    # Parameters each report type understands; anything else is ignored
+    REPORT_PARAMS = {
+        'attendance': ('start_date', 'end_date', 'office', 'user', 'status', 'include_raw'),
+        'leave': ('start_date', 'end_date', 'office', 'user', 'status'),
+        'office': (),
+        'user': (),
+        'monthly_attendance': ('office', 'year', 'month'),
+    }
+
+    @classmethod
+    def normalize_params(cls, report_type, params):
+        """Known, non-empty parameters of a report as strings"""
+        return {
+            key: str(params[key])
+            for key in cls.REPORT_PARAMS[report_type]
+            if params.get(key) not in (None, '')
+        }
+
+    @classmethod
+    def build(cls, report_type, params):
+        """Build a report by type"""
+        builder = getattr(cls, f"{report_type}_report")
+        return builder(cls.normalize_params(report_type, params))
+
+    @staticmethod
+    def attendance_queryset(params):
+        """Attendance rows matching the report filters"""
+        queryset = Attendance.objects.all()
+        if params.get('start_date'):
+            queryset = queryset.filter(date__gte=params['start_date'])
+        if params.get('end_date'):
+            queryset = queryset.filter(date__lte=params['end_date'])
+        if params.get('office'):
+            queryset = queryset.filter(office_id=params['office'])
+        if params.get('user'):
+            queryset = queryset.filter(user_id=params['user'])
+        if params.get('status'):
+            queryset = queryset.filter(status=params['status'])
+        return queryset
+
+    @staticmethod
+    def attendance_report(params):
+        """Generate attendance report with filters"""
+        # Get query parameters
+        start_date = params.get('start_date')
+        end_date = params.get('end_date')
+        office_id = params.get('office')
+        user_id = params.get('user')
+        status_filter = params.get('status')
+
+        # Build query
+        queryset = ReportService.attendance_queryset(params).select_related('user', 'user__office').defer(
+            *CustomUser.detail_field_paths('user')
+        )
+
+        # Daily counts come from the daily office summary unless the report is
+        # narrowed to a user or status, which the summary cannot answer
+        use_summary = not user_id and not status_filter
+        include_raw = params.get('include_raw', 'true').lower() != 'false'
+
+        # Get data with safe date handling
+        attendance_data = []
+        if include_raw or not use_summary:
+            for attendance in queryset:
+                try:
+                    data = {
+                        'id': str(attendance.id),
+                        'date': attendance.date.isoformat() if attendance.date else None,
+                        'check_in_time': attendance.check_in_time.isoformat() if attendance.check_in_time else None,
+                        'check_out_time': attendance.check_out_time.isoformat() if attendance.check_out_time else None,
+                        'status': attendance.status,
+                        'user__id': str(attendance.user.id) if attendance.user else None,
+                        'user__first_name': attendance.user.first_name if attendance.user else None,
+                        'user__last_name': attendance.user.last_name if attendance.user else None,
+                        'user__employee_id': attendance.user.employee_id if attendance.user else None,
+                        'user__office__name': attendance.user.office.name if attendance.user and attendance.user.office else None,
+                    }
+                    attendance_data.append(data)
+                except Exception as e:
+                    logger.warning(f"Error processing attendance record {attendance.id}: {e}")
+                    continue
+
+        if use_summary:
+            daily_stats_list = []
+            for day in daily_summary_service.daily(start_date, end_date, office_id):
+                rate = (day['present_count'] / day['total_records'] * 100) if day['total_records'] > 0 else 0
+                daily_stats_list.append({
+                    'date': day['date'].isoformat(),
+                    'present': day['present_count'],
+                    'absent': day['absent_count'],
+                    'late': day['late_count'],
+                    'total': day['total_records'],
+                    'rate': round(rate, 2)
+                })
+            total_records = sum(day['total'] for day in daily_stats_list)
+            present_count = sum(day['present'] for day in daily_stats_list)
+            absent_count = sum(day['absent'] for day in daily_stats_list)
+            late_count = sum(day['late'] for day in daily_stats_list)
+            attendance_rate = (present_count / total_records * 100) if total_records > 0 else 0
+        else:
+            # Calculate statistics
+            total_records = len(attendance_data)
+            present_count = sum(1 for a in attendance_data if a['status'] == 'present')
+            absent_count = sum(1 for a in attendance_data if a['status'] == 'absent')
+            late_count = sum(1 for a in attendance_data if a['status'] == 'late')
+            attendance_rate = (present_count / total_records * 100) if total_records > 0 else 0
+
+            # Group by date with safe date handling
+            daily_stats = {}
+            for record in attendance_data:
+                try:
+                    date = record['date']
+                    if date:
+                        # Extract just the date part if it's a full datetime string
+                        if 'T' in date:
+                            date = date.split('T')[0]
+
+                        if date not in daily_stats:
+                            daily_stats[date] = {'present': 0, 'absent': 0, 'late': 0, 'total': 0}
+                        daily_stats[date][record['status']] += 1
+                        daily_stats[date]['total'] += 1
+                except Exception as e:
+                    logger.warning(f"Error processing date for record: {e}")
+                    continue
+
+            # Convert to list format
+            daily_stats_list = []
+            for date, stats in daily_stats.items():
+                try:
+                    rate = (stats['present'] / stats['total'] * 100) if stats['total'] > 0 else 0
+                    daily_stats_list.append({
+                        'date': date,
+                        'present': stats['present'],
+                        'absent': stats['absent'],
+                        'late': stats['late'],
+                        'total': stats['total'],
+                        'rate': round(rate, 2)
+                    })
+                except Exception as e:
+                    logger.warning(f"Error calculating stats for date {date}: {e}")
+                    continue
+
+            # Sort by date
+            daily_stats_list.sort(key=lambda x: x['date'])
+
+        return {
+            'type': 'attendance',
+            'summary': {
+                'totalRecords': total_records,
+                'presentCount': present_count,
+                'absentCount': absent_count,
+                'lateCount': late_count,
+                'attendanceRate': round(attendance_rate, 2)
+            },
+            'dailyStats': daily_stats_list,
+            'rawData': attendance_data
+        }
+
+    @staticmethod
+    def leave_queryset(params):
+        """Leave rows matching the report filters"""
+        queryset = Leave.objects.all()
+        if params.get('start_date'):
+            queryset = queryset.filter(start_date__gte=params['start_date'])
+        if params.get('end_date'):
+            queryset = queryset.filter(end_date__lte=params['end_date'])
+        if params.get('office'):
+            queryset = queryset.filter(office_id=params['office'])
+        if params.get('user'):
+            queryset = queryset.filter(user_id=params['user'])
+        if params.get('status'):
+            queryset = queryset.filter(status=params['status'])
+        return queryset
+
+    @staticmethod
+    def leave_report(params):
+        """Generate leave report with filters"""
+        # Build query
+        queryset = ReportService.leave_queryset(params).select_related('user', 'user__office', 'approved_by').defer(
+            *CustomUser.detail_field_paths('user', 'approved_by')
+        )
+
+        # Get data with safe date handling
+        leave_data = []
+        for leave in queryset:
+            try:
+                data = {
+                    'id': str(leave.id),
+                    'leave_type': leave.leave_type,
+                    'start_date': leave.start_date.isoformat() if leave.start_date else None,
+                    'end_date': leave.end_date.isoformat() if leave.end_date else None,
+                    'status': leave.status,
+                    'reason': leave.reason,
+                    'applied_at': leave.created_at.isoformat() if leave.created_at else None,
+                    'approved_at': leave.approved_at.isoformat() if leave.approved_at else None,
+                    'approved_by__first_name': leave.approved_by.first_name if leave.approved_by else None,
+                    'approved_by__last_name': leave.approved_by.last_name if leave.approved_by else None,
+                    'user__id': str(leave.user.id) if leave.user else None,
+                    'user__first_name': leave.user.first_name if leave.user else None,
+                    'user__last_name': leave.user.last_name if leave.user else None,
+                    'user__employee_id': leave.user.employee_id if leave.user else None,
+                    'user__office__name': leave.user.office.name if leave.user and leave.user.office else None,
+                }
+                leave_data.append(data)
+            except Exception as e:
+                logger.warning(f"Error processing leave record {leave.id}: {e}")
+                continue
+
+        # Calculate statistics
+        total_leaves = len(leave_data)
+        approved_leaves = sum(1 for l in leave_data if l['status'] == 'approved')
+        pending_leaves = sum(1 for l in leave_data if l['status'] == 'pending')
+        rejected_leaves = sum(1 for l in leave_data if l['status'] == 'rejected')
+        approval_rate = (approved_leaves / total_leaves * 100) if total_leaves > 0 else 0
+
+        # Group by leave type
+        leave_type_stats = {}
+        for record in leave_data:
+            try:
+                leave_type = record['leave_type']
+                if leave_type not in leave_type_stats:
+                    leave_type_stats[leave_type] = {'approved': 0, 'pending': 0, 'rejected': 0, 'total': 0}
+                leave_type_stats[leave_type][record['status']] += 1
+                leave_type_stats[leave_type]['total'] += 1
+            except Exception as e:
+                logger.warning(f"Error processing leave type for record: {e}")
+                continue
+
+        # Convert to list format
+        leave_type_list = []
+        for leave_type, stats in leave_type_stats.items():
+            try:
+                leave_type_list.append({
+                    'type': leave_type,
+                    'approved': stats['approved'],
+                    'pending': stats['pending'],
+                    'rejected': stats['rejected'],
+                    'total': stats['total']
+                })
+            except Exception as e:
+                logger.warning(f"Error creating leave type stats for {leave_type}: {e}")
+                continue
+
+        return {
+            'type': 'leave',
+            'summary': {
+                'totalLeaves': total_leaves,
+                'approvedLeaves': approved_leaves,
+                'pendingLeaves': pending_leaves,
+                'rejectedLeaves': rejected_leaves,
+                'approvalRate': round(approval_rate, 2)
+            },
+            'leaveTypeStats': leave_type_list,
+            'rawData': leave_data
+        }
+
+    @staticmethod
+    def office_report(params):
+        """Generate office report"""
+        # Get all offices with related data
+        offices = Office.objects.prefetch_related('customuser_set').all()
+
+        # Get all users for statistics
+        all_users = CustomUser.objects.select_related('office').all()
+
+        # Calculate office statistics
+        office_stats = []
+        for office in offices:
+            try:
+                office_users = [u for u in all_users if u.office_id == office.id]
+                employees = sum(1 for u in office_users if u.role == 'employee')
+                managers = sum(1 for u in office_users if u.role == 'manager')
+                active_users = sum(1 for u in office_users if u.is_active)
+
+                office_stats.append({
+                    'id': str(office.id),
+                    'name': office.name,
+                    'employees': employees,
+                    'managers': managers,
+                    'activeUsers': active_users,
+                    'totalUsers': len(office_users),
+                    'manager': f"{office.manager.first_name} {office.manager.last_name}" if office.manager else 'Not assigned'
+                })
+            except Exception as e:
+                logger.warning(f"Error processing office {office.id}: {e}")
+                continue
+
+        # Calculate summary statistics
+        total_offices = len(offices)
+        total_employees = sum(1 for u in all_users if u.role == 'employee')
+        total_managers = sum(1 for u in all_users if u.role == 'manager')
+        total_users = len(all_users)
+
+        return {
+            'type': 'office',
+            'summary': {
+                'totalOffices': total_offices,
+                'totalEmployees': total_employees,
+                'totalManagers': total_managers,
+                'totalUsers': total_users
+            },
+            'officeStats': office_stats,
+            'rawData': list(offices.values())
+        }
+
+    @staticmethod
+    def user_report(params):
+        """Generate user report"""
+        # Get all users
+        users = CustomUser.objects.select_related('office').all()
+
+        # Calculate user statistics
+        role_stats = {}
+        office_stats = {}
+        active_users = sum(1 for u in users if u.is_active)
+        inactive_users = sum(1 for u in users if not u.is_active)
+
+        for user in users:
+            try:
+                # Role statistics
+                if user.role not in role_stats:
+                    role_stats[user.role] = {'active': 0, 'inactive': 0, 'total': 0}
+                role_stats[user.role]['total'] += 1
+                if user.is_active:
+                    role_stats[user.role]['active'] += 1
+                else:
+                    role_stats[user.role]['inactive'] += 1
+
+                # Office statistics
+                office_name = user.office.name if user.office else 'No Office'
+                if office_name not in office_stats:
+                    office_stats[office_name] = {'active': 0, 'inactive': 0, 'total': 0}
+                office_stats[office_name]['total'] += 1
+                if user.is_active:
+                    office_stats[office_name]['active'] += 1
+                else:
+                    office_stats[office_name]['inactive'] += 1
+            except Exception as e:
+                logger.warning(f"Error processing user {user.id}: {e}")
+                continue
+
+        # Convert to list format
+        role_stats_list = []
+        for role, stats in role_stats.items():
+            try:
+                role_stats_list.append({
+                    'role': role,
+                    'active': stats['active'],
+                    'inactive': stats['inactive'],
+                    'total': stats['total']
+                })
+            except Exception as e:
+                logger.warning(f"Error creating role stats for {role}: {e}")
+                continue
+
+        office_stats_list = []
+        for office, stats in office_stats.items():
+            try:
+                office_stats_list.append({
+                    'office': office,
+                    'active': stats['active'],
+                    'inactive': stats['inactive'],
+                    'total': stats['total']
+                })
+            except Exception as e:
+                logger.warning(f"Error creating office stats for {office}: {e}")
+                continue
+
+        activation_rate = (active_users / len(users) * 100) if users else 0
+
+        return {
+            'type': 'user',
+            'summary': {
+                'totalUsers': len(users),
+                'activeUsers': active_users,
+                'inactiveUsers': inactive_users,
+                'activationRate': round(activation_rate, 2)
+            },
+            'roleStats': role_stats_list,
+            'officeStats': office_stats_list,
+            'rawData': list(users.values())
+        }
+
+    @staticmethod
+    def monthly_attendance_report(params):
+        """Generate monthly attendance report"""
+        current_date = timezone.now()
+        return AttendanceReportService.get_monthly_attendance_report(
+            office_id=params.get('office'),
+            year=int(params.get('year') or current_date.year),
+            month=int(params.get('month') or current_date.month)
+        )
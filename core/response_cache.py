@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Response Cache
+Caches the payload of hot read endpoints in the Django cache. Keys are
+namespaced by endpoint, role and office (and by user where the payload is
+personal) and include the current generation of every data scope the endpoint
+reads. Model signals bump the generation of a scope for the office a row
+belongs to, so an invalidation is one counter increment; entries keyed on old
+generations are never addressed again and age out with their TTL. Use a
+shared backend (REDIS_CACHE_URL) when several processes serve the API.
+"""
+
+import functools
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import Attendance, CustomUser, Device, Leave, Office
+
+logger = logging.getLogger(__name__)
+
+# Data scopes an endpoint can depend on
+SCOPES = ('attendance', 'leave', 'user', 'office', 'device')
+
+# Office token of unscoped (admin) entries; bumped by a change in any office
+ALL_OFFICES = 'all'
+
+
+def _office_token(office_id):
+    """Canonical office part of a key, so '<UUID>' from a URL matches the model's value"""
+    if office_id is None:
+        return 'none'
+    try:
+        return str(uuid.UUID(str(office_id)))
+    except ValueError:
+        return str(office_id)
+
+
+class ResponseCache:
+    """Generation-keyed cache of endpoint payloads"""
+
+    def __init__(self, enabled=True, cache_alias='default', ttl=60):
+        self.enabled = enabled
+        self.cache_alias = cache_alias
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'errors': 0}
+
+    @classmethod
+    def from_settings(cls):
+        """Build the cache from the ATTENDANCE_RESPONSE_CACHE setting"""
+        config = getattr(settings, 'ATTENDANCE_RESPONSE_CACHE', {})
+        return cls(
+            enabled=config.get('ENABLED', True),
+            cache_alias=config.get('CACHE_ALIAS', 'default'),
+            ttl=config.get('TTL', 60),
+        )
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    @staticmethod
+    def _epoch_key(scope):
+        return f"rc:epoch:{scope}"
+
+    @staticmethod
+    def _generation_key(scope, office):
+        return f"rc:gen:{scope}:{office}"
+
+    def _generations(self, scopes, office):
+        """Current counters of the scopes, creating missing (or evicted) ones"""
+        keys = []
+        for scope in scopes:
+            keys += [self._epoch_key(scope), self._generation_key(scope, office)]
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            # Start from the clock so a recreated counter never repeats an old value
+            for key in missing:
+                self.cache.add(key, time.time_ns(), timeout=None)
+            values.update(self.cache.get_many(missing))
+        return [values.get(key) for key in keys]
+
+    def _bump(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            if not self.cache.add(key, time.time_ns(), timeout=None):
+                self.cache.incr(key)
+
+    def _response_key(self, endpoint, scopes, request, kwargs, per_user, office_kwarg):
+        user = request.user
+        if office_kwarg:
+            office = _office_token(kwargs.get(office_kwarg))
+        elif user.is_admin:
+            office = ALL_OFFICES
+        else:
+            office = _office_token(user.office_id)
+        personal = per_user or not (user.is_admin or user.is_manager)
+        parts = [
+            user.role, _office_token(user.office_id), str(user.pk) if personal else '-',
+            timezone.localdate().isoformat(), request.get_full_path(),
+            *map(str, self._generations(scopes, office)),
+        ]
+        digest = hashlib.sha256('|'.join(parts).encode()).hexdigest()
+        return f"rc:resp:{endpoint}:{digest}"
+
+    def cached(self, *scopes, per_user=False, office_kwarg=None):
+        """Decorator for viewset actions: serve 200 payloads from the cache
+
+        scopes are the data the payload is built from. Employees always get
+        entries of their own; per_user=True does that for every role.
+        office_kwarg names the URL kwarg holding the office the payload is
+        about, for endpoints that are not scoped by the requester's office.
+        """
+        unknown = set(scopes) - set(SCOPES)
+        if unknown:
+            raise ValueError(f"Unknown response cache scopes: {', '.join(sorted(unknown))}")
+
+        def decorator(view_method):
+            endpoint = view_method.__qualname__
+
+            @functools.wraps(view_method)
+            def wrapper(view, request, *args, **kwargs):
+                if not self.enabled:
+                    return view_method(view, request, *args, **kwargs)
+                try:
+                    key = self._response_key(endpoint, scopes, request, kwargs, per_user, office_kwarg)
+                    data = self.cache.get(key)
+                except Exception as e:
+                    logger.warning(f"⚠️ Response cache unavailable for {endpoint}: {str(e)}")
+                    self._count('errors')
+                    return view_method(view, request, *args, **kwargs)
+
+                if data is not None:
+                    self._count('hits')
+                    return Response(data, headers={'X-Cache': 'HIT'})
+
+                self._count('misses')
+                response = view_method(view, request, *args, **kwargs)
+                if response.status_code == 200:
+                    try:
+                        self.cache.set(key, response.data, self.ttl)
+                    except Exception as e:
+                        logger.warning(f"⚠️ Could not cache {endpoint} response: {str(e)}")
+                        self._count('errors')
+                    response['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, scope, office_ids=None):
+        """Drop cached payloads of a scope for some offices, or everywhere when office_ids is None"""
+        if office_ids is None:
+            keys = [self._epoch_key(scope)]
+        else:
+            keys = [self._generation_key(scope, ALL_OFFICES)]
+            keys += [self._generation_key(scope, _office_token(office_id)) for office_id in set(office_ids)]
+        try:
+            for key in keys:
+                self._bump(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Response cache invalidation of {scope} failed: {str(e)}")
+            self._count('errors')
+            return
+        self._count('invalidations')
+
+    def invalidate_on_commit(self, scope, office_ids=None):
+        """Invalidate once the current transaction commits, so readers cannot re-cache old rows"""
+        transaction.on_commit(lambda: self.invalidate(scope, office_ids))
+
+    def get_stats(self):
+        """Hit/miss/invalidation counters of this process"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        return {
+            'enabled': self.enabled,
+            'backend': type(self.cache).__name__,
+            'ttl': self.ttl,
+            **stats,
+            'hit_rate': round(stats['hits'] / lookups, 3) if lookups else None,
+        }
+
+
+# Global response cache instance
+response_cache = ResponseCache.from_settings()
+
+
+@receiver(post_save, sender=Attendance, dispatch_uid='response_cache_attendance_save')
+@receiver(post_delete, sender=Attendance, dispatch_uid='response_cache_attendance_delete')
+def invalidate_attendance_responses(sender, instance, **kwargs):
+    response_cache.invalidate_on_commit('attendance', [instance.office_id])
+
+
+@receiver(post_save, sender=Leave, dispatch_uid='response_cache_leave_save')
+@receiver(post_delete, sender=Leave, dispatch_uid='response_cache_leave_delete')
+def invalidate_leave_responses(sender, instance, **kwargs):
+    response_cache.invalidate_on_commit('leave', [instance.office_id])
+
+
+@receiver(post_save, sender=Device, dispatch_uid='response_cache_device_save')
+@receiver(post_delete, sender=Device, dispatch_uid='response_cache_device_delete')
+def invalidate_device_responses(sender, instance, **kwargs):
+    response_cache.invalidate_on_commit('device', [instance.office_id])
+
+
+@receiver(post_save, sender=CustomUser, dispatch_uid='response_cache_user_save')
+@receiver(post_delete, sender=CustomUser, dispatch_uid='response_cache_user_delete')
+def invalidate_user_responses(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch columns no cached payload shows; a user can change office, so drop every office
+    if update_fields is not None and set(update_fields) <= {'last_login', 'last_login_ip'}:
+        return
+    response_cache.invalidate_on_commit('user')
+
+
+@receiver(post_save, sender=Office, dispatch_uid='response_cache_office_save')
+@receiver(post_delete, sender=Office, dispatch_uid='response_cache_office_delete')
+def invalidate_office_responses(sender, instance, **kwargs):
+    response_cache.invalidate_on_commit('office')
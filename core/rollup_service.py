@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Attendance Rollup Service
+Set-based rollup of raw ESSLAttendanceLog punches into daily Attendance rows.
+Punches are grouped by (user, date), first-in/last-out, total hours and status
+are computed in memory and the affected Attendance rows are written with one
+bulk_create/bulk_update pass.
+"""
+
+import logging
+from collections import defaultdict
+from django.utils import timezone
+from django.db import transaction
+
+from .models import Attendance, CustomUser, ESSLAttendanceLog
+from .attendance_audit import audit_values, log_bulk_changes
+from .daily_summary import attendance_summary_keys
+from .side_effects import side_effect_writer
+from .working_hours import working_hours_resolver
+
+logger = logging.getLogger(__name__)
+
+
+class AttendanceRollupService:
+    """Roll up batches of unprocessed punches into daily attendance"""
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+
+    @staticmethod
+    def first_in_last_out(punches):
+        """Earliest check-in and latest check-out of a day's punches
+
+        Devices that only report one punch type still get a check-out: the last
+        punch of the day counts as the check-out when it is after the check-in.
+        """
+        ins = [log.punch_time for log in punches if log.punch_type == 'in']
+        outs = [log.punch_time for log in punches if log.punch_type == 'out']
+        all_times = [log.punch_time for log in punches]
+
+        if outs:
+            check_in = min(ins) if ins else None
+            check_out = max(outs)
+        else:
+            check_in = min(all_times)
+            check_out = max(all_times) if len(all_times) > 1 else None
+        if check_in and check_out and check_out <= check_in:
+            check_out = None
+        return check_in, check_out
+
+    def merge_punches(self, attendance, punches):
+        """Merge a batch of a day's punches into an existing Attendance row
+
+        With incremental polling the morning and evening punches of a device
+        that only reports one punch type arrive in different batches, so a
+        batch without 'out' punches is merged against the stored check-in:
+        its latest punch becomes the check-out when it is after the check-in.
+        """
+        check_in, check_out = self.first_in_last_out(punches)
+        if attendance.check_in_time and not any(log.punch_type == 'out' for log in punches):
+            latest = max(log.punch_time for log in punches)
+            if latest > attendance.check_in_time:
+                check_out = latest
+
+        if check_in and (not attendance.check_in_time or check_in < attendance.check_in_time):
+            attendance.check_in_time = check_in
+        if check_out and (not attendance.check_out_time or check_out > attendance.check_out_time):
+            attendance.check_out_time = check_out
+
+    @staticmethod
+    def _classify(attendance, policy):
+        attendance.total_hours = attendance.calculate_total_hours()
+        attendance.status = policy.classify(attendance.check_in_time, attendance.check_out_time, attendance.date)
+
+    def _merge_conflicts(self, conflicts, groups, policies, now):
+        """Merge days another rollup created first into its rows; returns (attendance, previous values) pairs"""
+        rows = {
+            (attendance.user_id, attendance.date): attendance
+            for attendance in Attendance.objects.select_for_update().select_related('user').filter(
+                user_id__in={attendance.user_id for attendance in conflicts},
+                date__in={attendance.date for attendance in conflicts}
+            )
+        }
+        merged = []
+        for lost in conflicts:
+            key = (lost.user_id, lost.date)
+            attendance = rows[key]
+            previous_values = audit_values(attendance)
+            self.merge_punches(attendance, groups[key])
+            self._classify(attendance, policies[lost.user.office_id])
+            if audit_values(attendance) != previous_values:
+                attendance.updated_at = now
+                merged.append((attendance, previous_values))
+        return merged
+
+    def process_unprocessed(self, queryset=None):
+        """Roll up every unprocessed punch (optionally restricted by queryset)"""
+        if queryset is None:
+            queryset = ESSLAttendanceLog.objects.all()
+        queryset = queryset.filter(is_processed=False, user__isnull=False)
+
+        total = {'logs': 0, 'created': 0, 'updated': 0}
+        while True:
+            batch = list(
+                queryset.select_related('user', 'user__office', 'device')
+                .order_by('punch_time')[:self.batch_size]
+            )
+            if not batch:
+                break
+            result = self.rollup(batch)
+            for key in total:
+                total[key] += result[key]
+            if len(batch) < self.batch_size:
+                break
+        return total
+
+    def rollup(self, logs):
+        """Roll up a batch of ESSLAttendanceLog rows into Attendance
+
+        Logs without a user are ignored (and stay unprocessed). Returns a dict
+        with the number of logs processed and Attendance rows created/updated.
+        """
+        groups = defaultdict(list)
+        for log in logs:
+            if log.user_id:
+                punch_time = timezone.localtime(log.punch_time) if timezone.is_aware(log.punch_time) else log.punch_time
+                groups[(log.user_id, punch_time.date())].append(log)
+
+        result = {'logs': sum(len(punches) for punches in groups.values()), 'created': 0, 'updated': 0}
+        if not groups:
+            return result
+
+        user_ids = {user_id for user_id, _ in groups}
+        dates = {day for _, day in groups}
+
+        # Freshly ingested logs only carry user_id: load their users in one query
+        uncached = {log.user_id for punches in groups.values() for log in punches
+                    if not ESSLAttendanceLog.user.is_cached(log)}
+        if uncached:
+            users = CustomUser.objects.select_related('office').in_bulk(uncached)
+            for punches in groups.values():
+                for log in punches:
+                    if not ESSLAttendanceLog.user.is_cached(log):
+                        log.user = users[log.user_id]
+
+        with transaction.atomic():
+            # Existing rows for every affected (user, date), locked for the merge
+            existing = {
+                (attendance.user_id, attendance.date): attendance
+                for attendance in Attendance.objects.select_for_update().select_related('user').filter(
+                    user_id__in=user_ids,
+                    date__range=(min(dates), max(dates))
+                )
+                if (attendance.user_id, attendance.date) in groups
+            }
+
+            policies = working_hours_resolver.get_many(punches[0].user.office_id for punches in groups.values())
+
+            to_create, to_update, changes = [], [], []
+            now = timezone.now()
+            for (user_id, day), punches in groups.items():
+                user = punches[0].user
+
+                attendance = existing.get((user_id, day))
+                if attendance is None:
+                    check_in, check_out = self.first_in_last_out(punches)
+                    attendance = Attendance(
+                        user=user,
+                        office_id=user.office_id,
+                        date=day,
+                        device=punches[0].device,
+                        check_in_time=check_in,
+                        check_out_time=check_out
+                    )
+                    previous_values = None
+                else:
+                    previous_values = audit_values(attendance)
+                    self.merge_punches(attendance, punches)
+
+                self._classify(attendance, policies[user.office_id])
+
+                if previous_values is None:
+                    to_create.append(attendance)
+                elif audit_values(attendance) != previous_values:
+                    attendance.updated_at = now
+                    to_update.append(attendance)
+                else:
+                    continue
+                changes.append((attendance, previous_values))
+
+            if to_create:
+                # A concurrent rollup (another poller, a manual sync) may create the same day first;
+                # ids are generated client side, so the rows that made it in are found by id
+                Attendance.objects.bulk_create(to_create, ignore_conflicts=True)
+                stored = set(
+                    Attendance.objects.filter(id__in=[attendance.id for attendance in to_create])
+                    .values_list('id', flat=True)
+                )
+                conflicts = [attendance for attendance in to_create if attendance.id not in stored]
+                if conflicts:
+                    to_create = [attendance for attendance in to_create if attendance.id in stored]
+                    changes = [change for change in changes if change[1] is not None or change[0].id in stored]
+                    merged = self._merge_conflicts(conflicts, groups, policies, now)
+                    to_update += [attendance for attendance, _ in merged]
+                    changes += merged
+            if to_update:
+                Attendance.objects.bulk_update(
+                    to_update,
+                    ['check_in_time', 'check_out_time', 'total_hours', 'status', 'updated_at']
+                )
+            # Bulk writes skip post_save, so keep the audit trail and summaries here
+            log_bulk_changes(changes)
+            side_effect_writer.enqueue_summary_refresh(attendance_summary_keys(to_create + to_update))
+
+            ESSLAttendanceLog.objects.filter(
+                id__in=[log.id for punches in groups.values() for log in punches]
+            ).update(is_processed=True)
+
+        result['created'] = len(to_create)
+        result['updated'] = len(to_update)
+        logger.info(f"🧮 Rolled up {result['logs']} punches into {len(groups)} attendance days "
+                    f"({result['created']} created, {result['updated']} updated)")
+        return result
+
+
+# Global rollup service instance
+rollup_service = AttendanceRollupService()
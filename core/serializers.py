@@ -4,10 +4,30 @@ from django.contrib.auth.password_validation import validate_password
 from .models import (
     CustomUser, Office, Device, Attendance, Leave, Document, 
     Notification, SystemSettings, AttendanceLog, ESSLAttendanceLog, 
-    WorkingHoursSettings
+    WorkingHoursSettings, ReportJob
 )
 
 
+class DynamicFieldsMixin:
+    """Trim a serializer to ?fields=a,b and nest the relations named in ?expand="""
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+
+        expand = {name for name in request.query_params.get('expand', '').split(',') if name}
+        for name in expand & set(self.expandable_fields):
+            self.fields[name] = self.expandable_fields[name](read_only=True)
+
+        fields = {name for name in request.query_params.get('fields', '').split(',') if name}
+        if fields:
+            for name in set(self.fields) - fields - expand:
+                self.fields.pop(name)
+
+
 class OfficeSerializer(serializers.ModelSerializer):
     """Serializer for Office model"""
     manager_name = serializers.CharField(source='manager.get_full_name', read_only=True)
@@ -145,7 +165,32 @@ class AttendanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Attendance
         fields = '__all__'
-        read_only_fields = ('id', 'total_hours', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'office', 'total_hours', 'created_at', 'updated_at')
+
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    """Compact user for embedding in list rows"""
+    office_name = serializers.CharField(source='office.name', read_only=True)
+    full_name = serializers.CharField(source='get_full_name', read_only=True)
+    
+    class Meta:
+        model = CustomUser
+        fields = ['id', 'username', 'first_name', 'last_name', 'full_name', 'employee_id', 'role', 'office', 'office_name']
+
+
+class AttendanceListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Compact attendance row for list endpoints; ?expand=user nests the user"""
+    user_name = serializers.CharField(source='user.get_full_name', read_only=True)
+    user_employee_id = serializers.CharField(source='user.employee_id', read_only=True)
+    user_office_name = serializers.CharField(source='user.office.name', read_only=True, default=None)
+    expandable_fields = {'user': UserSummarySerializer}
+    
+    class Meta:
+        model = Attendance
+        fields = [
+            'id', 'user', 'user_name', 'user_employee_id', 'user_office_name', 'date',
+            'check_in_time', 'check_out_time', 'total_hours', 'status', 'device', 'notes'
+        ]
 
 
 class AttendanceCreateSerializer(serializers.ModelSerializer):
@@ -163,7 +208,7 @@ class LeaveSerializer(serializers.ModelSerializer):
     class Meta:
         model = Leave
         fields = '__all__'
-        read_only_fields = ('id', 'approved_at', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'office', 'approved_at', 'created_at', 'updated_at')
 
 
 class LeaveCreateSerializer(serializers.ModelSerializer):
@@ -321,6 +366,13 @@ class ESSLDeviceSyncSerializer(serializers.Serializer):
         return attrs
 
 
+class AttendanceStatusRecomputeSerializer(serializers.Serializer):
+    """Serializer for batch attendance status recomputation"""
+    year = serializers.IntegerField(min_value=2000)
+    month = serializers.IntegerField(min_value=1, max_value=12)
+    dry_run = serializers.BooleanField(default=False)
+
+
 class MonthlyAttendanceReportSerializer(serializers.Serializer):
     """Serializer for monthly attendance reports"""
     office_id = serializers.UUIDField(required=False)
@@ -337,6 +389,34 @@ class MonthlyAttendanceReportSerializer(serializers.Serializer):
         return attrs
 
 
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Serializer for background report jobs"""
+    requested_by_name = serializers.CharField(source='requested_by.get_full_name', read_only=True)
+    
+    class Meta:
+        model = ReportJob
+        exclude = ('params_hash', 'result_file')
+        read_only_fields = (
+            'id', 'status', 'is_stale', 'result_size', 'error_message',
+            'requested_by', 'created_at', 'started_at', 'completed_at'
+        )
+
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    """Serializer for submitting a background report job"""
+    report_type = serializers.ChoiceField(choices=ReportJob.REPORT_TYPE_CHOICES)
+    params = serializers.DictField(required=False, default=dict)
+    
+    def validate(self, attrs):
+        params = attrs['params']
+        if attrs['report_type'] == 'monthly_attendance':
+            data = {'year': params.get('year'), 'month': params.get('month')}
+            if params.get('office'):
+                data['office_id'] = params['office']
+            MonthlyAttendanceReportSerializer(data=data).is_valid(raise_exception=True)
+        return attrs
+
+
 # Dashboard Statistics Serializers
 class DashboardStatsSerializer(serializers.Serializer):
     """Serializer for dashboard statistics"""
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Deferred Side Effects
+Background writer for the audit log entries, notifications, daily/monthly
+summary refreshes and report job invalidations produced by model signals. Work is queued only once the surrounding transaction commits
+(transaction.on_commit), repeated saves of the same attendance row are coalesced
+into one AttendanceLog entry and everything is written with bulk INSERTs. Each
+kind of work is written separately; items of a kind that failed are queued
+again up to MAX_RETRIES times, then logged as dropped.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from django.conf import settings
+from django.db import transaction, close_old_connections
+
+from .models import Attendance, AttendanceLog, CustomUser, Notification, ReportJob
+from .attendance_audit import merge_changes
+from .daily_summary import daily_summary_service
+from .monthly_summary import monthly_summary_service
+from .response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+
+class SideEffectWriter:
+    """Queue and batch-write AttendanceLog and Notification rows"""
+
+    def __init__(self, asynchronous=True, flush_interval=1.0, batch_size=500, max_retries=3):
+        self.asynchronous = asynchronous
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_retries = max_retries  # further flushes an item gets after its write failed
+        self._queue = queue.Queue()
+        self._pending = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.stats = {
+            'queued': 0,
+            'audit_written': 0,
+            'audit_coalesced': 0,
+            'notifications_written': 0,
+            'summaries_refreshed': 0,
+            'reports_invalidated': 0,
+            'errors': 0,
+            'retried': 0,
+            'dropped': 0,
+        }
+
+    @classmethod
+    def from_settings(cls):
+        """Build the writer from the ATTENDANCE_SIDE_EFFECTS setting"""
+        config = getattr(settings, 'ATTENDANCE_SIDE_EFFECTS', {})
+        return cls(
+            asynchronous=config.get('ASYNC', True),
+            flush_interval=config.get('FLUSH_INTERVAL', 1.0),
+            batch_size=config.get('BATCH_SIZE', 500),
+            max_retries=config.get('MAX_RETRIES', 3),
+        )
+
+    def enqueue_attendance_log(self, attendance_id, action, old_values, new_values, changed_by_id):
+        """Queue an audit entry for an attendance row"""
+        self._enqueue(('audit', attendance_id, action, old_values, new_values, changed_by_id))
+
+    def enqueue_notification(self, user_id, title, message, notification_type):
+        """Queue a notification for one user"""
+        self._enqueue(('notification', user_id, title, message, notification_type))
+
+    def enqueue_office_notification(self, office_id, title, message, notification_type, role='manager'):
+        """Queue a notification for every active user with the role in an office"""
+        self._enqueue(('office_notification', office_id, role, title, message, notification_type))
+
+    def enqueue_summary_refresh(self, keys):
+        """Queue DailyOfficeSummary and MonthlyUserSummary refreshes for (office_id, user_id, date) keys"""
+        for office_id, user_id, day in keys:
+            if day:
+                self._enqueue(('summary', office_id, user_id, day))
+
+    def enqueue_report_invalidation(self, source, office_id=None, user_id=None, start_date=None, end_date=None):
+        """Queue marking report jobs that read a data source ('attendance', 'leave', 'user', 'office') stale
+
+        The office, user and date range of the changed row narrow this to the
+        jobs whose parameters cover it (see ReportJob.is_affected_by).
+        """
+        self._enqueue(('report_data', source, (office_id, user_id, start_date, end_date)))
+
+    def _enqueue(self, item):
+        # Only committed changes produce side effects
+        transaction.on_commit(lambda: self._put(item))
+
+    def _put(self, item):
+        self.stats['queued'] += 1
+        self._queue.put((item, 0))
+        if not self.asynchronous:
+            self.flush()
+        else:
+            self._pending.set()
+            self._ensure_thread()
+
+    def _ensure_thread(self):
+        with self._thread_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='side-effect-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._pending.wait()
+            # Give concurrent saves a moment to pile up so they can be coalesced
+            time.sleep(self.flush_interval)
+            self._pending.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Write everything queued so far"""
+        with self._flush_lock:
+            entries = []
+            while True:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not entries:
+                return 0
+
+            attempts = {id(item): attempt for item, attempt in entries}
+            failed = self._write([item for item, _ in entries])
+            for item in failed:
+                # Items derived while writing (report scopes of audited rows) start their count afresh
+                attempt = attempts.get(id(item), 0) + 1
+                if attempt > self.max_retries:
+                    self.stats['dropped'] += 1
+                    logger.error(f"Dropped deferred side effect after {self.max_retries} retries: {item!r}")
+                    continue
+                self.stats['retried'] += 1
+                self._queue.put((item, attempt))
+            if failed and self.asynchronous:
+                # Retry on the next pass, after the flush interval
+                self._pending.set()
+            return len(entries)
+
+    def _write(self, items):
+        """Write a batch, one kind of work at a time; returns the items whose write failed"""
+        by_kind = defaultdict(list)
+        for item in items:
+            by_kind[item[0]].append(item)
+        failed = []
+
+        # Rows written or refreshed in this batch, as (office_id, user_id, date) keys
+        attendance_keys = {item[1:] for item in by_kind['summary']}
+        audited = []
+
+        try:
+            audited = self._write_audits(by_kind['audit'])
+        except Exception as e:
+            failed += self._failed('audit entries', by_kind['audit'], e)
+        attendance_keys.update(audited)
+
+        notification_items = by_kind['notification'] + by_kind['office_notification']
+        try:
+            self._write_notifications(notification_items)
+        except Exception as e:
+            failed += self._failed('notifications', notification_items, e)
+
+        try:
+            self._refresh_summaries(by_kind['summary'])
+        except Exception as e:
+            failed += self._failed('summary refreshes', by_kind['summary'], e)
+
+        # Attendance writes always queue an audit entry or a summary refresh
+        report_items = by_kind['report_data'] + [
+            ('report_data', 'attendance', (office_id, user_id, day, day))
+            for office_id, user_id, day in attendance_keys
+        ]
+        try:
+            self._invalidate_reports(report_items)
+        except Exception as e:
+            failed += self._failed('report invalidations', report_items, e)
+        return failed
+
+    def _failed(self, label, items, error):
+        self.stats['errors'] += 1
+        logger.error(f"Error writing {len(items)} deferred {label}: {str(error)}")
+        return items
+
+    def _write_audits(self, items):
+        """Coalesce and insert audit entries; returns the (office_id, user_id, date) keys of the audited rows"""
+        if not items:
+            return set()
+        # Coalesce audit entries per attendance row: earliest old values, latest new values
+        audits = OrderedDict()
+        for _, attendance_id, action, old_values, new_values, changed_by_id in items:
+            entry = audits.get(attendance_id)
+            if entry is None:
+                audits[attendance_id] = (action, old_values, new_values, changed_by_id)
+            else:
+                self.stats['audit_coalesced'] += 1
+                audits[attendance_id] = (
+                    *merge_changes(entry[:3], (action, old_values, new_values)), changed_by_id
+                )
+
+        # Rows deleted since they were queued have nothing left to audit
+        rows = Attendance.objects.filter(id__in=list(audits)).values_list('id', 'office_id', 'user_id', 'date')
+        live, keys = set(), set()
+        for attendance_id, office_id, user_id, day in rows:
+            live.add(attendance_id)
+            keys.add((office_id, user_id, day))
+
+        audit_logs = [
+            AttendanceLog(
+                attendance_id=attendance_id,
+                action=action,
+                old_values=old_values,
+                new_values=new_values,
+                changed_by_id=changed_by_id
+            )
+            for attendance_id, (action, old_values, new_values, changed_by_id) in audits.items()
+            # Coalesced updates that cancelled each other out
+            if attendance_id in live and (action == 'created' or new_values)
+        ]
+        if audit_logs:
+            AttendanceLog.objects.bulk_create(audit_logs, batch_size=self.batch_size)
+        self.stats['audit_written'] += len(audit_logs)
+        logger.debug(f"Wrote {len(audit_logs)} audit entries")
+        return keys
+
+    def _write_notifications(self, items):
+        notifications = []
+        office_notifications = defaultdict(list)
+        for item in items:
+            if item[0] == 'notification':
+                _, user_id, title, message, notification_type = item
+                notifications.append(Notification(
+                    user_id=user_id, title=title, message=message, notification_type=notification_type
+                ))
+            else:
+                _, office_id, role, title, message, notification_type = item
+                office_notifications[(office_id, role)].append((title, message, notification_type))
+
+        # One recipient query per (office, role) for the whole batch
+        for (office_id, role), messages in office_notifications.items():
+            recipients = CustomUser.objects.filter(
+                office_id=office_id, role=role, is_active=True
+            ).values_list('id', flat=True)
+            for recipient_id in recipients:
+                for title, message, notification_type in messages:
+                    notifications.append(Notification(
+                        user_id=recipient_id, title=title, message=message, notification_type=notification_type
+                    ))
+
+        if notifications:
+            Notification.objects.bulk_create(notifications, batch_size=self.batch_size)
+        self.stats['notifications_written'] += len(notifications)
+
+    def _refresh_summaries(self, items):
+        summary_keys = {item[1:] for item in items}
+        if not summary_keys:
+            return
+        daily_summary_service.refresh({(office_id, day) for office_id, _, day in summary_keys})
+        monthly_summary_service.refresh({(user_id, day) for _, user_id, day in summary_keys})
+        # Cached office totals are read from the summaries just refreshed
+        response_cache.invalidate('attendance', {office_id for office_id, _, _ in summary_keys})
+        self.stats['summaries_refreshed'] += len(summary_keys)
+
+    def _invalidate_reports(self, items):
+        """Mark stale the report jobs whose parameters cover a changed row"""
+        report_changes = defaultdict(set)  # data source -> (office_id, user_id, start_date, end_date) scopes
+        for _, source, scope in items:
+            report_changes[source].add(scope)
+        if not report_changes:
+            return 0
+
+        report_types = [
+            report_type for report_type, sources in ReportJob.DATA_SOURCES.items()
+            if sources & set(report_changes)
+        ]
+        stale_ids = [
+            job.id
+            for job in ReportJob.objects.filter(report_type__in=report_types, is_stale=False).only(
+                'id', 'report_type', 'params', 'created_at'
+            )
+            if any(
+                job.is_affected_by(*scope)
+                for source in ReportJob.DATA_SOURCES[job.report_type] & set(report_changes)
+                for scope in report_changes[source]
+            )
+        ]
+        invalidated = 0
+        if stale_ids:
+            invalidated = ReportJob.objects.filter(id__in=stale_ids, is_stale=False).update(is_stale=True)
+        self.stats['reports_invalidated'] += invalidated
+        return invalidated
+
+
+# Global side effect writer instance
+side_effect_writer = SideEffectWriter.from_settings()
+
+# Don't lose queued writes on a clean shutdown
+atexit.register(side_effect_writer.flush)
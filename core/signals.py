@@ -2,8 +2,33 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from .models import (
-    CustomUser, Attendance, Leave, Document, Notification, AttendanceLog
+    CustomUser, Attendance, Leave, Document, Office
 )
+from .side_effects import side_effect_writer
+from .attendance_audit import audit_values, created_values, loaded_values, diff_values, remember_state
+
+
+# Registered before create_attendance_log, which resets the loaded state
+@receiver(post_save, sender=Attendance)
+def refresh_attendance_summary(sender, instance, created, **kwargs):
+    """Queue a refresh of the daily and monthly summaries covering the row"""
+    previous_values = getattr(instance, '_loaded_values', None) or {}
+    if not created and previous_values and all(
+        previous_values.get(field) == getattr(instance, field) for field in ('date', 'status', 'total_hours')
+    ):
+        return
+    
+    office_id = instance.office_id
+    keys = {(office_id, instance.user_id, instance.date)}
+    if previous_values.get('date'):
+        keys.add((office_id, instance.user_id, previous_values['date']))
+    side_effect_writer.enqueue_summary_refresh(keys)
+
+
+@receiver(post_delete, sender=Attendance)
+def refresh_attendance_summary_on_delete(sender, instance, **kwargs):
+    """Queue a refresh of the daily and monthly summaries after a row is deleted"""
+    side_effect_writer.enqueue_summary_refresh({(instance.office_id, instance.user_id, instance.date)})
 
 
 @receiver(post_save, sender=Attendance)
@@ -12,34 +37,23 @@ def create_attendance_log(sender, instance, created, **kwargs):
     if created:
         action = 'created'
         old_values = None
-        new_values = {
-            'user': instance.user.get_full_name(),
-            'date': instance.date.isoformat(),
-            'status': instance.status,
-            'check_in_time': instance.check_in_time.isoformat() if instance.check_in_time else None,
-            'check_out_time': instance.check_out_time.isoformat() if instance.check_out_time else None,
-        }
+        new_values = created_values(instance)
     else:
         action = 'updated'
-        old_values = {
-            'user': instance.user.get_full_name(),
-            'date': instance.date.isoformat(),
-            'status': instance.status,
-            'check_in_time': instance.check_in_time.isoformat() if instance.check_in_time else None,
-            'check_out_time': instance.check_out_time.isoformat() if instance.check_out_time else None,
-        }
-        new_values = old_values.copy()
+        previous_values = loaded_values(instance)
+        if previous_values is None:
+            # Saved without being loaded first: the previous state is unknown
+            old_values, new_values = None, audit_values(instance)
+        else:
+            old_values, new_values = diff_values(previous_values, audit_values(instance))
+            if not new_values:
+                return
     
     # Get the user who made the change (for now, assume it's the attendance user)
-    changed_by = instance.user
+    changed_by_id = instance.user_id
     
-    AttendanceLog.objects.create(
-        attendance=instance,
-        action=action,
-        old_values=old_values,
-        new_values=new_values,
-        changed_by=changed_by
-    )
+    side_effect_writer.enqueue_attendance_log(instance.pk, action, old_values, new_values, changed_by_id)
+    remember_state(instance)
 
 
 @receiver(post_save, sender=Leave)
@@ -47,20 +61,13 @@ def create_leave_notification(sender, instance, created, **kwargs):
     """Create notifications for leave requests"""
     if created:
         # Notify manager about new leave request
-        if instance.user.office and instance.user.office:
-            managers = CustomUser.objects.filter(
-                office=instance.user.office,
-                role='manager',
-                is_active=True
+        if instance.user.office_id:
+            side_effect_writer.enqueue_office_notification(
+                instance.user.office_id,
+                title=f"New Leave Request - {instance.user.get_full_name()}",
+                message=f"{instance.user.get_full_name()} has requested {instance.total_days} days of {instance.leave_type} from {instance.start_date} to {instance.end_date}.",
+                notification_type='leave'
             )
-            
-            for manager in managers:
-                Notification.objects.create(
-                    user=manager,
-                    title=f"New Leave Request - {instance.user.get_full_name()}",
-                    message=f"{instance.user.get_full_name()} has requested {instance.total_days} days of {instance.leave_type} from {instance.start_date} to {instance.end_date}.",
-                    notification_type='leave'
-                )
     
     elif instance.status in ['approved', 'rejected'] and instance.approved_by:
         # Notify employee about leave approval/rejection
@@ -70,8 +77,8 @@ def create_leave_notification(sender, instance, created, **kwargs):
         if instance.status == 'rejected' and instance.rejection_reason:
             message += f" Reason: {instance.rejection_reason}"
         
-        Notification.objects.create(
-            user=instance.user,
+        side_effect_writer.enqueue_notification(
+            instance.user_id,
             title=f"Leave Request {instance.status.title()}",
             message=message,
             notification_type='leave'
@@ -83,8 +90,8 @@ def create_document_notification(sender, instance, created, **kwargs):
     """Create notifications for document uploads"""
     if created:
         # Notify user about document upload
-        Notification.objects.create(
-            user=instance.user,
+        side_effect_writer.enqueue_notification(
+            instance.user_id,
             title=f"Document Uploaded - {instance.title}",
             message=f"Your document '{instance.title}' has been successfully uploaded.",
             notification_type='document'
@@ -95,30 +102,73 @@ def create_document_notification(sender, instance, created, **kwargs):
 def create_welcome_notification(sender, instance, created, **kwargs):
     """Create welcome notification for new users"""
     if created:
-        Notification.objects.create(
-            user=instance,
+        side_effect_writer.enqueue_notification(
+            instance.pk,
             title="Welcome to Attendance System",
             message=f"Welcome {instance.get_full_name()}! Your account has been created successfully. You can now access the system.",
             notification_type='system'
         )
 
 
+@receiver(post_save, sender=CustomUser)
+def sync_user_office(sender, instance, created, update_fields=None, **kwargs):
+    """Move a user's attendance, leave and document rows along when their office changes"""
+    previous_office_id = getattr(instance, '_loaded_office_id', instance.office_id)
+    if created or previous_office_id == instance.office_id:
+        return
+    if update_fields is not None and 'office' not in update_fields:
+        return
+    
+    for model in (Attendance, Leave, Document):
+        model.objects.filter(user=instance).update(office_id=instance.office_id)
+    
+    # Both offices' daily summaries change for every day the user has attendance
+    days = Attendance.objects.filter(user=instance).values_list('date', flat=True)
+    side_effect_writer.enqueue_summary_refresh(
+        {(office_id, instance.pk, day) for day in days for office_id in (previous_office_id, instance.office_id)}
+    )
+    instance._loaded_office_id = instance.office_id
+
+
 @receiver(post_save, sender=Attendance)
 def create_attendance_notification(sender, instance, created, **kwargs):
     """Create notifications for attendance records"""
     if created and instance.status == 'absent':
         # Notify manager about absent employee
-        if instance.user.office:
-            managers = CustomUser.objects.filter(
-                office=instance.user.office,
-                role='manager',
-                is_active=True
+        if instance.user.office_id:
+            side_effect_writer.enqueue_office_notification(
+                instance.user.office_id,
+                title=f"Employee Absent - {instance.user.get_full_name()}",
+                message=f"{instance.user.get_full_name()} was absent on {instance.date}.",
+                notification_type='attendance'
             )
-            
-            for manager in managers:
-                Notification.objects.create(
-                    user=manager,
-                    title=f"Employee Absent - {instance.user.get_full_name()}",
-                    message=f"{instance.user.get_full_name()} was absent on {instance.date}.",
-                    notification_type='attendance'
-                )
+
+
+@receiver(post_save, sender=Leave)
+@receiver(post_delete, sender=Leave)
+def invalidate_leave_reports(sender, instance, created=True, **kwargs):
+    """Mark stored reports that read leave data as stale"""
+    if created:
+        side_effect_writer.enqueue_report_invalidation(
+            'leave', instance.office_id, instance.user_id, instance.start_date, instance.end_date
+        )
+    else:
+        # An edit may have moved the dates, so every report of the office is affected
+        side_effect_writer.enqueue_report_invalidation('leave', instance.office_id)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_reports(sender, instance, update_fields=None, **kwargs):
+    """Mark stored reports that read user data as stale"""
+    # Logins only touch last_login; don't let every login throw away stored user reports
+    if update_fields and set(update_fields) <= {'last_login', 'last_login_ip'}:
+        return
+    side_effect_writer.enqueue_report_invalidation('user')
+
+
+@receiver(post_save, sender=Office)
+@receiver(post_delete, sender=Office)
+def invalidate_office_reports(sender, instance, **kwargs):
+    """Mark stored reports that read office data as stale"""
+    side_effect_writer.enqueue_report_invalidation('office')
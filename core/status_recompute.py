@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Attendance Status Recompute
+Re-classifies attendance status for an office and month after its working hours
+change. Check-in/check-out times are loaded as arrays and classified in one
+vectorized pass (numpy when available, plain Python otherwise); only rows whose
+status actually changes are written back, with bulk_update.
+"""
+
+import logging
+import time
+from collections import Counter
+from datetime import date
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Attendance
+from .working_hours import working_hours_resolver
+from .attendance_audit import log_value_changes
+from .side_effects import side_effect_writer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Statuses set by people rather than derived from punches
+MANUAL_STATUSES = ('leave',)
+
+
+def _epoch(value):
+    return value.timestamp() if value else float('nan')
+
+
+class AttendanceStatusRecomputeService:
+    """Batch re-classification of attendance status"""
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+
+    def classify(self, rows):
+        """Statuses for (office_id, date, check_in_time, check_out_time) rows"""
+        if not rows:
+            return []
+
+        policies = working_hours_resolver.get_many({row[0] for row in rows})
+        if not NUMPY_AVAILABLE:
+            return [policies[office_id].classify(check_in, check_out, day) for office_id, day, check_in, check_out in rows]
+
+        check_in = np.array([_epoch(row[2]) for row in rows])
+        check_out = np.array([_epoch(row[3]) for row in rows])
+        late_after = np.array([policies[row[0]].late_after(row[1]).timestamp() for row in rows])
+        half_day = np.array([policies[row[0]].half_day_threshold * 60.0 for row in rows])
+
+        # NaN comparisons are False, so missing check-outs never count as half days
+        with np.errstate(invalid='ignore'):
+            statuses = np.where(
+                np.isnan(check_in), 'absent',
+                np.where(check_in > late_after, 'late',
+                         np.where(check_out - check_in < half_day, 'half_day', 'present'))
+            )
+        return statuses.tolist()
+
+    def recompute(self, year, month, office_id=None, dry_run=False, changed_by_id=None):
+        """Re-classify one month (optionally one office) and save the changed rows
+
+        Returns a summary with the rows checked, rows changed and a count of
+        each old -> new status transition.
+        """
+        started = time.monotonic()
+        start_date = date(year, month, 1)
+        end_date = date(year + (month == 12), month % 12 + 1, 1)
+
+        queryset = Attendance.objects.filter(
+            date__gte=start_date, date__lt=end_date
+        ).exclude(status__in=MANUAL_STATUSES)
+        if office_id:
+            queryset = queryset.filter(office_id=office_id)
+
+        rows = list(queryset.values_list(
+            'id', 'office_id', 'date', 'check_in_time', 'check_out_time', 'status', 'user_id'
+        ))
+        statuses = self.classify([(row[1], row[2], row[3], row[4]) for row in rows])
+
+        changed = [
+            (row[0], row[5], new_status, row[6])
+            for row, new_status in zip(rows, statuses)
+            if row[5] != new_status
+        ]
+        transitions = Counter(f"{old} -> {new}" for _, old, new, _ in changed)
+
+        if changed and not dry_run:
+            now = timezone.now()
+            with transaction.atomic():
+                Attendance.objects.bulk_update(
+                    [Attendance(id=pk, status=new, updated_at=now) for pk, _, new, _ in changed],
+                    ['status', 'updated_at'],
+                    batch_size=self.batch_size
+                )
+                log_value_changes(
+                    [(pk, {'status': old}, {'status': new}, user_id) for pk, old, new, user_id in changed],
+                    changed_by_id=changed_by_id,
+                    batch_size=self.batch_size
+                )
+                side_effect_writer.enqueue_summary_refresh(
+                    {(row[1], row[6], row[2]) for row, new_status in zip(rows, statuses) if row[5] != new_status}
+                )
+
+        elapsed = time.monotonic() - started
+        logger.info(f"🔁 Status recompute {year}-{month:02d} office={office_id or 'all'}: "
+                    f"{len(changed)} of {len(rows)} rows {'would change' if dry_run else 'changed'} "
+                    f"in {elapsed:.2f}s")
+        return {
+            'year': year,
+            'month': month,
+            'office_id': str(office_id) if office_id else None,
+            'dry_run': dry_run,
+            'rows_checked': len(rows),
+            'rows_changed': len(changed),
+            'transitions': dict(transitions),
+            'vectorized': NUMPY_AVAILABLE,
+            'elapsed': round(elapsed, 3),
+        }
+
+
+# Global status recompute service instance
+status_recompute_service = AttendanceStatusRecomputeService()
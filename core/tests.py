@@ -1,3 +1,1260 @@
-from django.test import TestCase
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .models import (
+    CustomUser, Office, Device, Attendance, AttendanceLog, Leave, DailyOfficeSummary, MonthlyUserSummary, ReportJob,
+    PollerLease, PollerInstance, ESSLAttendanceLog, WorkingHoursSettings,
+)
+from .views import DashboardViewSet, AttendanceViewSet, LeaveViewSet
+from .daily_summary import daily_summary_service
+from .monthly_summary import monthly_summary_service
+from .essl_service import AttendanceReportService
+from .report_jobs import report_job_runner
+from .report_export import ReportExporter
+from .ids import uuid7
+from .pagination import AttendanceKeysetPagination
+from .response_cache import response_cache
+from .poller_lease import PollerLeaseManager, poller_lease
+from .poller_membership import HashRing, PollerMembership
+from .poll_scheduler import DevicePollScheduler
+from .poll_policy import AdaptivePollPolicy
+from .device_breaker import DeviceCircuitBreaker
+from .log_watermark import DeviceLogWatermark, _verified_at
+from .dedup_index import AttendanceDedupIndex, FileDedupStore
+from .ingest_service import AttendanceIngestService
+from .rollup_service import rollup_service
+from .identity_cache import UserIdentityCache
+from .working_hours import WorkingHoursResolver
+from .status_recompute import status_recompute_service
+from .side_effects import SideEffectWriter, side_effect_writer
+from .attendance_audit import build_change_log, loaded_values
+from .management.commands.auto_fetch_attendance import AutoAttendanceService
+
+
+class DashboardStatsQueryCountTests(TestCase):
+    """Pin the number of queries DashboardViewSet.stats issues per role"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.office = Office.objects.create(
+            name='Head Office', address='1 Main Road', city='Mumbai',
+            state='Maharashtra', country='India', postal_code='400001'
+        )
+        other_office = Office.objects.create(
+            name='Branch Office', address='2 Side Road', city='Pune',
+            state='Maharashtra', country='India', postal_code='411001'
+        )
+        cls.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        cls.manager = CustomUser.objects.create_user(
+            username='manager', password='pass', role='manager', office=cls.office
+        )
+        cls.employee = CustomUser.objects.create_user(
+            username='employee', password='pass', role='employee', office=cls.office
+        )
+        CustomUser.objects.create_user(
+            username='inactive', password='pass', role='employee', office=other_office, is_active=False
+        )
+
+        Device.objects.create(name='Gate', device_type='zkteco', ip_address='10.0.0.10', port=4370, office=cls.office)
+        Device.objects.create(
+            name='Back Door', device_type='zkteco', ip_address='10.0.0.11', port=4370,
+            office=other_office, is_active=False
+        )
+
+        today = timezone.now().date()
+        Attendance.objects.create(user=cls.employee, date=today, status='present')
+        Attendance.objects.create(user=cls.manager, date=today, status='late')
+        # TestCase never runs on_commit, so materialize the summary directly
+        daily_summary_service.rebuild(today, today)
+
+        Leave.objects.create(
+            user=cls.employee, leave_type='casual', start_date=today + timedelta(days=1),
+            end_date=today + timedelta(days=2), total_days=2, reason='Family', status='pending'
+        )
+        Leave.objects.create(
+            user=cls.employee, leave_type='sick', start_date=today - timedelta(days=5),
+            end_date=today - timedelta(days=4), total_days=2, reason='Fever', status='approved'
+        )
+
+    def setUp(self):
+        response_cache.cache.clear()
+
+    def _get_stats(self, user, num_queries):
+        request = APIRequestFactory().get('/api/dashboard/stats/')
+        force_authenticate(request, user=user)
+        view = DashboardViewSet.as_view({'get': 'stats'})
+        with self.assertNumQueries(num_queries):
+            response = view(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_admin_stats_queries(self):
+        stats = self._get_stats(self.admin, 5)
+        self.assertEqual(stats['total_employees'], 2)
+        self.assertEqual(stats['total_managers'], 1)
+        self.assertEqual(stats['total_offices'], 2)
+        self.assertEqual(stats['total_devices'], 2)
+        self.assertEqual(stats['active_devices'], 1)
+        self.assertEqual(stats['today_attendance'], 1)
+        self.assertEqual(stats['total_today_records'], 2)
+        self.assertEqual(stats['attendance_rate'], 50.0)
+        self.assertEqual(stats['pending_leaves'], 1)
+        self.assertEqual(stats['approved_leaves'], 1)
+        self.assertEqual(stats['total_users'], 4)
+        self.assertEqual(stats['active_users'], 3)
+
+    def test_manager_stats_queries(self):
+        stats = self._get_stats(self.manager, 4)
+        self.assertEqual(stats['total_employees'], 1)
+        self.assertEqual(stats['total_devices'], 1)
+        self.assertEqual(stats['active_devices'], 1)
+        self.assertEqual(stats['total_today_records'], 2)
+        self.assertEqual(stats['total_leaves'], 2)
+        self.assertEqual(stats['total_users'], 2)
+
+    def test_employee_stats_queries(self):
+        stats = self._get_stats(self.employee, 2)
+        self.assertEqual(stats['today_attendance'], 1)
+        self.assertEqual(stats['pending_leaves'], 1)
+        self.assertEqual(stats['approved_leaves'], 1)
+        self.assertEqual(stats['leave_approval_rate'], 50.0)
+
+    def test_stats_follow_an_attendance_change(self):
+        newcomer = CustomUser.objects.create_user(username='newcomer', password='pass', role='employee',
+                                                  office=self.office)
+        with mock.patch.object(side_effect_writer, 'asynchronous', False), \
+                self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(user=newcomer, date=timezone.now().date(), status='present')
+        response_cache.cache.clear()
+
+        stats = self._get_stats(self.admin, 5)
+        self.assertEqual(stats['today_attendance'], 2)
+        self.assertEqual(stats['total_today_records'], 3)
+
+    def test_today_statistics_match_its_rows(self):
+        # No office and no summary refresh: still counted with the rows returned
+        drifter = CustomUser.objects.create_user(username='drifter', password='pass', role='employee')
+        Attendance.objects.create(user=drifter, date=timezone.now().date(), status='absent')
+
+        request = APIRequestFactory().get('/api/attendance/today/')
+        force_authenticate(request, user=self.admin)
+        response = AttendanceViewSet.as_view({'get': 'today'})(request)
+        statistics = response.data['statistics']
+        self.assertEqual(statistics['total_records'], len(response.data['attendance_records']))
+        self.assertEqual(
+            (statistics['total_records'], statistics['present_records'], statistics['absent_records'],
+             statistics['late_records']),
+            (3, 1, 1, 1)
+        )
+
+
+class DailySummaryRefreshTests(TestCase):
+    """Refreshing a key follows attendance edits on every database backend"""
+
+    def setUp(self):
+        self.office = Office.objects.create(name='Summary Office')
+        self.users = [
+            CustomUser.objects.create_user(username=f'summary{n}', password='pass', role='employee', office=self.office)
+            for n in range(2)
+        ]
+        self.day = date(2026, 10, 12)
+        self.key = (self.office.id, self.day)
+
+    def _counts(self):
+        summary = DailyOfficeSummary.objects.filter(office=self.office, date=self.day).first()
+        return summary and (summary.present_count, summary.late_count, summary.total_records)
+
+    def _edit_and_refresh(self):
+        first = Attendance.objects.create(user=self.users[0], date=self.day, status='present')
+        daily_summary_service.refresh([self.key])
+        self.assertEqual(self._counts(), (1, 0, 1))
+
+        Attendance.objects.create(user=self.users[1], date=self.day, status='late')
+        first.status = 'late'
+        first.save()
+        daily_summary_service.refresh([self.key])
+        self.assertEqual(self._counts(), (0, 2, 2))
+        self.assertEqual(DailyOfficeSummary.objects.count(), 1)
+
+        Attendance.objects.filter(office=self.office).delete()
+        daily_summary_service.refresh([self.key])
+        self.assertIsNone(self._counts())
+
+    def test_refresh_follows_edits(self):
+        self._edit_and_refresh()
+
+    def test_refresh_without_conflict_target(self):
+        # MySQL has no ON CONFLICT (...) target; without any upsert syntax rows are selected and updated
+        with mock.patch.multiple(connection.features, supports_update_conflicts_with_target=False,
+                                 supports_update_conflicts=False):
+            self._edit_and_refresh()
+
+    def test_mysql_upsert_has_no_conflict_target(self):
+        Attendance.objects.create(user=self.users[0], date=self.day, status='present')
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(DailyOfficeSummary.objects, 'bulk_create') as bulk_create:
+            daily_summary_service.refresh([self.key])
+        kwargs = bulk_create.call_args.kwargs
+        self.assertTrue(kwargs['update_conflicts'])
+        self.assertNotIn('unique_fields', kwargs)
+
+
+class MonthlyAttendanceReportTests(TestCase):
+    """The monthly report is served from MonthlyUserSummary in one query"""
+
+    @classmethod
+    def setUpTestData(cls):
+        office = Office.objects.create(
+            name='Head Office', address='1 Main Road', city='Mumbai',
+            state='Maharashtra', country='India', postal_code='400001'
+        )
+        cls.employee = CustomUser.objects.create_user(
+            username='employee', password='pass', role='employee', office=office,
+            first_name='Asha', last_name='Rao'
+        )
+        CustomUser.objects.create_user(username='idle', password='pass', role='employee', office=office)
+        Attendance.objects.create(user=cls.employee, date=date(2026, 2, 2), status='present', total_hours=Decimal('9.00'))
+        Attendance.objects.create(user=cls.employee, date=date(2026, 2, 3), status='late', total_hours=Decimal('7.50'))
+        Attendance.objects.create(user=cls.employee, date=date(2026, 3, 1), status='present', total_hours=Decimal('9.00'))
+        # TestCase never runs on_commit, so materialize the summary directly
+        monthly_summary_service.rebuild(2026, 2)
+
+    def test_report_single_query(self):
+        with self.assertNumQueries(1):
+            report = AttendanceReportService.get_monthly_attendance_report(year=2026, month=2)
+
+        rows = {row['user_id']: row for row in report['report_data']}
+        self.assertEqual(report['total_employees'], 2)
+        row = rows[self.employee.id]
+        self.assertEqual(row['user_name'], 'Asha Rao')
+        self.assertEqual(row['present_days'], 1)
+        self.assertEqual(row['late_days'], 1)
+        self.assertEqual(row['total_hours'], 16.5)
+        self.assertEqual(row['hours_deficit'], 9.0 * 28 - 16.5)
+        idle = next(row for user_id, row in rows.items() if user_id != self.employee.id)
+        self.assertEqual(idle['present_days'], 0)
+        self.assertEqual(idle['hours_deficit'], 9.0 * 28)
+
+    def test_verify_detects_drift(self):
+        self.assertEqual(monthly_summary_service.verify(2026, 2), [])
+        self.assertEqual(
+            [problem for _, problem, _, _ in monthly_summary_service.verify(2026, 3)], ['missing']
+        )
+        MonthlyUserSummary.objects.filter(user=self.employee).update(late_days=5)
+        self.assertEqual(
+            [problem for _, problem, _, _ in monthly_summary_service.verify(2026, 2)], ['mismatch']
+        )
+
+    def test_office_rebuild_keeps_rows_recorded_elsewhere(self):
+        branch = Office.objects.create(name='Branch Office', address='2 Side Road')
+        Attendance.objects.create(user=self.employee, office=branch, date=date(2026, 2, 4), status='present')
+        monthly_summary_service.refresh([(self.employee.id, date(2026, 2, 4))])
+
+        monthly_summary_service.rebuild(2026, 2, office_id=self.employee.office_id)
+        self.assertEqual(MonthlyUserSummary.objects.get(user=self.employee, month=date(2026, 2, 1)).total_records, 3)
+        self.assertEqual(monthly_summary_service.verify(2026, 2, office_id=self.employee.office_id), [])
+
+    def test_rebuild_without_conflict_target(self):
+        with mock.patch.multiple(connection.features, supports_update_conflicts_with_target=False,
+                                 supports_update_conflicts=False):
+            Attendance.objects.create(user=self.employee, date=date(2026, 2, 5), status='absent')
+            monthly_summary_service.refresh([(self.employee.id, date(2026, 2, 5))])
+            monthly_summary_service.rebuild(2026, 2)
+        summary = MonthlyUserSummary.objects.get(user=self.employee, month=date(2026, 2, 1))
+        self.assertEqual((summary.absent_days, summary.total_records), (1, 3))
+        self.assertEqual(monthly_summary_service.verify(2026, 2), [])
+
+
+class ReportJobSubmitTests(TestCase):
+    """Identical report submissions share one job until its data goes stale"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+
+    def test_identical_params_reuse_job(self):
+        job, created = report_job_runner.submit(
+            'attendance', {'start_date': '2026-01-01', 'end_date': '2026-01-31', 'page': '3'}, self.admin
+        )
+        self.assertTrue(created)
+        self.assertEqual(job.params, {'start_date': '2026-01-01', 'end_date': '2026-01-31'})
+
+        same, created = report_job_runner.submit(
+            'attendance', {'end_date': '2026-01-31', 'start_date': '2026-01-01'}, self.admin
+        )
+        self.assertFalse(created)
+        self.assertEqual(same.id, job.id)
+
+        _, created = report_job_runner.submit('attendance', {'start_date': '2026-02-01'}, self.admin)
+        self.assertTrue(created)
+
+    def test_is_affected_by_matches_office_and_dates(self):
+        job = ReportJob(report_type='attendance', params={'office': '7', 'start_date': '2026-01-01',
+                                                           'end_date': '2026-01-31'})
+        self.assertTrue(job.is_affected_by())
+        self.assertTrue(job.is_affected_by(7, None, date(2026, 1, 31), date(2026, 2, 2)))
+        self.assertFalse(job.is_affected_by(8, None, date(2026, 1, 10), date(2026, 1, 10)))
+        self.assertFalse(job.is_affected_by(7, None, date(2026, 2, 1), date(2026, 2, 1)))
+
+        monthly = ReportJob(report_type='monthly_attendance', params={'year': '2026', 'month': '12'})
+        self.assertTrue(monthly.is_affected_by(None, None, date(2026, 12, 31), date(2026, 12, 31)))
+        self.assertFalse(monthly.is_affected_by(None, None, date(2027, 1, 1), date(2027, 1, 1)))
+
+    def test_stale_job_is_not_reused(self):
+        job, _ = report_job_runner.submit('leave', {}, self.admin)
+        ReportJob.objects.filter(id=job.id).update(is_stale=True)
+        fresh, created = report_job_runner.submit('leave', {}, self.admin)
+        self.assertTrue(created)
+        self.assertNotEqual(fresh.id, job.id)
+
+
+class ReportJobRetentionTests(TestCase):
+    """Replaced and expired report jobs take their result files with them"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+
+    def _completed_job(self):
+        job, _ = report_job_runner.submit('leave', {}, self.admin)
+        report_job_runner.run(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertTrue(job.result_file.storage.exists(job.result_file.name))
+        return job
+
+    def test_replaced_job_is_deleted_with_its_file(self):
+        job = self._completed_job()
+        ReportJob.objects.filter(id=job.id).update(is_stale=True)
+
+        fresh, created = report_job_runner.submit('leave', {}, self.admin)
+        self.assertTrue(created)
+        self.assertEqual(list(ReportJob.objects.values_list('id', flat=True)), [fresh.id])
+        self.assertFalse(job.result_file.storage.exists(job.result_file.name))
+
+    def test_purge_expired(self):
+        job = self._completed_job()
+        self.assertEqual(report_job_runner.purge_expired(), 0)
+
+        later = job.completed_at + timedelta(seconds=report_job_runner.result_retention + 1)
+        self.assertEqual(report_job_runner.purge_expired(now=later), 1)
+        self.assertFalse(ReportJob.objects.exists())
+        self.assertFalse(job.result_file.storage.exists(job.result_file.name))
+
+
+class ReportExportTests(TestCase):
+    """Keyset-chunked exports return every row exactly once, in key order"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [CustomUser.objects.create_user(username=f'employee{i}', password='pass') for i in range(3)]
+        for day in (1, 1, 2, 3):
+            for user in users:
+                Attendance.objects.get_or_create(user=user, date=date(2026, 4, day), defaults={'status': 'present'})
+
+    def test_small_chunks_match_single_query(self):
+        expected = list(ReportExporter(chunk_size=1000).rows('attendance', {}))
+        self.assertEqual(len(expected), 9)
+        with self.assertNumQueries(5):
+            chunked = list(ReportExporter(chunk_size=2).rows('attendance', {}))
+        self.assertEqual(chunked, expected)
+
+    def test_csv_stream_has_header_and_rows(self):
+        lines = ''.join(ReportExporter(chunk_size=4).stream_csv('attendance', {'start_date': '2026-04-02'})).splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'date', 'check_in_time'])
+        self.assertEqual(len(lines), 1 + 6)
+
+
+class AttendanceListPaginationTests(TestCase):
+    """The attendance list pages on (date, id) and honours ?fields= / ?expand="""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        users = [CustomUser.objects.create_user(username=f'employee{i}', password='pass') for i in range(3)]
+        for day in (1, 2):
+            for user in users:
+                Attendance.objects.create(user=user, date=date(2026, 5, day), status='present')
+
+    def _list(self, params):
+        request = APIRequestFactory().get('/api/attendance/', params)
+        force_authenticate(request, user=self.admin)
+        response = AttendanceViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cursor_walks_every_row_once(self):
+        seen = []
+        params = {'limit': 4}
+        while True:
+            data = self._list(params)
+            seen.extend((row['date'], row['id']) for row in data['results'])
+            if not data['next']:
+                break
+            params['cursor'] = parse_qs(urlparse(data['next']).query)['cursor'][0]
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_cursor_with_wrong_typed_values_is_not_found(self):
+        for key in (['abc', 'x'], ['2026-05-01', 'not-a-uuid']):
+            cursor = AttendanceKeysetPagination().encode_cursor(key)
+            request = APIRequestFactory().get('/api/attendance/', {'cursor': cursor})
+            force_authenticate(request, user=self.admin)
+            response = AttendanceViewSet.as_view({'get': 'list'})(request)
+            self.assertEqual(response.status_code, 404)
+
+    def test_sparse_fields_and_expand(self):
+        row = self._list({'fields': 'id,status'})['results'][0]
+        self.assertEqual(set(row), {'id', 'status'})
+        row = self._list({'fields': 'id', 'expand': 'user'})['results'][0]
+        self.assertEqual(set(row), {'id', 'user'})
+        self.assertIn('username', row['user'])
+        self.assertNotIn('account_number', row['user'])
+
+    def test_my_keeps_page_number_pagination(self):
+        employee = CustomUser.objects.get(username='employee0')
+        request = APIRequestFactory().get('/api/attendance/my/')
+        force_authenticate(request, user=employee)
+        response = AttendanceViewSet.as_view({'get': 'my'})(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'count', 'next', 'previous', 'results'})
+        self.assertEqual(response.data['count'], 2)
+
+
+class DenormalizedOfficeTests(TestCase):
+    """Attendance and leave carry their user's office and follow office changes"""
+
+    def test_rows_follow_user_office(self):
+        head = Office.objects.create(name='Head Office', address='1 Main Road')
+        branch = Office.objects.create(name='Branch Office', address='2 Side Road')
+        user = CustomUser.objects.create_user(username='mover', password='pass', office=head)
+        attendance = Attendance.objects.create(user=user, date=date(2026, 5, 1), status='present')
+        leave = Leave.objects.create(
+            user=user, leave_type='casual', start_date=date(2026, 5, 4), end_date=date(2026, 5, 4),
+            total_days=1, reason='Errand'
+        )
+        self.assertEqual((attendance.office_id, leave.office_id), (head.id, head.id))
+
+        user = CustomUser.objects.get(id=user.id)
+        user.office = branch
+        user.save()
+        self.assertEqual(Attendance.objects.get(id=attendance.id).office_id, branch.id)
+        self.assertEqual(Leave.objects.get(id=leave.id).office_id, branch.id)
+
+    def test_user_created_in_process_moves_without_reload(self):
+        head = Office.objects.create(name='Head Office', address='1 Main Road')
+        branch = Office.objects.create(name='Branch Office', address='2 Side Road')
+        user = CustomUser.objects.create_user(username='newhire', password='pass', office=head)
+        attendance = Attendance.objects.create(user=user, date=date(2026, 5, 1), status='present')
+
+        user.office = branch
+        user.save()
+        self.assertEqual(Attendance.objects.get(id=attendance.id).office_id, branch.id)
+        user.office = head
+        user.save(update_fields=['office'])
+        self.assertEqual(Attendance.objects.get(id=attendance.id).office_id, head.id)
+
+
+class TimeOrderedIdTests(TestCase):
+    """High-insert tables get UUIDv7 keys that sort in creation order"""
+
+    def test_uuid7_is_monotonic(self):
+        ids = [uuid7() for _ in range(5000)]
+        self.assertTrue(all(value.version == 7 for value in ids))
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual([value.hex for value in ids], sorted(value.hex for value in ids))
+
+    def test_attendance_gets_uuid7(self):
+        user = CustomUser.objects.create_user(username='employee', password='pass')
+        attendance = Attendance.objects.create(user=user, date=date(2026, 5, 1), status='present')
+        self.assertEqual(attendance.id.version, 7)
+
+
+class LeaveListProjectionTests(TestCase):
+    """The leave list joins users once and leaves their detail columns deferred"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        for i in range(5):
+            user = CustomUser.objects.create_user(username=f'employee{i}', password='pass', first_name=f'Employee{i}')
+            Leave.objects.create(
+                user=user, leave_type='casual', start_date=date(2026, 5, 4), end_date=date(2026, 5, 4),
+                total_days=1, reason='Errand', status='approved', approved_by=cls.admin
+            )
+
+    def test_list_query_count_is_flat(self):
+        request = APIRequestFactory().get('/api/leaves/')
+        force_authenticate(request, user=self.admin)
+        # Page count plus one joined page query, no per-row user lookups
+        with self.assertNumQueries(2):
+            response = LeaveViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results']
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(all(row['user_name'].startswith('Employee') for row in rows))
+
+
+class ResponseCacheTests(TestCase):
+    """Cached dashboard stats are scoped per office and dropped when their data changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.office = Office.objects.create(name='Head Office', address='1 Main Road')
+        cls.other_office = Office.objects.create(name='Branch Office', address='2 Side Road')
+        cls.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        cls.manager = CustomUser.objects.create_user(
+            username='manager', password='pass', role='manager', office=cls.office
+        )
+        cls.employee = CustomUser.objects.create_user(username='employee', password='pass', office=cls.office)
+        cls.other_employee = CustomUser.objects.create_user(username='other', password='pass', office=cls.other_office)
+
+    def setUp(self):
+        response_cache.cache.clear()
+
+    def _get_stats(self, user):
+        request = APIRequestFactory().get('/api/dashboard/stats/')
+        force_authenticate(request, user=user)
+        response = DashboardViewSet.as_view({'get': 'stats'})(request)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def _add_leave(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            Leave.objects.create(
+                user=user, leave_type='casual', start_date=date(2026, 5, 4), end_date=date(2026, 5, 4),
+                total_days=1, reason='Errand'
+            )
+
+    def test_hit_then_invalidated_by_leave(self):
+        self.assertEqual(self._get_stats(self.admin)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self._get_stats(self.admin)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['pending_leaves'], 0)
+
+        self._add_leave(self.employee)
+        response = self._get_stats(self.admin)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['pending_leaves'], 1)
+
+    def test_other_office_changes_keep_manager_entry(self):
+        self._get_stats(self.manager)
+        self._add_leave(self.other_employee)
+        self.assertEqual(self._get_stats(self.manager)['X-Cache'], 'HIT')
+        self._add_leave(self.employee)
+        self.assertEqual(self._get_stats(self.manager)['X-Cache'], 'MISS')
+
+    def test_employees_get_their_own_entries(self):
+        self._get_stats(self.employee)
+        colleague = CustomUser.objects.create_user(username='colleague', password='pass', office=self.office)
+        self.assertEqual(self._get_stats(colleague)['X-Cache'], 'MISS')
+
+
+class PollerLeaseTests(TestCase):
+    """Only one process holds the poller lease; an expired or released lease fails over"""
+
+    def setUp(self):
+        self.first = PollerLeaseManager(name='test-poller', ttl=30)
+        self.second = PollerLeaseManager(name='test-poller', ttl=30)
+        # Both managers live in this process but draw their own holder tokens
+
+    def test_single_holder_and_failover(self):
+        self.assertTrue(self.first.try_acquire())
+        self.assertFalse(self.second.try_acquire())
+        self.assertTrue(self.first.renew())
+
+        # The first holder stops heartbeating and its lease runs out
+        PollerLease.objects.filter(name='test-poller').update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(self.second.try_acquire())
+        self.assertFalse(self.first.renew())
+        lease = PollerLease.objects.get(name='test-poller')
+        self.assertEqual(lease.holder, self.second.holder)
+        self.assertEqual(lease.term, 2)
+
+    def test_release_hands_over_immediately(self):
+        self.first.try_acquire()
+        self.first.release()
+        self.assertTrue(self.second.try_acquire())
+
+    def test_elector_starts_and_stops_service(self):
+        events = []
+        self.first._on_acquire = lambda: events.append('start')
+        self.first._on_release = lambda: events.append('stop')
+        self.first._tick()
+        self.assertTrue(self.first.is_leader)
+        PollerLease.objects.filter(name='test-poller').update(holder=self.second.holder)
+        self.first._tick()
+        self.assertFalse(self.first.is_leader)
+        self.assertEqual(events, ['start', 'stop'])
+
+    def test_failed_start_gives_the_lease_up(self):
+        events = []
+
+        def failing_start():
+            events.append('start')
+            raise RuntimeError('database unavailable')
+        self.first._on_acquire = failing_start
+        self.first._on_release = lambda: events.append('stop')
+        self.first._tick()
+
+        self.assertFalse(self.first.is_leader)
+        self.assertEqual(events, ['start', 'stop'])
+        self.assertTrue(self.second.try_acquire())
+
+    def test_restart_waits_for_the_previous_loop(self):
+        service = AutoAttendanceService(max_workers=1)
+        # The previous loop is still in its cycle after stop() gave up waiting for it
+        previous = service.thread = threading.Thread(target=time.sleep, args=(0.5,))
+        previous.start()
+        with mock.patch.object(service, '_refresh_devices'), mock.patch.object(service, '_run_service'):
+            service.start()
+        self.assertFalse(previous.is_alive())
+        self.assertIsNot(service.thread, previous)
+        service.running = False
+
+
+class PollerShardingTests(TestCase):
+    """Devices are split across live poller instances by consistent hashing"""
+
+    def test_ring_spreads_and_moves_only_to_new_member(self):
+        devices = [uuid7() for _ in range(1200)]
+        ring = HashRing(['a', 'b', 'c'])
+        before = {device: ring.owner(device) for device in devices}
+        for member in ('a', 'b', 'c'):
+            self.assertAlmostEqual(list(before.values()).count(member) / len(devices), 1 / 3, delta=0.08)
+
+        grown = HashRing(['a', 'b', 'c', 'd'])
+        moved = [device for device in devices if grown.owner(device) != before[device]]
+        self.assertTrue(all(grown.owner(device) == 'd' for device in moved))
+        self.assertAlmostEqual(len(moved) / len(devices), 1 / 4, delta=0.08)
+
+    def test_each_device_has_one_owner_and_dead_instances_are_pruned(self):
+        first, second = PollerMembership(enabled=True), PollerMembership(enabled=True)
+        first.heartbeat()
+        second.heartbeat()
+        first.heartbeat()
+        devices = [uuid7() for _ in range(50)]
+        self.assertTrue(all(first.owns(device) != second.owns(device) for device in devices))
+
+        # The second instance dies; once its heartbeat is older than the TTL the first takes everything
+        PollerInstance.objects.filter(holder=second.holder).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+        first.heartbeat()
+        self.assertEqual(list(PollerInstance.objects.values_list('holder', flat=True)), [first.holder])
+        self.assertTrue(all(first.owns(device) for device in devices))
+
+
+class PollSchedulerTests(TestCase):
+    """Devices are polled every sync_interval minutes and edits apply without a restart"""
+
+    def setUp(self):
+        self.scheduler = DevicePollScheduler(retry_interval=60)
+        self.fast = Device(id=uuid7(), name='Fast', sync_interval=2)
+        self.slow = Device(id=uuid7(), name='Slow', sync_interval=10)
+
+    def test_never_synced_devices_are_due_and_next_poll_follows_interval(self):
+        self.assertEqual(self.scheduler.sync([self.fast, self.slow]), (2, 0, 0))
+        self.assertEqual({device.name for device in self.scheduler.pop_due()}, {'Fast', 'Slow'})
+        # In flight until complete(), so not handed out twice
+        self.assertEqual(self.scheduler.pop_due(), [])
+        self.assertIsNone(self.scheduler.seconds_until_next())
+
+        self.scheduler.complete(self.fast.id)
+        self.scheduler.complete(self.slow.id)
+        self.assertAlmostEqual(self.scheduler.seconds_until_next(), 120, delta=1)
+
+    def test_recent_last_sync_resumes_schedule(self):
+        self.slow.last_sync = timezone.now() - timedelta(minutes=4)
+        self.scheduler.sync([self.slow])
+        self.assertEqual(self.scheduler.pop_due(), [])
+        self.assertAlmostEqual(self.scheduler.seconds_until_next(), 360, delta=1)
+
+    def test_failed_poll_retries_sooner(self):
+        self.scheduler.sync([self.slow])
+        self.scheduler.pop_due()
+        self.scheduler.complete(self.slow.id, success=False)
+        self.assertAlmostEqual(self.scheduler.seconds_until_next(), 60, delta=1)
+
+    def test_edited_and_removed_devices(self):
+        self.scheduler.sync([self.fast, self.slow])
+        self.scheduler.pop_due()
+        self.scheduler.complete(self.fast.id)
+        self.scheduler.complete(self.slow.id)
+
+        edited = Device(id=self.slow.id, name='Slow', sync_interval=1)
+        self.assertEqual(self.scheduler.sync([self.fast, edited]), (0, 0, 1))
+        self.assertAlmostEqual(self.scheduler.seconds_until_next(), 60, delta=1)
+
+        # Dropping the device orphans its entry, also when it is added back
+        self.assertEqual(self.scheduler.sync([self.fast]), (0, 1, 0))
+        self.assertAlmostEqual(self.scheduler.seconds_until_next(), 120, delta=1)
+        self.scheduler.sync([self.fast, self.slow])
+        self.assertEqual([device.name for device in self.scheduler.pop_due()], ['Slow'])
+        self.assertEqual(len(self.scheduler), 2)
+
+
+class AdaptivePollPolicyTests(TestCase):
+    """Fast polls while punches arrive, backing off to the freshness SLO when idle"""
+
+    def setUp(self):
+        self.policy = AdaptivePollPolicy(enabled=True, fast_interval=30, freshness_slo=900)
+
+    def at(self, day, hour, minute=0):
+        # 2026-10-12 is a Monday
+        return timezone.make_aware(datetime(2026, 10, day, hour, minute))
+
+    def test_active_window_and_new_punches_poll_fast(self):
+        self.assertEqual(self.policy.next_interval('d', 0, 300, when=self.at(12, 8, 45), now=0), 30)
+        self.assertEqual(self.policy.next_interval('d', 3, 300, when=self.at(17, 3), now=60), 30)
+
+    def test_idle_device_backs_off_within_slo(self):
+        # Working hours: capped by the device's own sync interval
+        self.assertEqual(self.policy.next_interval('d', 0, 300, when=self.at(12, 11), now=0), 300)
+        # Saturday night: up to the freshness SLO
+        self.assertEqual(self.policy.next_interval('d', 0, 300, when=self.at(17, 2), now=600), 900)
+
+    def test_wakes_for_the_next_window(self):
+        self.assertEqual(self.policy.next_interval('d', 0, 3600, when=self.at(12, 8, 25), now=0), 300)
+        self.assertEqual(self.policy.next_interval('d', 0, 3600, when=self.at(12, 8, 29), now=0), 60)
+
+    def test_punch_rate_shortens_idle_interval(self):
+        self.policy.observe('d', 0, now=0)
+        for step in range(1, 11):
+            self.policy.observe('d', 10, now=step * 300)
+        # About two punches a minute, so the next idle poll comes well before the SLO
+        self.assertLess(self.policy.next_interval('d', 0, 900, when=self.at(17, 2), now=3060), 60)
+
+    def test_disabled_policy_keeps_sync_interval(self):
+        scheduler = DevicePollScheduler(policy=AdaptivePollPolicy(enabled=False))
+        device = Device(id=uuid7(), name='Fixed', sync_interval=3)
+        scheduler.sync([device])
+        scheduler.pop_due()
+        scheduler.complete(device.id, new_records=5)
+        self.assertAlmostEqual(scheduler.seconds_until_next(), 180, delta=1)
+
+
+class DeviceCircuitBreakerTests(TestCase):
+    """Unreachable devices are skipped with growing backoff and their status is recorded"""
+
+    def setUp(self):
+        self.office = Office.objects.create(name='Breaker Office')
+        self.device = Device.objects.create(
+            name='Gate', device_type='zkteco', ip_address='127.0.0.1', port=4370, office=self.office
+        )
+        self.breaker = DeviceCircuitBreaker(failure_threshold=2, base_backoff=30, max_backoff=100)
+
+    def fail(self):
+        self.breaker.record_failure('127.0.0.1', 4370, 'timed out')
+
+    def test_opens_after_threshold_and_backs_off(self):
+        self.fail()
+        self.assertTrue(self.breaker.allow('127.0.0.1', 4370))
+        self.fail()
+        self.assertFalse(self.breaker.allow('127.0.0.1', 4370))
+        self.assertTrue(15 <= self.breaker.retry_in('127.0.0.1', 4370) <= 30)
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.device_status, 'error')
+
+        # Backoff over: one half-open trial, whose failure doubles the backoff
+        self.breaker._circuits['127.0.0.1:4370']['retry_at'] = 0
+        self.assertTrue(self.breaker.allow('127.0.0.1', 4370))
+        self.assertFalse(self.breaker.allow('127.0.0.1', 4370))
+        self.fail()
+        self.assertTrue(30 <= self.breaker.retry_in('127.0.0.1', 4370) <= 60)
+
+    def test_success_closes_and_marks_online(self):
+        self.fail()
+        self.fail()
+        self.breaker._circuits['127.0.0.1:4370']['retry_at'] = 0
+        self.breaker.allow('127.0.0.1', 4370)
+        self.breaker.record_success('127.0.0.1', 4370)
+        self.assertEqual(self.breaker.state('127.0.0.1', 4370), DeviceCircuitBreaker.CLOSED)
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.device_status, 'online')
+
+    def test_probe_failure_marks_offline(self):
+        # A port nothing listens on
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        Device.objects.filter(id=self.device.id).update(port=port)
+        self.assertFalse(self.breaker.probe('127.0.0.1', port))
+        self.breaker.record_failure('127.0.0.1', port, 'TCP probe failed')
+        self.breaker.record_failure('127.0.0.1', port, 'TCP probe failed')
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.device_status, 'offline')
+
+        with socket.socket() as server:
+            server.bind(('127.0.0.1', 0))
+            server.listen()
+            self.assertTrue(self.breaker.probe('127.0.0.1', server.getsockname()[1]))
+
+
+class FakeZKLog:
+    def __init__(self, uid, minute):
+        self.uid = uid
+        self.user_id = str(uid)
+        self.timestamp = timezone.make_aware(datetime(2026, 10, 12, 9, minute))
+
+
+class FakeZKConnection:
+    def __init__(self, logs, capacity=100):
+        self.logs = logs
+        self.rec_cap = capacity
+
+    def read_sizes(self):
+        self.records = len(self.logs)
+
+
+class DeviceLogWatermarkTests(TestCase):
+    """Only records past the mark are processed; cleared and wrapped logs are resynced"""
+
+    def setUp(self):
+        office = Office.objects.create(name='Watermark Office')
+        self.device = Device.objects.create(name='Door', device_type='zkteco', ip_address='10.0.0.9', office=office)
+        self.logs = [FakeZKLog(uid, uid) for uid in range(1, 4)]
+
+    def poll(self, conn):
+        """One poll as the attendance poller does it; returns the records to process or None when skipped"""
+        watermark = DeviceLogWatermark(self.device)
+        if not watermark.has_new_records(watermark.read_record_count(conn)):
+            return None
+        new_logs = watermark.filter_new(conn.logs)
+        watermark.advance()
+        return new_logs
+
+    def test_only_new_records_and_unchanged_log_is_skipped(self):
+        conn = FakeZKConnection(list(self.logs))
+        self.assertEqual(len(self.poll(conn)), 3)
+        self.assertIsNone(self.poll(conn))
+        conn.logs.append(FakeZKLog(4, 4))
+        self.assertEqual([log.uid for log in self.poll(conn)], [4])
+
+    def test_full_log_that_wraps_is_not_skipped(self):
+        conn = FakeZKConnection(list(self.logs), capacity=3)
+        self.poll(conn)
+        # The oldest record is dropped to make room: same count, new last record
+        conn.logs = self.logs[1:] + [FakeZKLog(4, 4)]
+        self.assertEqual([log.uid for log in self.poll(conn)], [4])
+        conn.logs = conn.logs[2:] + [FakeZKLog(5, 5), FakeZKLog(6, 6)]
+        self.assertEqual([log.uid for log in self.poll(conn)], [5, 6])
+
+    def test_log_wrapped_past_the_mark_is_resynced(self):
+        conn = FakeZKConnection(list(self.logs), capacity=3)
+        self.poll(conn)
+        conn.logs = [FakeZKLog(uid, uid) for uid in range(4, 7)]
+        watermark = DeviceLogWatermark(self.device)
+        self.assertEqual([log.uid for log in watermark.filter_new(conn.logs)], [4, 5, 6])
+        self.assertTrue(watermark.full_resync)
+
+    def test_cleared_then_refilled_log_is_resynced(self):
+        conn = FakeZKConnection(list(self.logs))
+        self.poll(conn)
+        conn.logs = [FakeZKLog(uid, 30 + uid) for uid in range(7, 10)]
+        # Same count: trusted only until the fingerprint is due for a check
+        self.assertIsNone(self.poll(conn))
+        _verified_at.pop(self.device.pk)
+        self.assertEqual([log.uid for log in self.poll(conn)], [7, 8, 9])
+
+    def test_cleared_log_resets_mark(self):
+        conn = FakeZKConnection(list(self.logs))
+        self.poll(conn)
+        conn.logs = []
+        self.assertEqual(self.poll(conn), [])
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.last_log_index, 0)
+        conn.logs = [FakeZKLog(5, 5)]
+        self.assertEqual([log.uid for log in self.poll(conn)], [5])
+
+
+class ConcurrentPollTests(TestCase):
+    """Devices are fetched on a bounded pool and a hung device is abandoned at its deadline"""
+
+    def test_slow_device_does_not_hold_up_the_cycle(self):
+        service = AutoAttendanceService(max_workers=3, device_timeout=0.5)
+        service.executor = ThreadPoolExecutor(max_workers=3)
+        delays = {'a': 0.2, 'b': 0.2, 'hung': 3}
+
+        def fake_fetch(device):
+            started = time.monotonic()
+            service.in_flight[device.id] = started
+            time.sleep(delays[device.id])
+            service.in_flight.pop(device.id, None)
+            return time.monotonic() - started
+        service._timed_fetch_device = fake_fetch
+
+        started = time.monotonic()
+        device_times = service._fetch_devices_concurrently([Device(id=key) for key in delays])
+        service.executor.shutdown(wait=False)
+
+        self.assertLess(time.monotonic() - started, 2.5)
+        self.assertEqual(len(device_times), 3)
+        self.assertEqual(service.stats['timeouts'], 1)
+
+    def test_waits_for_heartbeat_without_the_lease(self):
+        service = AutoAttendanceService()
+        service.running = True
+        service.scheduler.sync([Device(id='overdue', sync_interval=1)])
+        service._next_device_refresh = time.monotonic() + 3600
+        waits = []
+
+        def fake_wait(timeout):
+            waits.append(timeout)
+            service.running = len(waits) < 3
+        service._wake.wait = fake_wait
+
+        with mock.patch.object(type(poller_lease), 'is_leader', new_callable=mock.PropertyMock, return_value=False):
+            service._run_service()
+        self.assertEqual(waits, [poller_lease.heartbeat_interval] * 3)
+
+
+class AttendanceDedupIndexTests(TestCase):
+    """Processed punch keys survive a restart and stay bounded by window and size"""
+
+    def setUp(self):
+        self.state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.state_dir.cleanup)
+
+    def index(self, **kwargs):
+        return AttendanceDedupIndex(FileDedupStore(self.state_dir.name), **kwargs)
+
+    def test_keys_persist_across_instances(self):
+        now = timezone.now()
+        key = AttendanceDedupIndex.make_key('dev', '7', now, 1)
+        self.assertEqual(key, AttendanceDedupIndex.make_key('dev', '7', now, 1))
+
+        first = self.index()
+        first.add('dev', key, now)
+        first.evict_and_save('dev')
+        restarted = self.index()
+        self.assertTrue(restarted.seen('dev', key))
+        self.assertFalse(restarted.seen('other', key))
+
+    def test_window_and_size_bound_entries(self):
+        index = self.index(window_hours=1, max_entries_per_device=3)
+        index.add('dev', 1, timezone.now() - timedelta(hours=2))
+        for key in (2, 3, 4, 5):
+            index.add('dev', key, timezone.now())
+        # The size cap drops the oldest keys first
+        self.assertEqual(index.size('dev'), 3)
+        self.assertFalse(index.seen('dev', 2))
+
+        index.add('dev', 6, timezone.now() - timedelta(hours=2))
+        self.assertEqual(index.evict_and_save('dev'), 1)
+        self.assertEqual(index.size('dev'), 2)
+
+
+class AttendanceIngestTests(TestCase):
+    """Punches are bulk inserted once, and only stored rows are counted"""
+
+    def setUp(self):
+        office = Office.objects.create(name='Ingest Office')
+        self.device = Device.objects.create(name='Lobby', device_type='zkteco', ip_address='10.0.0.7', office=office)
+        self.user = CustomUser.objects.create_user(
+            username='ingest', password='pass', role='employee', office=office, biometric_id='ING-1'
+        )
+        self.punch_time = timezone.make_aware(datetime(2026, 10, 12, 9, 0))
+
+    def punches(self, *minutes):
+        return [
+            {'biometric_id': 'ING-1', 'punch_time': self.punch_time + timedelta(minutes=minute), 'punch_type': 'in'}
+            for minute in minutes
+        ]
+
+    def test_duplicates_and_unknown_users_are_not_inserted(self):
+        service = AttendanceIngestService(self.device, skip_unknown_users=True)
+        result = service.ingest(self.punches(0, 0, 5) + [{'biometric_id': 'NOBODY', 'punch_time': self.punch_time}])
+        self.assertEqual((result['inserted'], result['duplicates'], result['unknown_users']), (2, 1, 1))
+        self.assertTrue(all(log.user_id == self.user.pk for log in result['logs']))
+
+        result = service.ingest(self.punches(5, 10))
+        self.assertEqual((result['inserted'], result['duplicates']), (1, 1))
+        self.assertEqual(ESSLAttendanceLog.objects.filter(device=self.device).count(), 3)
+
+    def test_punch_stored_by_a_concurrent_ingest_is_not_counted(self):
+        bulk_create = ESSLAttendanceLog.objects.bulk_create
+
+        def racing_bulk_create(logs, **kwargs):
+            # Another poller stores the first punch between the duplicate check and the insert
+            ESSLAttendanceLog.objects.create(
+                device=self.device, biometric_id='ING-1', user=self.user, punch_time=self.punch_time, punch_type='in'
+            )
+            return bulk_create(logs, **kwargs)
+
+        with mock.patch.object(ESSLAttendanceLog.objects, 'bulk_create', racing_bulk_create):
+            result = AttendanceIngestService(self.device).ingest(self.punches(0, 5))
+        self.assertEqual((result['inserted'], result['duplicates']), (1, 1))
+        self.assertEqual([log.punch_time for log in result['logs']], [self.punch_time + timedelta(minutes=5)])
+
+    def test_poller_stores_unknown_users_and_only_marks_stored_punches_seen(self):
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        service = AutoAttendanceService()
+        service.dedup_index = AttendanceDedupIndex(FileDedupStore(state_dir.name))
+        now = timezone.now()
+        logs = [SimpleNamespace(user_id=user_id, timestamp=now, status=1, punch=0) for user_id in ('ING-1', 'NOBODY', '')]
+
+        self.assertEqual(service._process_zkteco_attendance(self.device, logs), 2)
+        self.assertIsNone(ESSLAttendanceLog.objects.get(device=self.device, biometric_id='NOBODY').user_id)
+        seen = [service.dedup_index.seen(self.device.id, service._create_attendance_hash(self.device.id, log))
+                for log in logs]
+        # The punch without a biometric ID was not stored, so the next poll offers it again
+        self.assertEqual(seen, [True, True, False])
+
+
+class AttendanceRollupTests(TestCase):
+    """Raw punches roll up into one attendance row per user and day"""
+
+    def setUp(self):
+        office = Office.objects.create(name='Rollup Office')
+        self.device = Device.objects.create(name='Gate', device_type='zkteco', ip_address='10.0.0.8', office=office)
+        self.user = CustomUser.objects.create_user(
+            username='rollup', password='pass', role='employee', office=office, biometric_id='ROL-1'
+        )
+        self.day = date(2026, 10, 12)
+
+    def ingest_and_rollup(self, *punches):
+        result = AttendanceIngestService(self.device).ingest(
+            {'biometric_id': 'ROL-1', 'punch_time': timezone.make_aware(datetime(2026, 10, 12, hour, minute)),
+             'punch_type': punch_type}
+            for hour, minute, punch_type in punches
+        )
+        return rollup_service.rollup(result['logs'])
+
+    def test_first_in_last_out_within_a_batch(self):
+        self.ingest_and_rollup((9, 0, 'in'), (13, 0, 'out'), (18, 0, 'out'))
+        attendance = Attendance.objects.get(user=self.user, date=self.day)
+        self.assertEqual(timezone.localtime(attendance.check_in_time).hour, 9)
+        self.assertEqual(timezone.localtime(attendance.check_out_time).hour, 18)
+        self.assertFalse(ESSLAttendanceLog.objects.filter(is_processed=False).exists())
+
+    def test_single_type_punches_in_separate_batches_get_a_check_out(self):
+        self.ingest_and_rollup((9, 0, 'in'))
+        result = self.ingest_and_rollup((18, 30, 'in'))
+        self.assertEqual((result['created'], result['updated']), (0, 1))
+
+        attendance = Attendance.objects.get(user=self.user, date=self.day)
+        self.assertEqual(timezone.localtime(attendance.check_in_time).hour, 9)
+        self.assertEqual(timezone.localtime(attendance.check_out_time).strftime('%H:%M'), '18:30')
+        self.assertEqual(attendance.total_hours, Decimal('9.50'))
+
+    def test_day_created_by_a_concurrent_rollup_is_merged(self):
+        bulk_create = Attendance.objects.bulk_create
+
+        def racing_bulk_create(rows, **kwargs):
+            # Another rollup creates the day between the row lookup and the insert
+            Attendance.objects.create(
+                user=self.user, office_id=self.user.office_id, date=self.day,
+                check_in_time=timezone.make_aware(datetime(2026, 10, 12, 8, 45))
+            )
+            return bulk_create(rows, **kwargs)
+
+        with mock.patch.object(Attendance.objects, 'bulk_create', racing_bulk_create):
+            result = self.ingest_and_rollup((9, 0, 'in'), (18, 0, 'out'))
+        self.assertEqual((result['created'], result['updated']), (0, 1))
+
+        attendance = Attendance.objects.get(user=self.user, date=self.day)
+        self.assertEqual(timezone.localtime(attendance.check_in_time).strftime('%H:%M'), '08:45')
+        self.assertEqual(timezone.localtime(attendance.check_out_time).hour, 18)
+        self.assertFalse(ESSLAttendanceLog.objects.filter(is_processed=False).exists())
+
+
+class UserIdentityCacheTests(TestCase):
+    """Device identities resolve to users with one query per miss and follow user edits"""
+
+    def setUp(self):
+        self.cache = UserIdentityCache(ttl=300, negative_ttl=60)
+        self.user = CustomUser.objects.create_user(
+            username='identity', password='pass', role='employee', biometric_id='IDC-1', employee_id='EMP-IDC-1'
+        )
+
+    def test_hits_and_negative_hits_skip_the_database(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.resolve_many(['IDC-1', 'IDC-404']), {'IDC-1': self.user.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.resolve_many([' IDC-1 ', 'IDC-404']), {'IDC-1': self.user.pk})
+        self.assertEqual(self.cache.resolve('EMP-IDC-1', 'employee_id'), self.user.pk)
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['hits'], stats['negative_hits'], stats['misses']), (1, 1, 3))
+
+    def test_changed_identity_is_invalidated(self):
+        self.cache.resolve('IDC-1')
+        self.cache.resolve('IDC-2')
+        self.user.biometric_id = 'IDC-2'
+        self.user.save()
+        self.cache.invalidate_user(self.user)
+        self.assertIsNone(self.cache.resolve('IDC-1'))
+        self.assertEqual(self.cache.resolve('IDC-2'), self.user.pk)
+
+
+class WorkingHoursResolverTests(TestCase):
+    """Office policies classify attendance from memory and pick up edits from other processes"""
+
+    def setUp(self):
+        self.office = Office.objects.create(name='Hours Office')
+        WorkingHoursSettings.objects.create(office=self.office, late_threshold=15, half_day_threshold=240)
+        self.resolver = WorkingHoursResolver(ttl=60)
+        self.day = date(2026, 10, 12)
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime(2026, 10, 12, hour, minute))
+
+    def test_classification(self):
+        policy = self.resolver.get(self.office.id)
+        self.assertEqual(policy.classify(None, None, self.day), 'absent')
+        self.assertEqual(policy.classify(self.at(9, 10), self.at(18), self.day), 'present')
+        self.assertEqual(policy.classify(self.at(9, 20), self.at(18), self.day), 'late')
+        self.assertEqual(policy.classify(self.at(9), self.at(12), self.day), 'half_day')
+        # Offices without settings get the defaults
+        self.assertEqual(self.resolver.get(None).late_threshold, 15)
+
+    def test_memoized_until_ttl_for_edits_in_another_process(self):
+        self.resolver.get(self.office.id)
+        # A queryset update sends no signal, like an edit made by a web worker
+        WorkingHoursSettings.objects.filter(office=self.office).update(late_threshold=30)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolver.get(self.office.id).late_threshold, 15)
+
+        with mock.patch('core.working_hours.monotonic', return_value=time.monotonic() + 61):
+            self.assertEqual(self.resolver.get(self.office.id).late_threshold, 30)
+
+
+class AttendanceStatusRecomputeTests(TestCase):
+    """A month's statuses follow edited working hours; manual statuses are kept"""
+
+    def setUp(self):
+        self.office = Office.objects.create(name='Recompute Office')
+        self.settings = WorkingHoursSettings.objects.create(office=self.office, late_threshold=15)
+        users = [
+            CustomUser.objects.create_user(username=f'recompute{n}', password='pass', role='employee', office=self.office)
+            for n in range(3)
+        ]
+        check_in = timezone.make_aware(datetime(2026, 10, 12, 9, 30))
+        check_out = timezone.make_aware(datetime(2026, 10, 12, 18, 0))
+        Attendance.objects.create(user=users[0], date=date(2026, 10, 12), check_in_time=check_in,
+                                  check_out_time=check_out, status='late')
+        Attendance.objects.create(user=users[1], date=date(2026, 10, 12), check_in_time=check_in,
+                                  check_out_time=check_out, status='leave')
+        # Another month is not touched
+        Attendance.objects.create(user=users[2], date=date(2026, 9, 30), check_in_time=check_in - timedelta(days=12),
+                                  check_out_time=check_out - timedelta(days=12), status='late')
+
+    def test_dry_run_then_recompute(self):
+        self.settings.late_threshold = 45
+        self.settings.save()
+
+        result = status_recompute_service.recompute(2026, 10, office_id=self.office.id, dry_run=True)
+        self.assertEqual((result['rows_checked'], result['rows_changed']), (1, 1))
+        self.assertEqual(result['transitions'], {'late -> present': 1})
+        self.assertEqual(Attendance.objects.filter(status='late').count(), 2)
+
+        status_recompute_service.recompute(2026, 10, office_id=self.office.id)
+        self.assertEqual(
+            sorted(Attendance.objects.values_list('date', 'status')),
+            [(date(2026, 9, 30), 'late'), (date(2026, 10, 12), 'leave'), (date(2026, 10, 12), 'present')]
+        )
+
+
+class SideEffectWriterTests(TestCase):
+    """Queued audit entries coalesce per row; only reports covering a change go stale"""
+
+    def setUp(self):
+        self.writer = SideEffectWriter(asynchronous=False)
+        self.office = Office.objects.create(name='Writer Office')
+        self.other_office = Office.objects.create(name='Other Writer Office')
+        self.user = CustomUser.objects.create_user(username='writer', password='pass', role='employee',
+                                                   office=self.office)
+        self.attendance = Attendance.objects.create(user=self.user, date=date(2026, 10, 12), status='present')
+
+    def _job(self, report_type, **params):
+        return ReportJob.objects.create(report_type=report_type, params=params, params_hash=str(uuid7()),
+                                        status='completed')
+
+    def test_audit_entries_for_one_row_are_coalesced(self):
+        AttendanceLog.objects.all().delete()
+        self.writer._write([
+            ('audit', self.attendance.id, 'updated', {'status': 'present'}, {'status': 'late'}, None),
+            ('audit', self.attendance.id, 'updated', {'status': 'late'}, {'status': 'half_day'}, None),
+        ])
+        log = AttendanceLog.objects.get(attendance=self.attendance)
+        self.assertEqual((log.old_values, log.new_values), ({'status': 'present'}, {'status': 'half_day'}))
+        self.assertEqual(self.writer.stats['audit_coalesced'], 1)
+
+    def test_attendance_change_only_marks_covering_reports_stale(self):
+        covering = [
+            self._job('attendance', office=str(self.office.id)),
+            self._job('attendance', start_date='2026-10-01', end_date='2026-10-31'),
+            self._job('monthly_attendance', year='2026', month='10'),
+        ]
+        untouched = [
+            self._job('attendance', office=str(self.other_office.id)),
+            self._job('attendance', start_date='2026-09-01', end_date='2026-09-30'),
+            self._job('monthly_attendance', year='2026', month='11'),
+            self._job('leave'),
+        ]
+        self.writer._write([('summary', self.office.id, self.user.pk, date(2026, 10, 12))])
+
+        stale = set(ReportJob.objects.filter(is_stale=True).values_list('id', flat=True))
+        self.assertEqual(stale, {job.id for job in covering})
+        self.assertTrue(stale.isdisjoint(job.id for job in untouched))
+
+    def test_leave_change_uses_its_date_range(self):
+        overlapping = self._job('leave', start_date='2026-10-15')
+        earlier = self._job('leave', end_date='2026-10-01')
+        self.writer._write([('report_data', 'leave', (self.office.id, self.user.pk, date(2026, 10, 14), date(2026, 10, 16)))])
+
+        self.assertTrue(ReportJob.objects.get(id=overlapping.id).is_stale)
+        self.assertFalse(ReportJob.objects.get(id=earlier.id).is_stale)
+
+    def test_failed_kind_is_retried_without_dropping_the_rest(self):
+        AttendanceLog.objects.all().delete()
+        writer = SideEffectWriter(asynchronous=False, max_retries=1)
+        writer._queue.put((('audit', self.attendance.id, 'updated', {'status': 'present'}, {'status': 'late'}, None), 0))
+        writer._queue.put((('summary', self.office.id, self.user.pk, self.attendance.date), 0))
+
+        with mock.patch.object(daily_summary_service, 'refresh', side_effect=RuntimeError('deadlock')):
+            writer.flush()
+            # The audit entry is written, the summary refresh waits for the next flush
+            self.assertEqual(AttendanceLog.objects.filter(attendance=self.attendance).count(), 1)
+            self.assertEqual(writer._queue.qsize(), 1)
+
+            with self.assertLogs('core.side_effects', 'ERROR') as logs:
+                writer.flush()
+        self.assertEqual((writer.stats['retried'], writer.stats['dropped']), (1, 1))
+        self.assertTrue(any('Dropped deferred side effect' in line for line in logs.output))
+        self.assertEqual(writer._queue.qsize(), 0)
+
+
+class AttendanceAuditTests(TestCase):
+    """The audit diff compares instants, not how their time zone was written"""
+
+    def test_same_instant_in_another_zone_is_no_change(self):
+        user = CustomUser.objects.create_user(username='audited', password='pass', role='employee')
+        check_in = datetime(2026, 10, 12, 3, 45, tzinfo=timezone.get_fixed_timezone(0))
+        Attendance.objects.create(user=user, date=date(2026, 10, 12), check_in_time=check_in, status='present')
+        attendance = Attendance.objects.get(user=user)
+        previous = loaded_values(attendance)
+
+        attendance.check_in_time = check_in.astimezone(timezone.get_fixed_timezone(330))
+        self.assertIsNone(build_change_log(attendance, previous))
+
+        attendance.check_in_time = check_in + timedelta(minutes=5)
+        log = build_change_log(attendance, previous)
+        self.assertEqual(list(log.new_values), ['check_in_time'])
@@ -8,7 +8,8 @@ from rest_framework_simplejwt.views import (
 from .views import (
     OfficeViewSet, CustomUserViewSet, DeviceViewSet, AttendanceViewSet,
     LeaveViewSet, DocumentViewSet, NotificationViewSet, SystemSettingsViewSet,
-    AttendanceLogViewSet, DashboardViewSet, ZKTecoAttendanceViewSet, ReportsViewSet
+    AttendanceLogViewSet, DashboardViewSet, ZKTecoAttendanceViewSet, ReportsViewSet,
+    ReportJobViewSet, PollerViewSet
 )
 from .essl_views import (
     ESSLDeviceViewSet, ESSLAttendanceLogViewSet, WorkingHoursSettingsViewSet,
@@ -30,6 +31,8 @@ router.register(r'attendance-logs', AttendanceLogViewSet, basename='attendance-l
 router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 router.register(r'zkteco-attendance', ZKTecoAttendanceViewSet, basename='zkteco-attendance')
 router.register(r'reports', ReportsViewSet, basename='reports')
+router.register(r'report-jobs', ReportJobViewSet, basename='report-job')
+router.register(r'poller', PollerViewSet, basename='poller')
 
 # ESSL Device Management
 router.register(r'essl-devices', ESSLDeviceViewSet, basename='essl-device')
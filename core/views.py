@@ -4,15 +4,17 @@ from rest_framework import status, filters, viewsets, permissions, serializers
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.shortcuts import get_object_or_404
+from django.http import FileResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.db.models import Sum, Count, Q
-from django.db import models
+from django.db import models, transaction
+from collections import Counter
 from datetime import datetime, timedelta
 import logging
 
 from .models import (
     CustomUser, Office, Device, Attendance, WorkingHoursSettings, 
-    ESSLAttendanceLog, Leave, Document, Notification, SystemSettings
+    ESSLAttendanceLog, Leave, Document, Notification, SystemSettings, ReportJob
 )
 from .serializers import (
     CustomUserSerializer, OfficeSerializer, DeviceSerializer, AttendanceSerializer,
@@ -21,11 +23,22 @@ from .serializers import (
     DocumentSerializer, DocumentCreateSerializer, NotificationSerializer, SystemSettingsSerializer,
     UserRegistrationSerializer, UserProfileSerializer, PasswordChangeSerializer,
     DashboardStatsSerializer, AttendanceLogSerializer, OfficeStatsSerializer,
-    UserLoginSerializer, DeviceSyncSerializer
+    UserLoginSerializer, DeviceSyncSerializer, ReportJobSerializer, ReportJobCreateSerializer,
+    AttendanceListSerializer
 )
 # Permissions are defined inline in this file
 from .zkteco_service import zkteco_service
 from .db_manager import DatabaseConnectionManager
+from .daily_summary import daily_summary_service, attendance_summary_keys
+from .attendance_audit import log_bulk_changes
+from .side_effects import side_effect_writer
+from .report_service import ReportService
+from .report_jobs import report_job_runner
+from .report_export import report_exporter, EXPORT_FORMATS, EXPORT_SPECS
+from .pagination import AttendanceKeysetPagination
+from .response_cache import response_cache
+from .poller_lease import poller_lease
+from .poller_membership import poller_membership
 
 logger = logging.getLogger(__name__)
 
@@ -58,115 +71,7 @@ class ReportsViewSet(viewsets.ViewSet):
     def attendance(self, request):
         """Generate attendance report with filters"""
         try:
-            # Get query parameters
-            start_date = request.query_params.get('start_date')
-            end_date = request.query_params.get('end_date')
-            office_id = request.query_params.get('office')
-            user_id = request.query_params.get('user')
-            status_filter = request.query_params.get('status')
-
-            # Build query
-            queryset = Attendance.objects.select_related('user', 'user__office')
-
-            # Apply filters with proper date handling
-            if start_date:
-                try:
-                    queryset = queryset.filter(date__gte=start_date)
-                except Exception as e:
-                    logger.warning(f"Invalid start_date format: {start_date}, error: {e}")
-            
-            if end_date:
-                try:
-                    queryset = queryset.filter(date__lte=end_date)
-                except Exception as e:
-                    logger.warning(f"Invalid end_date format: {end_date}, error: {e}")
-            
-            if office_id:
-                queryset = queryset.filter(user__office_id=office_id)
-            if user_id:
-                queryset = queryset.filter(user_id=user_id)
-            if status_filter:
-                queryset = queryset.filter(status=status_filter)
-
-            # Get data with safe date handling
-            attendance_data = []
-            for attendance in queryset:
-                try:
-                    data = {
-                        'id': str(attendance.id),
-                        'date': attendance.date.isoformat() if attendance.date else None,
-                        'check_in_time': attendance.check_in_time.isoformat() if attendance.check_in_time else None,
-                        'check_out_time': attendance.check_out_time.isoformat() if attendance.check_out_time else None,
-                        'status': attendance.status,
-                        'user__id': str(attendance.user.id) if attendance.user else None,
-                        'user__first_name': attendance.user.first_name if attendance.user else None,
-                        'user__last_name': attendance.user.last_name if attendance.user else None,
-                        'user__employee_id': attendance.user.employee_id if attendance.user else None,
-                        'user__office__name': attendance.user.office.name if attendance.user and attendance.user.office else None,
-                    }
-                    attendance_data.append(data)
-                except Exception as e:
-                    logger.warning(f"Error processing attendance record {attendance.id}: {e}")
-                    continue
-
-            # Calculate statistics
-            total_records = len(attendance_data)
-            present_count = sum(1 for a in attendance_data if a['status'] == 'present')
-            absent_count = sum(1 for a in attendance_data if a['status'] == 'absent')
-            late_count = sum(1 for a in attendance_data if a['status'] == 'late')
-            attendance_rate = (present_count / total_records * 100) if total_records > 0 else 0
-
-            # Group by date with safe date handling
-            daily_stats = {}
-            for record in attendance_data:
-                try:
-                    date = record['date']
-                    if date:
-                        # Extract just the date part if it's a full datetime string
-                        if 'T' in date:
-                            date = date.split('T')[0]
-                        
-                        if date not in daily_stats:
-                            daily_stats[date] = {'present': 0, 'absent': 0, 'late': 0, 'total': 0}
-                        daily_stats[date][record['status']] += 1
-                        daily_stats[date]['total'] += 1
-                except Exception as e:
-                    logger.warning(f"Error processing date for record: {e}")
-                    continue
-
-            # Convert to list format
-            daily_stats_list = []
-            for date, stats in daily_stats.items():
-                try:
-                    rate = (stats['present'] / stats['total'] * 100) if stats['total'] > 0 else 0
-                    daily_stats_list.append({
-                        'date': date,
-                        'present': stats['present'],
-                        'absent': stats['absent'],
-                        'late': stats['late'],
-                        'total': stats['total'],
-                        'rate': round(rate, 2)
-                    })
-                except Exception as e:
-                    logger.warning(f"Error calculating stats for date {date}: {e}")
-                    continue
-
-            # Sort by date
-            daily_stats_list.sort(key=lambda x: x['date'])
-
-            return Response({
-                'type': 'attendance',
-                'summary': {
-                    'totalRecords': total_records,
-                    'presentCount': present_count,
-                    'absentCount': absent_count,
-                    'lateCount': late_count,
-                    'attendanceRate': round(attendance_rate, 2)
-                },
-                'dailyStats': daily_stats_list,
-                'rawData': attendance_data
-            })
-
+            return Response(ReportService.attendance_report(request.query_params))
         except Exception as e:
             logger.error(f"Error generating attendance report: {str(e)}")
             return Response(
@@ -178,110 +83,7 @@ class ReportsViewSet(viewsets.ViewSet):
     def leave(self, request):
         """Generate leave report with filters"""
         try:
-            # Get query parameters
-            start_date = request.query_params.get('start_date')
-            end_date = request.query_params.get('end_date')
-            office_id = request.query_params.get('office')
-            user_id = request.query_params.get('user')
-            status_filter = request.query_params.get('status')
-
-            # Build query
-            queryset = Leave.objects.select_related('user', 'user__office')
-
-            # Apply filters with proper date handling
-            if start_date:
-                try:
-                    queryset = queryset.filter(start_date__gte=start_date)
-                except Exception as e:
-                    logger.warning(f"Invalid start_date format: {start_date}, error: {e}")
-            
-            if end_date:
-                try:
-                    queryset = queryset.filter(end_date__lte=end_date)
-                except Exception as e:
-                    logger.warning(f"Invalid end_date format: {end_date}, error: {e}")
-            
-            if office_id:
-                queryset = queryset.filter(user__office_id=office_id)
-            if user_id:
-                queryset = queryset.filter(user_id=user_id)
-            if status_filter:
-                queryset = queryset.filter(status=status_filter)
-
-            # Get data with safe date handling
-            leave_data = []
-            for leave in queryset:
-                try:
-                    data = {
-                        'id': str(leave.id),
-                        'leave_type': leave.leave_type,
-                        'start_date': leave.start_date.isoformat() if leave.start_date else None,
-                        'end_date': leave.end_date.isoformat() if leave.end_date else None,
-                        'status': leave.status,
-                        'reason': leave.reason,
-                        'applied_at': leave.created_at.isoformat() if leave.created_at else None,
-                        'approved_at': leave.approved_at.isoformat() if leave.approved_at else None,
-                        'approved_by__first_name': leave.approved_by.first_name if leave.approved_by else None,
-                        'approved_by__last_name': leave.approved_by.last_name if leave.approved_by else None,
-                        'user__id': str(leave.user.id) if leave.user else None,
-                        'user__first_name': leave.user.first_name if leave.user else None,
-                        'user__last_name': leave.user.last_name if leave.user else None,
-                        'user__employee_id': leave.user.employee_id if leave.user else None,
-                        'user__office__name': leave.user.office.name if leave.user and leave.user.office else None,
-                    }
-                    leave_data.append(data)
-                except Exception as e:
-                    logger.warning(f"Error processing leave record {leave.id}: {e}")
-                    continue
-
-            # Calculate statistics
-            total_leaves = len(leave_data)
-            approved_leaves = sum(1 for l in leave_data if l['status'] == 'approved')
-            pending_leaves = sum(1 for l in leave_data if l['status'] == 'pending')
-            rejected_leaves = sum(1 for l in leave_data if l['status'] == 'rejected')
-            approval_rate = (approved_leaves / total_leaves * 100) if total_leaves > 0 else 0
-
-            # Group by leave type
-            leave_type_stats = {}
-            for record in leave_data:
-                try:
-                    leave_type = record['leave_type']
-                    if leave_type not in leave_type_stats:
-                        leave_type_stats[leave_type] = {'approved': 0, 'pending': 0, 'rejected': 0, 'total': 0}
-                    leave_type_stats[leave_type][record['status']] += 1
-                    leave_type_stats[leave_type]['total'] += 1
-                except Exception as e:
-                    logger.warning(f"Error processing leave type for record: {e}")
-                    continue
-
-            # Convert to list format
-            leave_type_list = []
-            for leave_type, stats in leave_type_stats.items():
-                try:
-                    leave_type_list.append({
-                        'type': leave_type,
-                        'approved': stats['approved'],
-                        'pending': stats['pending'],
-                        'rejected': stats['rejected'],
-                        'total': stats['total']
-                    })
-                except Exception as e:
-                    logger.warning(f"Error creating leave type stats for {leave_type}: {e}")
-                    continue
-
-            return Response({
-                'type': 'leave',
-                'summary': {
-                    'totalLeaves': total_leaves,
-                    'approvedLeaves': approved_leaves,
-                    'pendingLeaves': pending_leaves,
-                    'rejectedLeaves': rejected_leaves,
-                    'approvalRate': round(approval_rate, 2)
-                },
-                'leaveTypeStats': leave_type_list,
-                'rawData': leave_data
-            })
-
+            return Response(ReportService.leave_report(request.query_params))
         except Exception as e:
             logger.error(f"Error generating leave report: {str(e)}")
             return Response(
@@ -290,55 +92,11 @@ class ReportsViewSet(viewsets.ViewSet):
             )
 
     @action(detail=False, methods=['get'])
+    @response_cache.cached('office', 'user')
     def office(self, request):
         """Generate office report"""
         try:
-            # Get all offices with related data
-            offices = Office.objects.prefetch_related('customuser_set').all()
-            
-            # Get all users for statistics
-            all_users = CustomUser.objects.select_related('office').all()
-
-            # Calculate office statistics
-            office_stats = []
-            for office in offices:
-                try:
-                    office_users = [u for u in all_users if u.office_id == office.id]
-                    employees = sum(1 for u in office_users if u.role == 'employee')
-                    managers = sum(1 for u in office_users if u.role == 'manager')
-                    active_users = sum(1 for u in office_users if u.is_active)
-
-                    office_stats.append({
-                        'id': str(office.id),
-                        'name': office.name,
-                        'employees': employees,
-                        'managers': managers,
-                        'activeUsers': active_users,
-                        'totalUsers': len(office_users),
-                        'manager': f"{office.manager.first_name} {office.manager.last_name}" if office.manager else 'Not assigned'
-                    })
-                except Exception as e:
-                    logger.warning(f"Error processing office {office.id}: {e}")
-                    continue
-
-            # Calculate summary statistics
-            total_offices = len(offices)
-            total_employees = sum(1 for u in all_users if u.role == 'employee')
-            total_managers = sum(1 for u in all_users if u.role == 'manager')
-            total_users = len(all_users)
-
-            return Response({
-                'type': 'office',
-                'summary': {
-                    'totalOffices': total_offices,
-                    'totalEmployees': total_employees,
-                    'totalManagers': total_managers,
-                    'totalUsers': total_users
-                },
-                'officeStats': office_stats,
-                'rawData': list(offices.values())
-            })
-
+            return Response(ReportService.office_report(request.query_params))
         except Exception as e:
             logger.error(f"Error generating office report: {str(e)}")
             return Response(
@@ -347,84 +105,11 @@ class ReportsViewSet(viewsets.ViewSet):
             )
 
     @action(detail=False, methods=['get'])
+    @response_cache.cached('office', 'user')
     def user(self, request):
         """Generate user report"""
         try:
-            # Get all users
-            users = CustomUser.objects.select_related('office').all()
-
-            # Calculate user statistics
-            role_stats = {}
-            office_stats = {}
-            active_users = sum(1 for u in users if u.is_active)
-            inactive_users = sum(1 for u in users if not u.is_active)
-
-            for user in users:
-                try:
-                    # Role statistics
-                    if user.role not in role_stats:
-                        role_stats[user.role] = {'active': 0, 'inactive': 0, 'total': 0}
-                    role_stats[user.role]['total'] += 1
-                    if user.is_active:
-                        role_stats[user.role]['active'] += 1
-                    else:
-                        role_stats[user.role]['inactive'] += 1
-
-                    # Office statistics
-                    office_name = user.office.name if user.office else 'No Office'
-                    if office_name not in office_stats:
-                        office_stats[office_name] = {'active': 0, 'inactive': 0, 'total': 0}
-                    office_stats[office_name]['total'] += 1
-                    if user.is_active:
-                        office_stats[office_name]['active'] += 1
-                    else:
-                        office_stats[office_name]['inactive'] += 1
-                except Exception as e:
-                    logger.warning(f"Error processing user {user.id}: {e}")
-                    continue
-
-            # Convert to list format
-            role_stats_list = []
-            for role, stats in role_stats.items():
-                try:
-                    role_stats_list.append({
-                        'role': role,
-                        'active': stats['active'],
-                        'inactive': stats['inactive'],
-                        'total': stats['total']
-                    })
-                except Exception as e:
-                    logger.warning(f"Error creating role stats for {role}: {e}")
-                    continue
-
-            office_stats_list = []
-            for office, stats in office_stats.items():
-                try:
-                    office_stats_list.append({
-                        'office': office,
-                        'active': stats['active'],
-                        'inactive': stats['inactive'],
-                        'total': stats['total']
-                    })
-                except Exception as e:
-                    logger.warning(f"Error creating office stats for {office}: {e}")
-                    continue
-
-            activation_rate = (active_users / len(users) * 100) if users else 0
-
-            return Response({
-                'type': 'user',
-                'summary': {
-                    'totalUsers': len(users),
-                    'activeUsers': active_users,
-                    'inactiveUsers': inactive_users,
-                    'activationRate': round(activation_rate, 2)
-                },
-                'roleStats': role_stats_list,
-                'officeStats': office_stats_list,
-                'rawData': list(users.values())
-            })
-
+            return Response(ReportService.user_report(request.query_params))
         except Exception as e:
             logger.error(f"Error generating user report: {str(e)}")
             return Response(
@@ -434,9 +119,35 @@ class ReportsViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def export(self, request):
-        """Export report data"""
+        """Export report data
+
+        ?output=csv or ?output=ndjson streams the report rows in chunks; the
+        default (json) returns the full report as before.
+        """
         try:
             report_type = request.query_params.get('type', 'attendance')
+            output = request.query_params.get('output', 'json').lower()
+
+            if output in EXPORT_FORMATS:
+                if report_type not in EXPORT_SPECS:
+                    return Response(
+                        {'error': f'Invalid report type: {report_type}'}, 
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                response = StreamingHttpResponse(
+                    report_exporter.stream(report_type, request.query_params, output),
+                    content_type='text/csv' if output == 'csv' else 'application/x-ndjson'
+                )
+                filename = f"{report_type}-report-{timezone.localdate().isoformat()}.{output}"
+                response['Content-Disposition'] = f'attachment; filename="{filename}"'
+                # Let proxies pass chunks through instead of buffering the whole export
+                response['X-Accel-Buffering'] = 'no'
+                return response
+            elif output != 'json':
+                return Response(
+                    {'error': f'Invalid output format: {output}'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
             # Generate the appropriate report
             if report_type == 'attendance':
@@ -464,6 +175,69 @@ class ReportsViewSet(viewsets.ViewSet):
             )
 
 
+class ReportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Background report jobs: submit, poll status and download the result"""
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAdminOrManager]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['created_at', 'completed_at']
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = ReportJob.objects.select_related('requested_by')
+        if user.is_admin:
+            return queryset
+        elif user.is_manager and user.office_id:
+            # Managers only run monthly reports, always scoped to their office
+            return queryset.filter(report_type='monthly_attendance', params__office=str(user.office_id))
+        else:
+            return ReportJob.objects.none()
+
+    def create(self, request):
+        """Submit a report job; identical up-to-date jobs are reused"""
+        serializer = ReportJobCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        report_type = serializer.validated_data['report_type']
+        params = dict(serializer.validated_data['params'])
+        if not user.is_admin:
+            if report_type != 'monthly_attendance' or not user.office_id:
+                return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+            params['office'] = str(user.office_id)
+
+        try:
+            job, created = report_job_runner.submit(report_type, params, requested_by=user)
+            return Response(
+                ReportJobSerializer(job).data,
+                status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+            )
+        except Exception as e:
+            logger.error(f"Error submitting {report_type} report job: {str(e)}")
+            return Response(
+                {'error': f'Failed to submit report job: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download the JSON result of a completed job"""
+        job = self.get_object()
+        if job.status != 'completed' or not job.result_file:
+            return Response(
+                {'error': f'Report is not ready (status: {job.status})', 'status': job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        try:
+            response = FileResponse(job.result_file.open('rb'), content_type='application/json')
+            response['Content-Disposition'] = f'attachment; filename="{job.report_type}-report-{job.id}.json"'
+            return response
+        except FileNotFoundError:
+            return Response({'error': 'Result file not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
 class OfficeViewSet(viewsets.ModelViewSet):
     """ViewSet for Office model"""
     queryset = Office.objects.all()
@@ -478,26 +252,20 @@ class OfficeViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticated()]  # Anyone authenticated can read offices
 
     @action(detail=True, methods=['get'])
+    @response_cache.cached('attendance', 'leave', 'user', 'office', office_kwarg='pk')
     def stats(self, request, pk=None):
         """Get office-specific statistics"""
         office = self.get_object()
+        today_totals = daily_summary_service.totals(timezone.now().date(), office_id=office.id)
         
         stats = {
             'office_id': office.id,
             'office_name': office.name,
             'total_employees': CustomUser.objects.filter(office=office, role='employee').count(),
-            'present_today': Attendance.objects.filter(
-                user__office=office, 
-                date=timezone.now().date(), 
-                status='present'
-            ).count(),
-            'absent_today': Attendance.objects.filter(
-                user__office=office, 
-                date=timezone.now().date(), 
-                status='absent'
-            ).count(),
+            'present_today': today_totals['present_count'],
+            'absent_today': today_totals['absent_count'],
             'pending_leaves': Leave.objects.filter(
-                user__office=office, 
+                office=office, 
                 status='pending'
             ).count(),
         }
@@ -783,49 +551,64 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['user__first_name', 'user__last_name', 'notes']
     ordering_fields = ['date', 'check_in_time', 'check_out_time']
-    pagination_class = None  # Disable pagination for attendance data
+
+    def get_pagination_class(self):
+        """Keyset pages for list; other actions (e.g. my) keep page-number pagination"""
+        if self.action == 'list':
+            return AttendanceKeysetPagination
+        return self.pagination_class
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.get_pagination_class()
+            self._paginator = pagination_class() if pagination_class else None
+        return self._paginator
 
     def get_queryset(self):
         user = self.request.user
         if user.is_admin:
             return Attendance.objects.select_related('user', 'user__office', 'device').all()
         elif user.is_manager:
-            return Attendance.objects.select_related('user', 'user__office', 'device').filter(user__office=user.office)
+            return Attendance.objects.select_related('user', 'user__office', 'device').filter(office=user.office)
         else:
             return Attendance.objects.select_related('user', 'user__office', 'device').filter(user=user)
 
     def list(self, request, *args, **kwargs):
-        """Override list method to limit data and prevent large responses"""
-        queryset = self.get_queryset()
+        """Compact rows, newest first, one (date, id) keyset page at a time
+
+        ?limit= sets the page size, ?fields= trims each row and ?expand=user
+        nests a compact user object.
+        """
+        queryset = self.get_queryset().defer(*CustomUser.detail_field_paths('user'))
         
         # Apply filters from query parameters
         date = request.query_params.get('date')
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
         user_id = request.query_params.get('user')
         office_id = request.query_params.get('office')
         status = request.query_params.get('status')
         device_id = request.query_params.get('device')
-        limit = request.query_params.get('limit', 100)  # Default limit of 100
         
         if date:
             queryset = queryset.filter(date=date)
+        if start_date:
+            queryset = queryset.filter(date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(date__lte=end_date)
         if user_id:
             queryset = queryset.filter(user_id=user_id)
         if office_id:
-            queryset = queryset.filter(user__office_id=office_id)
+            queryset = queryset.filter(office_id=office_id)
         if status:
             queryset = queryset.filter(status=status)
         if device_id:
             queryset = queryset.filter(device_id=device_id)
         
-        # Apply limit to prevent large responses
-        try:
-            limit = int(limit)
-            queryset = queryset[:limit]
-        except (ValueError, TypeError):
-            queryset = queryset[:100]  # Default to 100 if limit is invalid
-        
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -835,6 +618,8 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == 'create':
             return AttendanceCreateSerializer
+        if self.action == 'list':
+            return AttendanceListSerializer
         return AttendanceSerializer
 
     @action(detail=False, methods=['post'])
@@ -848,30 +633,38 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 user = get_object_or_404(CustomUser, id=user_id)
                 attendance = Attendance(
                     user=user,
+                    office_id=user.office_id,
                     date=data['date'],
                     status=data['status'],
                     notes=data.get('notes', '')
                 )
                 attendances.append(attendance)
             
-            Attendance.objects.bulk_create(attendances)
+            with transaction.atomic():
+                Attendance.objects.bulk_create(attendances)
+                # bulk_create skips post_save: audit and refresh summaries here
+                log_bulk_changes((attendance, None) for attendance in attendances)
+                side_effect_writer.enqueue_summary_refresh(attendance_summary_keys(attendances))
             return Response({'message': f'{len(attendances)} attendance records created'})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'])
+    @response_cache.cached('attendance', 'user', 'device')
     def today(self, request):
         """Get today's attendance with statistics"""
         today = timezone.now().date()
-        queryset = self.get_queryset().filter(date=today)
+        records = list(self.get_queryset().filter(date=today))
         
-        # Calculate statistics
-        total_records = queryset.count()
-        present_records = queryset.filter(status='present').count()
-        absent_records = queryset.filter(status='absent').count()
-        late_records = queryset.filter(status='late').count()
+        # Count the rows returned rather than read the (asynchronously refreshed) daily
+        # summary, so the statistics always match the records in the same response
+        statuses = Counter(record.status for record in records)
+        total_records = len(records)
+        present_records = statuses['present']
+        absent_records = statuses['absent']
+        late_records = statuses['late']
         
         # Serialize attendance records
-        serializer = self.get_serializer(queryset, many=True)
+        serializer = self.get_serializer(records, many=True)
         
         # Prepare response with statistics
         response_data = {
@@ -982,7 +775,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             if user_id:
                 queryset = queryset.filter(user_id=user_id)
             if office_id:
-                queryset = queryset.filter(user__office_id=office_id)
+                queryset = queryset.filter(office_id=office_id)
             
             # Get attendance records
             attendance_records = queryset.order_by('date', 'user__first_name')
@@ -1211,6 +1004,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @response_cache.cached('attendance', per_user=True)
     def summary(self, request):
         """Get attendance summary for current user"""
         user = request.user
@@ -1569,12 +1363,16 @@ class LeaveViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        # LeaveSerializer only reads the names of user and approved_by
+        queryset = Leave.objects.select_related('user', 'approved_by').defer(
+            *CustomUser.detail_field_paths('user', 'approved_by')
+        )
         if user.is_admin:
-            return Leave.objects.all()
+            return queryset
         elif user.is_manager:
-            return Leave.objects.filter(user__office=user.office)
+            return queryset.filter(office=user.office)
         else:
-            return Leave.objects.filter(user=user)
+            return queryset.filter(user=user)
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -1596,7 +1394,7 @@ class LeaveViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my(self, request):
         """Get current user's leaves"""
-        queryset = Leave.objects.filter(user=request.user)
+        queryset = self.get_queryset().filter(user=request.user)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -1650,7 +1448,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
         elif user.is_manager:
             # Managers can see documents uploaded by them or documents of their office employees
             return base_queryset.filter(
-                models.Q(uploaded_by=user) | models.Q(user__office=user.office)
+                models.Q(uploaded_by=user) | models.Q(office=user.office)
             )
         else:
             return base_queryset.filter(user=user)
@@ -1822,176 +1620,184 @@ class AttendanceLogViewSet(viewsets.ReadOnlyModelViewSet):
         if user.is_admin:
             return AttendanceLog.objects.all()
         elif user.is_manager:
-            return AttendanceLog.objects.filter(attendance__user__office=user.office)
+            return AttendanceLog.objects.filter(attendance__office=user.office)
         else:
             return AttendanceLog.objects.none()
 
 
 # Dashboard Views
+class PollerViewSet(viewsets.ViewSet):
+    """Attendance poller coordination - Admin only"""
+    permission_classes = [IsAdminUser]
+
+    @action(detail=False, methods=['get'])
+    def lease(self, request):
+        """Which process holds the poller lease, and this process's view of it"""
+        try:
+            return Response(poller_lease.get_status())
+        except Exception as e:
+            logger.error(f"Error reading poller lease: {str(e)}")
+            return Response(
+                {'error': f'Failed to read poller lease: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['get'])
+    def instances(self, request):
+        """Live poller instances and how many active devices each one polls in sharded mode"""
+        try:
+            device_ids = Device.objects.filter(is_active=True).values_list('id', flat=True)
+            return Response(poller_membership.get_status(device_ids))
+        except Exception as e:
+            logger.error(f"Error reading poller instances: {str(e)}")
+            return Response(
+                {'error': f'Failed to read poller instances: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
 class DashboardViewSet(viewsets.ViewSet):
     """ViewSet for dashboard statistics"""
     permission_classes = [permissions.IsAuthenticated]
 
     @action(detail=False, methods=['get'])
+    @response_cache.cached('attendance', 'leave', 'user', 'office', 'device')
     def stats(self, request):
         """Get dashboard statistics"""
-        # Optimize database connections
-        from core.db_manager import db_manager
-        db_manager.optimize_connections()
-        
         user = request.user
         today = timezone.now().date()
-        last_month = today - timedelta(days=30)
         
         if user.is_admin:
-            # Calculate comprehensive statistics for admin
-            total_employees = CustomUser.objects.filter(role='employee').count()
-            total_managers = CustomUser.objects.filter(role='manager').count()
-            total_offices = Office.objects.count()
-            total_devices = Device.objects.count()
-            active_devices = Device.objects.filter(is_active=True).count()
-            
-            # Attendance statistics
-            today_attendance = Attendance.objects.filter(
-                date=today, 
-                status='present'
-            ).count()
-            total_today_records = Attendance.objects.filter(date=today).count()
-            attendance_rate = (today_attendance / total_today_records * 100) if total_today_records > 0 else 0
-            
-            # Leave statistics
-            pending_leaves = Leave.objects.filter(status='pending').count()
-            approved_leaves = Leave.objects.filter(status='approved').count()
-            total_leaves = Leave.objects.count()
-            leave_approval_rate = (approved_leaves / total_leaves * 100) if total_leaves > 0 else 0
-            
-            # User statistics
-            active_users = CustomUser.objects.filter(is_active=True).count()
-            total_users = CustomUser.objects.count()
-            inactive_users = total_users - active_users
-            
-            # Growth statistics (comparing with last month)
-            last_month_employees = CustomUser.objects.filter(
-                role='employee',
-                date_joined__lt=last_month
-            ).count()
-            employee_growth = ((total_employees - last_month_employees) / last_month_employees * 100) if last_month_employees > 0 else 0
-            
-            stats = {
-                'total_employees': total_employees,
-                'total_managers': total_managers,
-                'total_offices': total_offices,
-                'total_devices': total_devices,
-                'active_devices': active_devices,
-                'today_attendance': today_attendance,
-                'total_today_records': total_today_records,
-                'attendance_rate': round(attendance_rate, 2),
-                'pending_leaves': pending_leaves,
-                'approved_leaves': approved_leaves,
-                'total_leaves': total_leaves,
-                'leave_approval_rate': round(leave_approval_rate, 2),
-                'active_users': active_users,
-                'inactive_users': inactive_users,
-                'total_users': total_users,
-                'employee_growth': round(employee_growth, 2),
-                'user_activation_rate': round((active_users / total_users * 100), 2) if total_users > 0 else 0,
-            }
+            stats = self._admin_stats(today)
         elif user.is_manager:
-            # Calculate office-specific statistics for manager
-            office = user.office
-            total_employees = CustomUser.objects.filter(
-                office=office, 
-                role='employee'
-            ).count()
-            total_devices = Device.objects.filter(office=office).count()
-            active_devices = Device.objects.filter(office=office, is_active=True).count()
-            
-            # Office attendance statistics
-            today_attendance = Attendance.objects.filter(
-                user__office=office,
-                date=today, 
-                status='present'
-            ).count()
-            total_today_records = Attendance.objects.filter(
-                user__office=office,
-                date=today
-            ).count()
-            attendance_rate = (today_attendance / total_today_records * 100) if total_today_records > 0 else 0
-            
-            # Office leave statistics
-            pending_leaves = Leave.objects.filter(
-                user__office=office, 
-                status='pending'
-            ).count()
-            approved_leaves = Leave.objects.filter(
-                user__office=office,
-                status='approved'
-            ).count()
-            total_leaves = Leave.objects.filter(user__office=office).count()
-            leave_approval_rate = (approved_leaves / total_leaves * 100) if total_leaves > 0 else 0
-            
-            # Office user statistics
-            active_users = CustomUser.objects.filter(
-                office=office, 
-                is_active=True
-            ).count()
-            total_users = CustomUser.objects.filter(office=office).count()
-            
-            stats = {
-                'total_employees': total_employees,
-                'total_managers': 1,  # Manager themselves
-                'total_offices': 1,
-                'total_devices': total_devices,
-                'active_devices': active_devices,
-                'today_attendance': today_attendance,
-                'total_today_records': total_today_records,
-                'attendance_rate': round(attendance_rate, 2),
-                'pending_leaves': pending_leaves,
-                'approved_leaves': approved_leaves,
-                'total_leaves': total_leaves,
-                'leave_approval_rate': round(leave_approval_rate, 2),
-                'active_users': active_users,
-                'total_users': total_users,
-                'user_activation_rate': round((active_users / total_users * 100), 2) if total_users > 0 else 0,
-                'employee_growth': 0,  # Not applicable for managers
-            }
+            stats = self._manager_stats(user.office, today)
         else:
-            # Employee statistics
-            today_attendance = Attendance.objects.filter(
-                user=user,
-                date=today
-            ).count()
-            pending_leaves = Leave.objects.filter(
-                user=user, 
-                status='pending'
-            ).count()
-            approved_leaves = Leave.objects.filter(
-                user=user,
-                status='approved'
-            ).count()
-            total_leaves = Leave.objects.filter(user=user).count()
-            leave_approval_rate = (approved_leaves / total_leaves * 100) if total_leaves > 0 else 0
-            
-            stats = {
-                'total_employees': 1,
-                'total_managers': 0,
-                'total_offices': 1,
-                'total_devices': 0,
-                'active_devices': 0,
-                'today_attendance': today_attendance,
-                'total_today_records': today_attendance,
-                'attendance_rate': 100 if today_attendance > 0 else 0,
-                'pending_leaves': pending_leaves,
-                'approved_leaves': approved_leaves,
-                'total_leaves': total_leaves,
-                'leave_approval_rate': round(leave_approval_rate, 2),
-                'active_users': 1,
-                'total_users': 1,
-                'user_activation_rate': 100,
-            }
+            stats = self._employee_stats(user, today)
         
         serializer = DashboardStatsSerializer(stats)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """Response cache hit/miss/invalidation counters of this process - Admin only"""
+        if not request.user.is_admin:
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(response_cache.get_stats())
+    
+    @staticmethod
+    def _rate(part, total):
+        return round(part / total * 100, 2) if total > 0 else 0
+    
+    @staticmethod
+    def _leave_counts(queryset):
+        """Pending/approved/total leave counts in one query"""
+        return queryset.aggregate(
+            pending_leaves=Count('id', filter=Q(status='pending')),
+            approved_leaves=Count('id', filter=Q(status='approved')),
+            total_leaves=Count('id'),
+        )
+    
+    @staticmethod
+    def _today_attendance_counts(today, office_id=None):
+        """Present/total attendance counts for today from the daily summary"""
+        totals = daily_summary_service.totals(today, office_id=office_id)
+        return {
+            'today_attendance': totals['present_count'],
+            'total_today_records': totals['total_records'],
+        }
+    
+    @staticmethod
+    def _device_counts(queryset):
+        """Total/active device counts in one query"""
+        return queryset.aggregate(
+            total_devices=Count('id'),
+            active_devices=Count('id', filter=Q(is_active=True)),
+        )
+    
+    def _admin_stats(self, today):
+        """Comprehensive statistics for admins"""
+        last_month = today - timedelta(days=30)
+        
+        users = CustomUser.objects.aggregate(
+            total_employees=Count('id', filter=Q(role='employee')),
+            total_managers=Count('id', filter=Q(role='manager')),
+            active_users=Count('id', filter=Q(is_active=True)),
+            total_users=Count('id'),
+            # Growth statistics (comparing with last month)
+            last_month_employees=Count('id', filter=Q(role='employee', date_joined__lt=last_month)),
+        )
+        devices = self._device_counts(Device.objects.all())
+        attendance = self._today_attendance_counts(today)
+        leaves = self._leave_counts(Leave.objects.all())
+        
+        last_month_employees = users['last_month_employees']
+        employee_growth = ((users['total_employees'] - last_month_employees) / last_month_employees * 100) if last_month_employees > 0 else 0
+        
+        return {
+            'total_employees': users['total_employees'],
+            'total_managers': users['total_managers'],
+            'total_offices': Office.objects.count(),
+            **devices,
+            **attendance,
+            'attendance_rate': self._rate(attendance['today_attendance'], attendance['total_today_records']),
+            **leaves,
+            'leave_approval_rate': self._rate(leaves['approved_leaves'], leaves['total_leaves']),
+            'active_users': users['active_users'],
+            'inactive_users': users['total_users'] - users['active_users'],
+            'total_users': users['total_users'],
+            'employee_growth': round(employee_growth, 2),
+            'user_activation_rate': self._rate(users['active_users'], users['total_users']),
+        }
+    
+    def _manager_stats(self, office, today):
+        """Office-specific statistics for managers"""
+        users = CustomUser.objects.filter(office=office).aggregate(
+            total_employees=Count('id', filter=Q(role='employee')),
+            active_users=Count('id', filter=Q(is_active=True)),
+            total_users=Count('id'),
+        )
+        devices = self._device_counts(Device.objects.filter(office=office))
+        if office:
+            attendance = self._today_attendance_counts(today, office_id=office.id)
+        else:
+            attendance = {'today_attendance': 0, 'total_today_records': 0}
+        leaves = self._leave_counts(Leave.objects.filter(office=office))
+        
+        return {
+            'total_employees': users['total_employees'],
+            'total_managers': 1,  # Manager themselves
+            'total_offices': 1,
+            **devices,
+            **attendance,
+            'attendance_rate': self._rate(attendance['today_attendance'], attendance['total_today_records']),
+            **leaves,
+            'leave_approval_rate': self._rate(leaves['approved_leaves'], leaves['total_leaves']),
+            'active_users': users['active_users'],
+            'total_users': users['total_users'],
+            'user_activation_rate': self._rate(users['active_users'], users['total_users']),
+            'employee_growth': 0,  # Not applicable for managers
+        }
+    
+    def _employee_stats(self, user, today):
+        """Personal statistics for employees"""
+        today_attendance = Attendance.objects.filter(user=user, date=today).count()
+        leaves = self._leave_counts(Leave.objects.filter(user=user))
+        
+        return {
+            'total_employees': 1,
+            'total_managers': 0,
+            'total_offices': 1,
+            'total_devices': 0,
+            'active_devices': 0,
+            'today_attendance': today_attendance,
+            'total_today_records': today_attendance,
+            'attendance_rate': 100 if today_attendance > 0 else 0,
+            **leaves,
+            'leave_approval_rate': self._rate(leaves['approved_leaves'], leaves['total_leaves']),
+            'active_users': 1,
+            'total_users': 1,
+            'user_activation_rate': 100,
+        }
 
 
 # Custom error handlers for production
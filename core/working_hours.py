@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Working Hours Policies
+Memoized per-office WorkingHoursSettings, resolved once and invalidated when the
+settings change. Edits made in another process (the web workers, while the
+poller classifies) only send signals there, so entries also expire after a
+TTL. Each policy precomputes its late/half-day thresholds per date so
+attendance status classification is a pure in-memory function.
+"""
+
+import logging
+import threading
+from time import monotonic
+from datetime import datetime, timedelta, time
+from django.conf import settings as django_settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import WorkingHoursSettings
+
+logger = logging.getLogger(__name__)
+
+
+class WorkingHoursPolicy:
+    """Attendance rules of one office"""
+
+    def __init__(self, office_id, start_time=time(9, 0), end_time=time(18, 0),
+                 standard_hours=9.0, late_threshold=15, half_day_threshold=240):
+        self.office_id = office_id
+        self.start_time = start_time
+        self.end_time = end_time
+        self.standard_hours = float(standard_hours)
+        self.late_threshold = late_threshold
+        self.half_day_threshold = half_day_threshold
+        self.half_day_delta = timedelta(minutes=half_day_threshold)
+        self._late_after = {}  # date -> aware datetime after which a check-in is late
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            settings.office_id,
+            start_time=settings.start_time,
+            end_time=settings.end_time,
+            standard_hours=settings.standard_hours,
+            late_threshold=settings.late_threshold,
+            half_day_threshold=settings.half_day_threshold,
+        )
+
+    def late_after(self, attendance_date):
+        """Latest on-time check-in for the date"""
+        threshold = self._late_after.get(attendance_date)
+        if threshold is None:
+            start = timezone.make_aware(datetime.combine(attendance_date, self.start_time))
+            threshold = start + timedelta(minutes=self.late_threshold)
+            self._late_after[attendance_date] = threshold
+        return threshold
+
+    def classify(self, check_in_time, check_out_time, attendance_date):
+        """Attendance status (absent/late/half_day/present) for a day"""
+        if not check_in_time:
+            return 'absent'
+        if check_in_time > self.late_after(attendance_date):
+            return 'late'
+        if check_out_time and check_out_time - check_in_time < self.half_day_delta:
+            return 'half_day'
+        return 'present'
+
+
+class WorkingHoursResolver:
+    """Memoized office -> WorkingHoursPolicy lookup with a TTL"""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._policies = {}  # office id -> (policy, monotonic expiry)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """Build the resolver from the ATTENDANCE_WORKING_HOURS setting"""
+        config = getattr(django_settings, 'ATTENDANCE_WORKING_HOURS', {})
+        return cls(ttl=config.get('TTL', 60))
+
+    def get(self, office_id):
+        """Policy for one office (the defaults when it has no settings)"""
+        return self.get_many([office_id])[office_id]
+
+    def get_many(self, office_ids):
+        """Policies for several offices, loading unknown ones with one query"""
+        office_ids = set(office_ids)
+        now = monotonic()
+        with self._lock:
+            policies = {}
+            for office_id in office_ids:
+                entry = self._policies.get(office_id)
+                if entry and entry[1] > now:
+                    policies[office_id] = entry[0]
+
+        missing = office_ids - set(policies)
+        if missing:
+            loaded = {
+                settings.office_id: WorkingHoursPolicy.from_settings(settings)
+                for settings in WorkingHoursSettings.objects.filter(office_id__in=[o for o in missing if o])
+            }
+            with self._lock:
+                for office_id in missing:
+                    policy = loaded.get(office_id) or WorkingHoursPolicy(office_id)
+                    self._policies[office_id] = (policy, now + self.ttl)
+                    policies[office_id] = policy
+
+        return policies
+
+    def invalidate(self, office_id=None):
+        """Forget one office's policy, or all of them"""
+        with self._lock:
+            if office_id is None:
+                self._policies.clear()
+            else:
+                self._policies.pop(office_id, None)
+
+
+# Global working hours resolver
+working_hours_resolver = WorkingHoursResolver.from_settings()
+
+
+@receiver(post_save, sender=WorkingHoursSettings, dispatch_uid='working_hours_resolver_save')
+@receiver(post_delete, sender=WorkingHoursSettings, dispatch_uid='working_hours_resolver_delete')
+def invalidate_working_hours(sender, instance, **kwargs):
+    """Reload an office's policy after its settings change"""
+    working_hours_resolver.invalidate(instance.office_id)
@@ -271,7 +271,8 @@ class ZKTecoService:
     
     def sync_attendance_to_database(self, attendance_logs: List[Dict], device_info: Dict):
         """Sync attendance logs to database"""
-        from core.models import ESSLAttendanceLog, CustomUser, Device
+        from core.models import Device
+        from core.ingest_service import AttendanceIngestService
         
         synced_count = 0
         error_count = 0
@@ -291,44 +292,20 @@ class ZKTecoService:
                 }
             )
             
-            # Process logs in batches to reduce memory usage
-            batch_size = 50
-            for i in range(0, len(attendance_logs), batch_size):
-                batch = attendance_logs[i:i + batch_size]
-                
-                for log in batch:
-                    try:
-                        # Find user by biometric ID
-                        user = CustomUser.objects.filter(biometric_id=str(log['user_id'])).first()
-                        
-                        if user:
-                            # Check if log already exists
-                            existing_log = ESSLAttendanceLog.objects.filter(
-                                device=device,
-                                biometric_id=str(log['user_id']),
-                                punch_time=log['punch_time']
-                            ).first()
-                            
-                            if not existing_log:
-                                # Create new attendance log
-                                ESSLAttendanceLog.objects.create(
-                                    device=device,
-                                    biometric_id=str(log['user_id']),
-                                    user=user,
-                                    punch_time=log['punch_time'],
-                                    punch_type=log['punch_type'],
-                                    is_processed=False
-                                )
-                                synced_count += 1
-                        else:
-                            logger.warning(f"User with biometric ID {log['user_id']} not found")
-                            
-                    except Exception as e:
-                        logger.error(f"Error processing attendance log: {str(e)}")
-                        error_count += 1
-                
-                # Close connections after each batch
-                close_old_connections()
+            # Bulk ingest: users resolved once per batch, existing punches pre-fetched
+            result = AttendanceIngestService(device, skip_unknown_users=True).ingest(
+                {
+                    'biometric_id': log['user_id'],
+                    'punch_time': log['punch_time'],
+                    'punch_type': log['punch_type'],
+                }
+                for log in attendance_logs
+            )
+            synced_count = result['inserted']
+            error_count = result['invalid']
+            
+            if result['unknown_users']:
+                logger.warning(f"Skipped {result['unknown_users']} attendance logs with unknown biometric IDs")
             
             logger.info(f"Synced {synced_count} attendance logs, {error_count} errors")
             return synced_count, error_count
@@ -10,6 +10,7 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 from django.utils import timezone
 from django.conf import settings
+from .device_breaker import device_breaker
 
 try:
     from zk import ZK, const
@@ -176,10 +177,19 @@ class ImprovedZKTecoService:
         device_key = f"{ip_address}:{port}"
         
         if device_key not in self.devices:
+            # Skip devices whose circuit is open, and probe the port before a full connect
+            if not device_breaker.allow(ip_address, port):
+                return None
+            if not device_breaker.probe(ip_address, port):
+                logger.error(f"Device {device_key} is not reachable")
+                device_breaker.record_failure(ip_address, port, 'TCP probe failed')
+                return None
             device = ImprovedZKTecoDevice(ip_address, port)
             if device.connect():
+                device_breaker.record_success(ip_address, port)
                 self.devices[device_key] = device
             else:
+                device_breaker.record_failure(ip_address, port, 'connect failed')
                 return None
         
         return self.devices[device_key]
@@ -201,7 +211,10 @@ class ImprovedZKTecoService:
         """Fetch attendance data from a specific device"""
         device = self.get_device(device_ip, device_port)
         if not device:
-            logger.error(f"Failed to connect to device {device_ip}:{device_port}")
+            if device_breaker.state(device_ip, device_port) == device_breaker.OPEN:
+                logger.debug(f"Circuit open for device {device_ip}:{device_port}, skipping")
+            else:
+                logger.error(f"Failed to connect to device {device_ip}:{device_port}")
             return []
         
         try:
@@ -284,7 +297,8 @@ class ImprovedZKTecoService:
     
     def sync_attendance_to_database(self, attendance_logs: List[Dict], device_info: Dict):
         """Sync attendance logs to database"""
-        from core.models import ESSLAttendanceLog, CustomUser, Device
+        from core.models import Device
+        from core.ingest_service import AttendanceIngestService
         
         synced_count = 0
         error_count = 0
@@ -301,40 +315,20 @@ class ImprovedZKTecoService:
                 }
             )
             
-            # Process each attendance log
-            for log in attendance_logs:
-                try:
-                    # Try to find user by biometric_id
-                    user = None
-                    try:
-                        user = CustomUser.objects.get(biometric_id=log['user_id'])
-                    except CustomUser.DoesNotExist:
-                        # Try to find by employee_id
-                        try:
-                            user = CustomUser.objects.get(employee_id=str(log['user_id']))
-                        except CustomUser.DoesNotExist:
-                            logger.warning(f"User not found for biometric_id: {log['user_id']}")
-                            error_count += 1
-                            continue
-                    
-                    # Create or update attendance log
-                    log_obj, created = ESSLAttendanceLog.objects.get_or_create(
-                        user=user,
-                        device=device,
-                        timestamp=log['punch_time'],
-                        defaults={
-                            'punch_type': log['punch_type'],
-                            'status': log.get('status', 0),
-                            'uid': log.get('uid', 0)
-                        }
-                    )
-                    
-                    if created:
-                        synced_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error processing attendance log: {str(e)}")
-                    error_count += 1
+            # Bulk ingest: match by biometric_id, falling back to employee_id
+            result = AttendanceIngestService(device, skip_unknown_users=True, match_employee_id=True).ingest(
+                {
+                    'biometric_id': log['user_id'],
+                    'punch_time': log['punch_time'],
+                    'punch_type': log['punch_type'],
+                }
+                for log in attendance_logs
+            )
+            synced_count = result['inserted']
+            error_count = result['invalid'] + result['unknown_users']
+            
+            if result['unknown_users']:
+                logger.warning(f"Skipped {result['unknown_users']} attendance logs with unknown users")
             
             # Update device last sync time
             device.last_sync = timezone.now()